@@ -0,0 +1,206 @@
+"""
+ASGI serving mode for many long-lived video connections
+
+The routes of app.py are the same, but the streams (/video_feed, /landmarks_feed and their
+/cameras/<name>/ versions) are async generators on an event loop instead of one blocking thread per
+connection. Each camera has a FrameBroadcaster per overlay mode that draws and encodes each frame
+once, in an executor thread, and every connected stream gets the same JPEG bytes, so a connection
+costs a small coroutine and no thread. Capture, hand detection and recognition keep running in the
+camera threads and the recording job queue of app.py; every other route is the Flask app itself,
+served through a WSGI adapter with its own thread pool.
+
+Requires starlette, uvicorn and a2wsgi (pip install -r requirements-serve.txt).
+
+Usage:
+    STL_DEBUG=0 python AsyncServer.py
+    uvicorn AsyncServer:asgi_app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Mount, Route
+except ImportError as e:
+    raise SystemExit(f"✗ Modo assíncrono indisponível ({e}): pip install -r requirements-serve.txt")
+
+import app as server
+
+# Threads que recebem e codificam os frames das câmeras (uma espera por câmera e modo de overlay)
+ENCODER_THREADS = int(os.environ.get('STL_ENCODER_THREADS', str(max(2, 2*len(server.CAMERAS)))))
+# Threads que atendem as demais rotas (Flask via WSGI)
+WSGI_THREADS = int(os.environ.get('STL_WSGI_THREADS', str(server.THREAD_BUDGET.requests)))
+
+encoder_executor = ThreadPoolExecutor(max_workers=ENCODER_THREADS, thread_name_prefix="encoder")
+
+class FrameBroadcaster:
+    """
+    encodes the frames of one camera once and hands the same JPEG to every connected stream
+
+    A task waits for the frames the camera publishes and encodes them in encoder_executor, at most
+    at the max_fps of the current quality level, while at least one stream is connected. Each stream
+    waits on an asyncio.Condition for the next JPEG and can skip frames to honour its own fps.
+
+    Args:
+        camera(CameraPipeline): camera whose frames are broadcast
+        draw(bool): draw the hands, the recording indicator and the prediction on the frames
+    """
+    def __init__(self, camera, draw):
+        self.camera = camera
+        self.draw = draw
+        self.subscribers = 0
+        self.frames_encoded = 0
+        self._sequence = 0
+        self._jpeg = None
+        self._condition = asyncio.Condition()
+        self._task = None
+
+    async def _broadcast(self):
+        loop = asyncio.get_running_loop()
+        self.camera.add_viewer()
+        try:
+            sequence = None
+            results = None
+            display = None
+            last_encoded = 0.0
+            while self.subscribers:
+                published = await loop.run_in_executor(encoder_executor, self.camera.wait_frame, sequence, 0.5)
+                if published is None:
+                    continue
+                sequence, frame_buffer, frame_results = published
+                try:
+                    if frame_results is not None:
+                        results = frame_results  # nos frames sem detecção, as últimas mãos
+                    settings = server.quality_controller.settings()
+                    now = time.perf_counter()
+                    if now - last_encoded < 1.0 / settings['max_fps']:
+                        continue
+                    last_encoded = now
+                    jpeg, display = await loop.run_in_executor(encoder_executor, server.encode_frame, self.camera, frame_buffer.array, results, self.draw, settings, display)
+                finally:
+                    frame_buffer.release()
+
+                async with self._condition:
+                    self._sequence += 1
+                    self._jpeg = jpeg
+                    self._condition.notify_all()
+                self.frames_encoded += 1
+        finally:
+            self.camera.remove_viewer()
+
+    async def stream(self, max_fps = None):
+        """
+        multipart MJPEG chunks for one connection, as an async generator
+        """
+        self.subscribers += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._broadcast())
+        try:
+            sequence = self._sequence
+            last_sent = 0.0
+            while True:
+                async with self._condition:
+                    await self._condition.wait_for(lambda: self._sequence != sequence)
+                    sequence, jpeg = self._sequence, self._jpeg
+                if max_fps:
+                    now = time.perf_counter()
+                    if now - last_sent < 1.0 / max_fps:
+                        continue
+                    last_sent = now
+                yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+        finally:
+            self.subscribers -= 1
+
+broadcasters = {}
+
+def request_camera(request):
+    name = request.path_params.get('name') or request.query_params.get('camera')
+    if name is None:
+        return next(iter(server.cameras.values()))
+    return server.cameras.get(name)
+
+def camera_not_found():
+    return JSONResponse({'status': 'error', 'message': 'Câmera não encontrada', 'cameras': list(server.cameras)}, status_code=404)
+
+async def video_feed(request):
+    camera = request_camera(request)
+    if camera is None:
+        return camera_not_found()
+    draw = request.query_params.get('overlay', 'server') != 'client'
+    try:
+        max_fps = float(request.query_params['fps']) if 'fps' in request.query_params else None
+    except ValueError:
+        max_fps = None
+
+    key = (camera.name, draw)
+    if key not in broadcasters:
+        broadcasters[key] = FrameBroadcaster(camera, draw)
+    return StreamingResponse(broadcasters[key].stream(max_fps), media_type='multipart/x-mixed-replace; boundary=frame')
+
+async def landmarks_feed(request):
+    """Server-Sent Events com os landmarks de cada mão, como o /landmarks_feed do app.py"""
+    camera = request_camera(request)
+    if camera is None:
+        return camera_not_found()
+    try:
+        interval = 1.0 / max(1.0, float(request.query_params.get('fps', 30)))
+    except ValueError:
+        interval = 1.0 / 30
+
+    async def events():
+        last_frame = None
+        camera.add_viewer()
+        try:
+            while True:
+                landmarks = camera.latest_landmarks
+                if landmarks['frame'] != last_frame:
+                    last_frame = landmarks['frame']
+                    yield f"data: {json.dumps(landmarks, separators=(',', ':'))}\n\n"
+                await asyncio.sleep(interval)
+        finally:
+            camera.remove_viewer()
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+async def streams_status(request):
+    return JSONResponse({
+        'streams': [
+            {'camera': camera_name, 'overlay': 'server' if draw else 'client', 'connections': broadcaster.subscribers, 'frames_encoded': broadcaster.frames_encoded}
+            for (camera_name, draw), broadcaster in broadcasters.items()
+        ],
+    })
+
+@contextlib.asynccontextmanager
+async def lifespan(application):
+    # Carregar modelo e detectores bloqueia: fora do event loop
+    await asyncio.get_running_loop().run_in_executor(None, server.initialize)
+    yield
+    for camera in server.cameras.values():
+        camera.stop()
+
+asgi_app = Starlette(
+    routes=[
+        Route('/video_feed', video_feed),
+        Route('/cameras/{name}/video_feed', video_feed),
+        Route('/landmarks_feed', landmarks_feed),
+        Route('/cameras/{name}/landmarks_feed', landmarks_feed),
+        Route('/streams', streams_status),
+        Mount('/', app=WSGIMiddleware(server.app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
+
+def main():
+    import uvicorn
+
+    print("🚀 Servidor assíncrono (ASGI) em http://localhost:5000")
+    uvicorn.run(asgi_app, host='0.0.0.0', port=5000, log_level='info' if server.DEBUG else 'warning')
+
+if __name__ == '__main__':
+    main()
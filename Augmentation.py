@@ -0,0 +1,135 @@
+import numpy as np
+
+from Preprocessing import NUM_LANDMARKS
+
+def rotation_matrices(angles):
+    """
+    builds one 3D rotation matrix (Rz @ Ry @ Rx) per row of angles
+
+    Args:
+        angles(np.ndarray): (B,3) rotation around x, y and z in radians
+
+    Output:
+        matrices(np.ndarray): (B,3,3)
+    """
+    cos_x, cos_y, cos_z = np.cos(angles).T
+    sin_x, sin_y, sin_z = np.sin(angles).T
+
+    matrices = np.empty((len(angles), 3, 3), dtype='float32')
+    matrices[:, 0, 0] = cos_z*cos_y
+    matrices[:, 0, 1] = cos_z*sin_y*sin_x - sin_z*cos_x
+    matrices[:, 0, 2] = cos_z*sin_y*cos_x + sin_z*sin_x
+    matrices[:, 1, 0] = sin_z*cos_y
+    matrices[:, 1, 1] = sin_z*sin_y*sin_x + cos_z*cos_x
+    matrices[:, 1, 2] = sin_z*sin_y*cos_x - cos_z*sin_x
+    matrices[:, 2, 0] = -sin_y
+    matrices[:, 2, 1] = cos_y*sin_x
+    matrices[:, 2, 2] = cos_y*cos_x
+
+    return matrices
+
+class LandmarkAugmenter:
+    """
+    random augmentation of padded landmark batches, done with whole batch NumPy operations
+
+    Every transform keeps the all zero frames (padding and hands not detected) at zero, so the
+    FrameMask of the model still sees the same valid frames.
+
+    Args:
+        rotation_degrees(float): maximum rotation around each axis
+        scale_range(tuple): range of the random uniform scale
+        jitter_std(float): standard deviation of the gaussian noise added to each coordinate
+        speed_range(tuple): range of the temporal speed factor (>1 plays the sign faster)
+        frame_dropout(float): probability of dropping a frame (the previous frame is repeated)
+        mirror_probability(float): probability of mirroring a clip, swapping the right and left inputs
+        seed(int): seed of the random generator
+    """
+    def __init__(self, rotation_degrees = 10.0, scale_range = (0.9, 1.1), jitter_std = 0.01, speed_range = (0.8, 1.25), frame_dropout = 0.05, mirror_probability = 0.5, seed = None):
+        self.rotation_degrees = rotation_degrees
+        self.scale_range = scale_range
+        self.jitter_std = jitter_std
+        self.speed_range = speed_range
+        self.frame_dropout = frame_dropout
+        self.mirror_probability = mirror_probability
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, local_right, local_left, global_right, global_left):
+        """
+        augments one batch
+
+        Args:
+            local_right, local_left(np.ndarray): (B,T,63) local landmarks
+            global_right, global_left(np.ndarray): (B,T,3) wrist trajectories
+
+        Output:
+            list of the four augmented arrays with the same shapes
+        """
+        batch, steps = local_right.shape[:2]
+
+        local = np.stack([local_right, local_left], axis=1).reshape(batch, 2, steps, NUM_LANDMARKS, 3)
+        wrist = np.stack([global_right, global_left], axis=1)
+
+        local, wrist = self.mirror(local, wrist)
+        local, wrist = self.warp_time(local, wrist)
+
+        local_present = np.any(local != 0, axis=(3, 4))[..., None, None]
+        wrist_present = np.any(wrist != 0, axis=3)[..., None]
+
+        local, wrist = self.transform_space(local, wrist)
+
+        if self.jitter_std:
+            local += self.rng.normal(0.0, self.jitter_std, local.shape).astype('float32')*local_present
+            wrist += self.rng.normal(0.0, self.jitter_std, wrist.shape).astype('float32')*wrist_present
+
+        local = local.reshape(batch, 2, steps, NUM_LANDMARKS*3)
+        return [local[:, 0], local[:, 1], wrist[:, 0], wrist[:, 1]]
+
+    def mirror(self, local, wrist):
+        """
+        mirrors the x axis and swaps the hands of a random subset of the batch
+        """
+        flip = self.rng.random(len(local)) < self.mirror_probability
+        if flip.any():
+            sign = np.array([-1.0, 1.0, 1.0], dtype='float32')
+            local[flip] = local[flip][:, ::-1]*sign
+            wrist[flip] = wrist[flip][:, ::-1]*sign
+        return local, wrist
+
+    def warp_time(self, local, wrist):
+        """
+        resamples each clip at a random speed and drops random frames, with one gather per array
+        """
+        batch, _, steps = wrist.shape[:3]
+
+        valid = np.any(local != 0, axis=(1, 3, 4)) | np.any(wrist != 0, axis=(1, 3))
+        lengths = np.where(valid.any(axis=1), steps - np.argmax(valid[:, ::-1], axis=1), 0)
+
+        speed = self.rng.uniform(*self.speed_range, size=(batch, 1))
+        positions = np.arange(steps)[None, :]*speed
+        inside = positions < lengths[:, None]
+        source = np.minimum(positions.astype(np.int64), np.maximum(lengths - 1, 0)[:, None])
+
+        if self.frame_dropout:
+            drop = self.rng.random((batch, steps)) < self.frame_dropout
+            drop[:, 0] = False
+            kept = np.maximum.accumulate(np.where(drop, 0, np.arange(steps)[None, :]), axis=1)
+            source = np.take_along_axis(source, kept, axis=1)
+
+        local = np.take_along_axis(local, source[:, None, :, None, None], axis=2)*inside[:, None, :, None, None]
+        wrist = np.take_along_axis(wrist, source[:, None, :, None], axis=2)*inside[:, None, :, None]
+
+        return local.astype('float32'), wrist.astype('float32')
+
+    def transform_space(self, local, wrist):
+        """
+        applies a random small rotation and scale per clip to the landmarks and the wrist trajectory
+        """
+        batch = len(local)
+        angles = np.deg2rad(self.rng.uniform(-self.rotation_degrees, self.rotation_degrees, size=(batch, 3)))
+        scale = self.rng.uniform(*self.scale_range, size=batch).astype('float32')
+        matrices = rotation_matrices(angles)*scale[:, None, None]
+
+        local = np.einsum('bhtlc,bdc->bhtld', local, matrices, optimize=True)
+        wrist = np.einsum('bhtc,bdc->bhtd', wrist, matrices, optimize=True)
+
+        return local, wrist
@@ -0,0 +1,36 @@
+import numpy as np
+from keras.utils import PyDataset
+
+from Preprocessing import DEFAULT_BUCKET_BOUNDARIES, pad_clips, make_bucketed_batches
+
+class BucketedClips(PyDataset):
+    """
+    feeds clips grouped by length, each batch padded only up to its bucket length
+
+    When augment is given (e.g. a LandmarkAugmenter), it is applied to every batch as it is built,
+    so augmented clips are never stored.
+    """
+    def __init__(self, clips, labels, batch_size = 32, boundaries = DEFAULT_BUCKET_BOUNDARIES, shuffle = True, seed = None, augment = None, **kwargs):
+        super().__init__(**kwargs)
+        self.clips = clips
+        self.augment = augment
+        self.labels = np.asarray(labels)
+        self.batch_size = batch_size
+        self.boundaries = boundaries
+        self.rng = np.random.default_rng(seed) if shuffle else None
+        self.lengths = [len(clip[0]) for clip in clips]
+        self.batches = make_bucketed_batches(self.lengths, batch_size, boundaries, self.rng)
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __getitem__(self, index):
+        indices, length = self.batches[index]
+        inputs = pad_clips([self.clips[i] for i in indices], length)
+        if self.augment is not None:
+            inputs = self.augment(*inputs)
+        return tuple(inputs), self.labels[indices]
+
+    def on_epoch_end(self):
+        if self.rng is not None:
+            self.batches = make_bucketed_batches(self.lengths, self.batch_size, self.boundaries, self.rng)
@@ -0,0 +1,212 @@
+"""
+camera pipelines: every configured camera has its own capture thread, hand detector and recognition
+state, and any number of viewers share the frames it captures
+
+STL_CAMERAS lists the cameras as name=source pairs separated by ";" (a device index, a stream URL or
+a video file, which is replayed in a loop at its own frame rate), e.g.:
+    STL_CAMERAS="entrada=0;balcao=1;demo=gravacao.mp4"
+"""
+import copy
+import os
+import threading
+import time
+
+import cv2
+
+from FramePool import CapturePipeline
+from Segmentation import MotionSegmenter
+
+def parse_cameras(spec):
+    """
+    Args:
+        spec(str): "name=source;name=source", or just "source;source" (named camera0, camera1...)
+
+    Output:
+        cameras(list): (name, source) pairs, with device indices as int
+    """
+    cameras = []
+    for index, item in enumerate(part.strip() for part in spec.split(";")):
+        if not item:
+            continue
+        name, source = item.split("=", 1) if "=" in item else (f"camera{index}", item)
+        source = source.strip()
+        cameras.append((name.strip(), int(source) if source.isdigit() else source))
+    return cameras
+
+class CameraPipeline:
+    """
+    one camera: a capture thread that reads, mirrors and processes every frame, plus the recognition
+    state of that camera (recording, streaming classifier, automatic segmentation, prediction)
+
+    process_frame(camera, frame_buffer, capture) runs in the capture thread for every frame (capture
+    is the CapturePipeline, for its rgb() conversion) and returns the detection results or None;
+    viewers then get the frame and its results with wait_frame().
+
+    Args:
+        name(str): camera name, used in the routes
+        source(int or str): device index, stream URL or video file
+        create_detector(callable): returns a new hand detector for this camera
+        process_frame(callable): per frame processing, see above
+        pool_size(int): preallocated frames of the CapturePipeline
+        realtime(bool): replay video files at their frame rate (False reads them as fast as
+            possible, for benchmarks)
+    """
+    def __init__(self, name, source, create_detector, process_frame, pool_size = 8, realtime = True):
+        self.name = name
+        self.source = source
+        self.create_detector = create_detector
+        self.process_frame = process_frame
+        self.pool_size = pool_size
+        self.realtime = realtime
+        self.replay = isinstance(source, str) and os.path.isfile(source)
+        self.detector = None
+
+        # Estado de reconhecimento desta câmera
+        self.current_prediction = "Aguardando gravação..."
+        self.is_recording = False
+        self.recorded_frames = []
+        self.latest_job_id = None  # só o job mais recente publica em current_prediction
+        self.recording_bundle = None  # bundle que acompanha a gravação atual em streaming
+        self.streaming_classifier = None  # cópia do classificador em streaming do recording_bundle (streaming_classifier_for)
+        self._streaming_source = None
+        self._streaming_copy = None
+        self.streamed_frames = 0
+        self.streamed_landmarks = []
+        self.streaming_lock = threading.Lock()
+        self.auto_mode = False
+        self.segmenter = MotionSegmenter()
+        self.latest_landmarks = {'frame': 0, 'hands': []}
+
+        self.viewers = 0
+        self.frames_captured = 0
+        self.frames_detected = 0
+        self.running = False
+        self._latest = None  # (sequência, FrameBuffer, resultados) do último frame
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._capture_loop, name=f"camera-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def reload_detector(self):
+        """
+        replaces the detector (e.g. after a bundle with its own hand model is loaded)
+        """
+        self.detector = self.create_detector()
+
+    def streaming_classifier_for(self, bundle):
+        """
+        this camera's copy of the bundle's streaming classifier (a classifier holds the state of one
+        clip, so cameras recording at the same time can't share it), or None if the bundle has none
+        """
+        if bundle is None or bundle.streaming_classifier is None:
+            return None
+        if self._streaming_source is not bundle.streaming_classifier:
+            self._streaming_copy = copy.deepcopy(bundle.streaming_classifier)
+            self._streaming_source = bundle.streaming_classifier
+        return self._streaming_copy
+
+    def add_viewer(self):
+        with self._condition:
+            self.viewers += 1
+
+    def remove_viewer(self):
+        with self._condition:
+            self.viewers -= 1
+
+    def _open(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            print(f"✗ Câmera {self.name}: não foi possível abrir {self.source}")
+            return None, 0.0
+        # Um vídeo é reproduzido no próprio fps, como se fosse uma câmera ao vivo
+        interval = 1.0 / (capture.get(cv2.CAP_PROP_FPS) or 30.0) if self.replay and self.realtime else 0.0
+        return capture, interval
+
+    def _capture_loop(self):
+        capture, interval = self._open()
+        if capture is None:
+            self.running = False
+            return
+        if self.detector is None:
+            self.detector = self.create_detector()
+
+        pipeline = CapturePipeline(capture, self.pool_size)
+        next_frame = time.perf_counter()
+        try:
+            while self.running:
+                frame_buffer = pipeline.read()
+                if frame_buffer is None:
+                    if self.replay:
+                        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    print(f"✗ Câmera {self.name}: sem frames de {self.source}")
+                    break
+
+                try:
+                    self.frames_captured += 1
+                    results = self.process_frame(self, frame_buffer, pipeline)
+                    if results is not None:
+                        self.frames_detected += 1
+                    self._publish(frame_buffer, results)
+                finally:
+                    frame_buffer.release()
+
+                if interval:
+                    next_frame = max(next_frame + interval, time.perf_counter() - interval)
+                    time.sleep(max(0.0, next_frame - time.perf_counter()))
+        finally:
+            self.running = False
+            with self._condition:
+                if self._latest is not None:
+                    self._latest[1].release()
+                    self._latest = None
+                self._condition.notify_all()
+            capture.release()
+
+    def _publish(self, frame_buffer, results):
+        with self._condition:
+            previous = self._latest
+            self._sequence += 1
+            self._latest = (self._sequence, frame_buffer.retain(), results)
+            self._condition.notify_all()
+        if previous is not None:
+            previous[1].release()
+
+    def wait_frame(self, last_sequence, timeout = 1.0):
+        """
+        waits for a frame newer than last_sequence
+
+        Output:
+            (sequence, frame_buffer, results) with a reference to frame_buffer owned by the caller,
+            or None on timeout or when the camera stopped
+        """
+        with self._condition:
+            if self._latest is None or self._latest[0] == last_sequence:
+                self._condition.wait(timeout)
+            if self._latest is None or self._latest[0] == last_sequence:
+                return None
+            sequence, frame_buffer, results = self._latest
+            return sequence, frame_buffer.retain(), results
+
+    def status(self):
+        return {
+            "name": self.name,
+            "source": str(self.source),
+            "running": self.running,
+            "viewers": self.viewers,
+            "frames_captured": self.frames_captured,
+            "frames_detected": self.frames_detected,
+            "is_recording": self.is_recording,
+            "auto_mode": self.auto_mode,
+            "prediction": self.current_prediction,
+        }
@@ -0,0 +1,251 @@
+"""
+append-only log of the recordings classified in production, to grow the dataset
+
+Each sample is one JSON line with the predicted sign, the confidence, the model version, a timestamp
+and the landmarks of the clip as base64 float32 arrays (local_right (T,63), local_left (T,63),
+wrist_right (T,3), wrist_left (T,3), the wrists in image coordinates as the server sees them).
+Samples are queued without blocking and a background thread writes them in batches, each batch one
+gzip member appended to a .jsonl.gz file (concatenated members are still a valid gzip file, and a
+crash loses at most the batch being written).
+
+Usage:
+    python CaptureLog.py list captures
+    python CaptureLog.py import captures --corrections corrections.csv --data data
+    python CaptureLog.py import captures --accept-above 0.95 --data data
+"""
+import base64
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import numpy as np
+
+LANDMARK_ARRAYS = ("local_right", "local_left", "wrist_right", "wrist_left")
+
+def encode_landmarks(clip_landmarks):
+    from Preprocessing import clip_to_arrays
+
+    arrays = clip_to_arrays(*zip(*clip_landmarks)) if clip_landmarks else [np.zeros((0, 0), dtype='float32')]*4
+    return {name: base64.b64encode(np.ascontiguousarray(array, dtype='<f4').tobytes()).decode() for name, array in zip(LANDMARK_ARRAYS, arrays)}
+
+def decode_landmarks(encoded):
+    """
+    Output:
+        local_right (T,63), local_left (T,63), wrist_right (T,3), wrist_left (T,3) float32 arrays
+    """
+    features = {"local_right": 63, "local_left": 63, "wrist_right": 3, "wrist_left": 3}
+    return tuple(np.frombuffer(base64.b64decode(encoded[name]), dtype='<f4').reshape(-1, features[name]) for name in LANDMARK_ARRAYS)
+
+class CaptureLog:
+    """
+    background writer of production samples
+
+    Args:
+        directory(str): where the log files are written, one per day and process
+        batch_size(int): samples compressed and written together
+        flush_interval(float): seconds after which a partial batch is written anyway
+        max_pending(int): samples waiting to be written; beyond it new samples are dropped (and
+            counted) instead of blocking the caller
+    """
+    def __init__(self, directory, batch_size = 32, flush_interval = 5.0, max_pending = 1000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._write_loop, name="capture-log", daemon=True)
+        self._thread.start()
+
+    def log(self, source, clip_landmarks, prediction, confidence, model_version):
+        """
+        queues one clip; never blocks
+
+        Args:
+            source(str): where the clip came from ("recording", "segment", "upload")
+            clip_landmarks(list): (local_right, local_left, wrist_right, wrist_left) of each frame
+            prediction(str): predicted sign
+            confidence(float): confidence of the prediction
+            model_version(str): version of the bundle that classified it
+
+        Output:
+            sample_id(str), or None if the sample was dropped
+        """
+        sample = {
+            "id": uuid.uuid4().hex[:12],
+            "timestamp": time.time(),
+            "source": source,
+            "prediction": prediction,
+            "confidence": confidence,
+            "model_version": model_version,
+            "landmarks": clip_landmarks,
+        }
+        try:
+            self._queue.put_nowait(sample)
+        except queue.Full:
+            self.dropped += 1
+            return None
+        self.logged += 1
+        return sample["id"]
+
+    def flush(self, timeout = None):
+        """
+        waits until every queued sample is written
+        """
+        self._queue.put(None, timeout=timeout)
+        self._queue.join()
+
+    def status(self):
+        return {
+            "directory": self.directory,
+            "logged": self.logged,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "bytes_written": self.bytes_written,
+        }
+
+    def _path(self):
+        return os.path.join(self.directory, f"captures-{time.strftime('%Y%m%d')}-{os.getpid()}.jsonl.gz")
+
+    def _write_loop(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    sample = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if sample is None:  # flush(): grava o lote parcial agora
+                    self._queue.task_done()
+                    break
+                batch.append(sample)
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    print(f"✗ Erro ao gravar o log de capturas: {e}")
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        # A conversão dos landmarks acontece aqui, fora da thread que registrou a amostra
+        lines = "".join(json.dumps(dict(sample, landmarks=encode_landmarks(sample["landmarks"])), separators=(',', ':')) + "\n" for sample in batch)
+        data = gzip.compress(lines.encode(), compresslevel=1)
+        with open(self._path(), 'ab') as f:
+            f.write(data)
+        self.written += len(batch)
+        self.bytes_written += len(data)
+
+def read_samples(path):
+    """
+    reads the samples of a log file, or of every log file in a directory
+
+    Output:
+        generator of sample dicts
+    """
+    files = sorted(glob.glob(os.path.join(path, "*.jsonl.gz"))) if os.path.isdir(path) else [path]
+    for file in files:
+        with gzip.open(file, 'rt') as f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (EOFError, json.JSONDecodeError):
+                pass  # lote incompleto no fim de um arquivo interrompido
+
+def load_corrections(corrections_path):
+    """
+    reads a CSV of "sample_id,label" lines (an empty label or "-" skips the sample)
+    """
+    import csv
+
+    corrections = {}
+    with open(corrections_path, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and row[0].strip() and not row[0].startswith("#"):
+                corrections[row[0].strip()] = row[1].strip()
+    return corrections
+
+def import_samples(log_path, data_dir = r"data", corrections = None, accept_above = None):
+    """
+    writes logged samples as DataCollection clips (data/<label>/<n>.p), ready for DataFormater.data_format()
+    or HeadTuning
+
+    The logged wrists are in image coordinates; they are normalized over the whole clip like
+    DataCollection.normalize_wrist_coords, so imported clips follow the convention of the collected ones.
+
+    Args:
+        log_path(str): log file or directory
+        data_dir(str): dataset directory
+        corrections(dict): sample id -> correct label; samples with a correction always use it
+        accept_above(float): samples without a correction are imported with their predicted label
+            when the confidence is at least this (None: only corrected samples are imported)
+
+    Output:
+        imported(dict): number of clips written per label
+    """
+    import pickle
+    from LandmarkData import NormalizedLandmarkResult
+    from Preprocessing import normalize_clip_wrists
+
+    corrections = corrections or {}
+    imported = {}
+    for sample in read_samples(log_path):
+        label = corrections.get(sample["id"])
+        if label is None and accept_above is not None and sample["confidence"] >= accept_above:
+            label = sample["prediction"]
+        if not label or label == "-":
+            continue
+
+        local_right, local_left, wrist_right, wrist_left = normalize_clip_wrists(*decode_landmarks(sample["landmarks"]))
+        clip = NormalizedLandmarkResult(
+            normalized_landmarks_right=[[tuple(point) for point in frame.reshape(21, 3).tolist()] for frame in local_right],
+            normalized_landmarks_left=[[tuple(point) for point in frame.reshape(21, 3).tolist()] for frame in local_left],
+            wrist_right=[tuple(point) for point in wrist_right.tolist()],
+            wrist_left=[tuple(point) for point in wrist_left.tolist()],
+        )
+
+        sign_dir = os.path.join(data_dir, label)
+        os.makedirs(sign_dir, exist_ok=True)
+        numbers = [int(os.path.splitext(name)[0]) for name in os.listdir(sign_dir) if name.endswith(".p") and os.path.splitext(name)[0].isdigit()]
+        with open(os.path.join(sign_dir, f"{max(numbers, default=-1) + 1}.p"), 'wb') as f:
+            pickle.dump(clip, f)
+        imported[label] = imported.get(label, 0) + 1
+
+    return imported
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lista ou importa as gravações do log de capturas")
+    parser.add_argument("command", choices=["list", "import"])
+    parser.add_argument("log", help="arquivo .jsonl.gz ou diretório do log")
+    parser.add_argument("--corrections", help="CSV com linhas id,sinal_correto")
+    parser.add_argument("--accept-above", type=float, help="importa também as predições com confiança a partir deste valor")
+    parser.add_argument("--data", default="data")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for sample in read_samples(args.log):
+            when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sample["timestamp"]))
+            print(f"{sample['id']}  {when}  {sample['source']:<10}{sample['prediction']:<20}{sample['confidence']*100:6.1f}%  {len(decode_landmarks(sample['landmarks'])[0])} frames")
+        return
+
+    corrections = load_corrections(args.corrections) if args.corrections else None
+    imported = import_samples(args.log, args.data, corrections, args.accept_above)
+    for label, count in sorted(imported.items()):
+        print(f"   {label}: {count} clipe(s)")
+    print(f"✓ {sum(imported.values())} clipes importados em {args.data}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import io
+
+import cv2
+
+CHUNK_SIZE = 64*1024
+
+class UploadStream(io.BufferedIOBase):
+    """
+    seekable view of a non-seekable upload (e.g. Flask's request.stream) for cv2.VideoCapture
+
+    Bytes are read from the upload only when the decoder asks for them and are kept in memory so it
+    can seek back (mp4 files may keep their index at the end). Nothing is written to disk and at
+    most max_bytes are ever held.
+
+    Args:
+        stream: file-like object with read(size)
+        max_bytes(int): upload size limit; beyond it the stream ends and exceeded is set
+        size(int): total size when known (Content-Length), so finding the end of the file doesn't
+            require reading the whole upload
+    """
+    def __init__(self, stream, max_bytes, size = None):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.size = size
+        self.exceeded = False
+        self._stream = stream
+        self._buffer = bytearray()
+        self._position = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def bytes_read(self):
+        return len(self._buffer)
+
+    def _fill(self, end):
+        end = min(end, self.max_bytes)
+        while len(self._buffer) < end and not self._eof:
+            chunk = self._stream.read(min(CHUNK_SIZE, self.max_bytes - len(self._buffer)))
+            if not chunk:
+                self._eof = True
+                break
+            self._buffer += chunk
+
+        if len(self._buffer) >= self.max_bytes and not self._eof:
+            self._eof = True
+            self.exceeded = bool(self._stream.read(1))
+
+    def read(self, size = -1):
+        end = self.max_bytes if size is None or size < 0 else self._position + size
+        self._fill(end)
+        data = bytes(self._buffer[self._position:end])
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence = io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif self.size is not None:
+            position = self.size + offset
+        else:
+            self._fill(self.max_bytes)
+            position = len(self._buffer) + offset
+        self._fill(position)
+        self._position = max(0, min(position, len(self._buffer)))
+        return self._position
+
+    def tell(self):
+        return self._position
+
+def decode_frames(stream, max_frames):
+    """
+    decodes the frames of a video file object one at a time
+
+    Stopping the iteration (e.g. once the model has all the frames it needs) stops the decoding,
+    so the rest of the upload is never read.
+
+    Args:
+        stream(io.BufferedIOBase): video file object (webm, mp4, avi...)
+        max_frames(int): at most this many frames are decoded
+
+    Output:
+        generator of BGR frames
+
+    Raises:
+        ValueError if the stream can't be opened as a video
+    """
+    capture = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+    if not capture.isOpened():
+        raise ValueError("não foi possível decodificar o vídeo")
+
+    try:
+        for _ in range(max_frames):
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        capture.release()
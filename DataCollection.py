@@ -5,29 +5,14 @@ from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 import pickle
 
+from LandmarkData import NormalizedLandmarkResult
+
 class CameraIdNotValidError(Exception):
     pass
 
 class CameraNotLoadedError(Exception):
     pass
 
-class NormalizedLandmarkResult:
-    def __init__(self, normalized_landmarks_right, normalized_landmarks_left, wrist_right, wrist_left):
-        self.normalized_landmarks_right = normalized_landmarks_right
-        self.normalized_landmarks_left = normalized_landmarks_left
-        self.wrist_right = wrist_right
-        self.wrist_left = wrist_left
-
-    def __repr__(self):
-        return f"""
-        (
-            normalized_landmarks_right = {self.normalized_landmarks_right!r}
-            normalized_landmarks_left = {self.normalized_landmarks_left!r}
-            wrist_right = {self.wrist_right!r}
-            wrist_left = {self.wrist_left!r}
-        )
-        """
-
 def load_hand_model(hand_model_path):
     """
     loads mediapipe landmark detection task
@@ -0,0 +1,237 @@
+"""
+content-addressed cache of preprocessed datasets
+
+An entry holds the final arrays of a dataset (padded tensors or preprocessed clips) and its label
+encoding. Its key is the hash of the dataset content (all_data.p, or every .p file of a directory)
+plus the preprocessing parameters and PREPROCESSING_VERSION, so a change in the data or in the
+preprocessing misses the cache instead of returning stale arrays. Entries are uncompressed .npz
+files, read back in a fraction of the time of unpickling and preprocessing the dataset; when the
+cache grows beyond max_bytes the least recently used entries are deleted.
+
+STL_DATASET_CACHE sets the directory ("0" disables the cache) and STL_DATASET_CACHE_MB its size.
+
+Usage:
+    python DatasetCache.py list
+    python DatasetCache.py clear
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+# Incrementar quando clip_to_arrays, prepare_clip, pad_data ou a normalização dos landmarks mudarem
+PREPROCESSING_VERSION = 2
+
+INPUT_NAMES = ("local_right", "local_left", "global_right", "global_left")
+
+_file_hashes = {}  # (caminho, tamanho, mtime) -> sha256, para não reler o mesmo arquivo no mesmo processo
+
+def dataset_files(path):
+    """
+    the .p files of a dataset: the file itself, or every .p file under a directory
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "**", "*.p"), recursive=True))
+    return [path]
+
+def _file_hash(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+def dataset_hash(path):
+    """
+    hash of the content of a dataset (and, for a directory, of the relative path of each file, which
+    gives the label of per clip files)
+    """
+    digest = hashlib.sha256()
+    root = path if os.path.isdir(path) else os.path.dirname(path)
+    for file in dataset_files(path):
+        relative = os.path.relpath(file, root) if os.path.isdir(path) else ""
+        digest.update(f"{relative}\0{_file_hash(file)}\0".encode())
+    return digest.hexdigest()
+
+def cache_key(dataset, **parameters):
+    """
+    key of a preprocessed version of a dataset
+
+    Args:
+        dataset(str): dataset_hash of the data
+        parameters: preprocessing parameters (maxlen, padding, resample_length...)
+    """
+    description = dict(parameters, dataset=dataset, version=PREPROCESSING_VERSION)
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:32]
+
+def pack_clips(clips):
+    """
+    variable length clips as concatenated arrays plus the length of each clip (the format of the cache)
+
+    Args:
+        clips(list): (local_right, local_left, global_right, global_left) array tuples
+
+    Output:
+        arrays(dict): "lengths" and one concatenated array per input
+    """
+    arrays = {"lengths": np.array([len(clip[0]) for clip in clips], dtype='int64')}
+    for position, name in enumerate(INPUT_NAMES):
+        features = clips[0][position].shape[1] if clips else 0
+        arrays[name] = np.concatenate([clip[position] for clip in clips]) if clips else np.zeros((0, features), dtype='float32')
+    return arrays
+
+def unpack_clips(arrays):
+    """
+    inverse of pack_clips: list of (local_right, local_left, global_right, global_left) array tuples
+    """
+    boundaries = np.cumsum(arrays["lengths"])[:-1]
+    return list(zip(*(np.split(arrays[name], boundaries) for name in INPUT_NAMES)))
+
+class DatasetCache:
+    """
+    directory of cached datasets with LRU eviction
+
+    Args:
+        directory(str): where the entries are stored
+        max_bytes(int): total size kept; beyond it the least recently used entries are deleted
+    """
+    def __init__(self, directory = r"dataset_cache", max_bytes = 2*1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Output:
+            arrays(dict) of the entry, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Entrada inválida no cache de datasets ({e}), recalculando")
+            os.remove(path)
+            return None
+        os.utime(path)  # último uso, para a ordem do LRU
+        return arrays
+
+    def put(self, key, arrays):
+        """
+        stores an entry (through a temporary file, so a reader never sees a partial entry) and evicts
+        the least recently used entries beyond max_bytes
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        partial_path = f"{path}.{os.getpid()}.partial"
+        with open(partial_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(partial_path, path)
+        self.evict(keep=path)
+
+    def entries(self):
+        """
+        Output:
+            entries(list): (path, bytes, last use) of each entry, most recently used first
+        """
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*.npz")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2], reverse=True)
+
+    def evict(self, keep = None):
+        """
+        deletes the least recently used entries until the cache fits in max_bytes (never keep)
+
+        Output:
+            removed(int): entries deleted
+        """
+        total = 0
+        removed = 0
+        for path, size, _ in self.entries():
+            total += size
+            if total > self.max_bytes and path != keep:
+                os.remove(path)
+                total -= size
+                removed += 1
+        return removed
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+def default_cache():
+    """
+    cache configured by STL_DATASET_CACHE and STL_DATASET_CACHE_MB, or None if disabled
+    """
+    directory = os.environ.get('STL_DATASET_CACHE', 'dataset_cache')
+    if directory == '0':
+        return None
+    return DatasetCache(directory, int(float(os.environ.get('STL_DATASET_CACHE_MB', '2048'))*1024**2))
+
+def load_cached(data_path, build, cache = None, **parameters):
+    """
+    arrays of a preprocessed dataset from the cache, built and stored on a miss
+
+    Args:
+        data_path(str): dataset file or directory
+        build(callable): returns the arrays (dict of numpy arrays) when they aren't cached
+        cache(DatasetCache): None uses default_cache()
+        parameters: preprocessing parameters that, with the dataset content, form the key
+
+    Output:
+        arrays(dict)
+    """
+    cache = cache or default_cache()
+    if cache is None:
+        return build()
+
+    start = time.perf_counter()
+    key = cache_key(dataset_hash(data_path), **parameters)
+    arrays = cache.get(key)
+    if arrays is not None:
+        print(f"📦 {data_path} pré-processado lido do cache em {time.perf_counter() - start:.2f}s")
+        return arrays
+
+    arrays = build()
+    cache.put(key, arrays)
+    return arrays
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mostra ou limpa o cache de datasets pré-processados")
+    parser.add_argument("command", choices=["list", "clear"])
+    args = parser.parse_args()
+
+    cache = default_cache()
+    if cache is None:
+        raise SystemExit("Cache desativado (STL_DATASET_CACHE=0)")
+
+    if args.command == "clear":
+        cache.clear()
+        print(f"✓ {cache.directory} limpo")
+        return
+
+    entries = cache.entries()
+    for path, size, last_use in entries:
+        print(f"{os.path.basename(path)}  {size/1024**2:8.1f} MB  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_use))}")
+    print(f"{len(entries)} entradas, {sum(entry[1] for entry in entries)/1024**2:.1f} MB de {cache.max_bytes/1024**2:.0f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+offline evaluation of a trained model over a consolidated dataset, in large batches
+
+Usage:
+    python Evaluation.py --data all_data.p --bundle ModelY2.0.stlbundle
+    python Evaluation.py --data data --model ModelY2.0.keras --encoder Encoder.p
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+def load_dataset(data_path = r"all_data.p", cache = None):
+    """
+    loads the clips of a consolidated dataset
+
+    The clips converted to arrays are kept in the dataset cache (DatasetCache.py), so later runs
+    over the same data skip the unpickling and the conversion.
+
+    Args:
+        data_path(str): an all_data.p file, or a directory with consolidated .p files and/or the
+            per clip .p files of DataCollection (data/<sign>/<n>.p, labelled by their directory)
+        cache(DatasetCache): None uses the default cache
+
+    Output:
+        labels(list): sign of each clip
+        clips(list): (local_right, local_left, global_right, global_left) float32 arrays of each clip
+    """
+    from DatasetCache import dataset_files, load_cached, pack_clips, unpack_clips
+    from Preprocessing import clip_to_arrays
+
+    def build():
+        from ModelDevelopment import open_data, unpack_data
+
+        labels = []
+        clips = []
+        for file in dataset_files(data_path):
+            data = open_data(file)
+            if hasattr(data, "video_landmark"):
+                file_labels, *movements = unpack_data(data)
+                labels.extend(file_labels)
+                clips.extend(zip(*movements))
+            else:
+                movements = unpack_data(data, testing=True)
+                labels.append(os.path.basename(os.path.dirname(file)))
+                clips.extend(zip(*movements))
+
+        return dict(pack_clips([clip_to_arrays(*clip) for clip in clips]), labels=np.array([str(label) for label in labels]))
+
+    arrays = load_cached(data_path, build, cache, format="arrays")
+    return arrays["labels"].tolist(), unpack_clips(arrays)
+
+def evaluate(bundle, labels, clips, batch_size = 1024, latency_repeats = 20):
+    """
+    classifies every clip with the bundle's preprocessing and model and computes the metrics
+
+    The clips are preprocessed once into padded arrays and classified in batches of batch_size
+    with predict_on_batch, so the cost per clip is a fraction of a single prediction.
+
+    Args:
+        bundle(ModelBundle): model to evaluate
+        labels(list): true sign of each clip
+        clips(list): landmark lists of each clip
+        batch_size(int): clips per prediction batch
+        latency_repeats(int): predictions of a single clip used to measure the latency of one clip
+
+    Output:
+        report(dict): accuracy, per class metrics, confusion matrix and timings, or None when no
+            clip is of a sign the model knows
+    """
+    from sklearn.metrics import classification_report, confusion_matrix
+    from Preprocessing import pad_clips
+
+    classes = [str(label) for label in bundle.encoder.classes_]
+    class_index = {label: index for index, label in enumerate(classes)}
+    known = [index for index, label in enumerate(labels) if str(label) in class_index]
+    unknown = sorted({str(labels[index]) for index in set(range(len(labels))) - set(known)})
+    if not known:
+        print(f"❌ Nenhum clipe dos sinais do modelo ({', '.join(classes)}); sinais nos dados: {', '.join(unknown) or 'nenhum'}")
+        return None
+
+    start = time.perf_counter()
+    inputs = pad_clips([bundle.prepare_clip(*clips[index]) for index in known], bundle.maxlen)
+    preprocessing_seconds = time.perf_counter() - start
+
+    bundle.model.predict_on_batch([array[:batch_size] for array in inputs])  # tracing fora da medição
+    start = time.perf_counter()
+    probabilities = np.concatenate([
+        bundle.model.predict_on_batch([array[begin:begin+batch_size] for array in inputs])
+        for begin in range(0, len(known), batch_size)
+    ])
+    inference_seconds = time.perf_counter() - start
+
+    single = [array[:1] for array in inputs]
+    times = []
+    for _ in range(latency_repeats):
+        start = time.perf_counter()
+        bundle.model.predict_on_batch(single)
+        times.append(time.perf_counter() - start)
+
+    true_labels = np.array([class_index[str(labels[index])] for index in known])
+    predicted_labels = np.argmax(probabilities, axis=1)
+    label_range = list(range(len(classes)))
+
+    return {
+        "clips": len(known),
+        "unknown_labels": unknown,
+        "accuracy": float(np.mean(true_labels == predicted_labels)),
+        "per_class": classification_report(true_labels, predicted_labels, labels=label_range, target_names=classes, zero_division=0, output_dict=True),
+        "classes": classes,
+        "confusion_matrix": confusion_matrix(true_labels, predicted_labels, labels=label_range).tolist(),
+        "preprocessing_seconds": preprocessing_seconds,
+        "inference_seconds": inference_seconds,
+        "clips_per_second": len(known)/(preprocessing_seconds + inference_seconds),
+        "batched_ms_per_clip": 1000*inference_seconds/len(known),
+        "single_clip_ms": 1000*float(np.median(times)),
+    }
+
+def print_report(report):
+    if report is None:
+        return
+    classes = report["classes"]
+
+    print(f"{report['clips']} clipes avaliados")
+    if report["unknown_labels"]:
+        print(f"⚠️ Sinais fora do modelo (ignorados): {', '.join(report['unknown_labels'])}")
+    print(f"Acurácia: {report['accuracy']*100:.2f}%\n")
+
+    print(f"{'sinal':<20}{'precisão':>10}{'recall':>9}{'f1':>8}{'clipes':>8}")
+    for label in classes:
+        metrics = report["per_class"][label]
+        print(f"{label:<20}{metrics['precision']*100:>9.1f}%{metrics['recall']*100:>8.1f}%{metrics['f1-score']:>8.3f}{int(metrics['support']):>8}")
+
+    print("\nMatriz de confusão (linhas: sinal real, colunas: previsto)")
+    width = max(6, max(len(label) for label in classes) + 1)
+    print(" "*width + "".join(f"{label:>{width}}" for label in classes))
+    for label, row in zip(classes, report["confusion_matrix"]):
+        print(f"{label:<{width}}" + "".join(f"{count:>{width}}" for count in row))
+
+    print(f"\nPré-processamento: {report['preprocessing_seconds']:.2f}s, inferência: {report['inference_seconds']:.2f}s")
+    print(f"{report['clips_per_second']:.0f} clipes/s, {report['batched_ms_per_clip']:.3f} ms por clipe em lote, {report['single_clip_ms']:.2f} ms para um clipe sozinho")
+
+def main():
+    from ModelBundle import load_bundle, load_legacy_files
+
+    parser = argparse.ArgumentParser(description="Avalia um modelo sobre um dataset consolidado")
+    parser.add_argument("--data", default="all_data.p", help="all_data.p ou diretório de arquivos .p")
+    parser.add_argument("--bundle", default="ModelY2.0.stlbundle")
+    parser.add_argument("--model", help="modelo .keras solto (em vez do bundle)")
+    parser.add_argument("--encoder", default="Encoder.p")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--output", help="salva o relatório em JSON")
+    args = parser.parse_args()
+
+    bundle = load_legacy_files(args.model, args.encoder) if args.model else load_bundle(args.bundle)
+    labels, clips = load_dataset(args.data)
+
+    report = evaluate(bundle, labels, clips, args.batch_size)
+    if report is None:
+        return
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
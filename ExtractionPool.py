@@ -0,0 +1,141 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from Preprocessing import DEFAULT_MAXLEN
+
+class DetectorPoolClosedError(Exception):
+    pass
+
+class DetectorPool:
+    """
+    pool of threads, each borrowing one of a set of preloaded hand detectors
+
+    MediaPipe runs detection in native code, so several frames can be processed at the same time
+    as long as every concurrent call uses its own HandLandmarker.
+
+    Args:
+        create_detector(callable): returns a new hand detector, called once per worker at creation
+        workers(int): number of threads and detectors
+    """
+    def __init__(self, create_detector, workers):
+        self.workers = workers
+        self._detectors = queue.Queue()
+        for _ in range(workers):
+            self._detectors.put(create_detector())
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extraction")
+        self._lock = threading.Lock()
+        self._users = 0
+        self._closing = False
+        self._closed = False
+
+    def _run(self, extract, frame):
+        detector = self._detectors.get()
+        try:
+            return extract(detector, frame)
+        finally:
+            self._detectors.put(detector)
+
+    def extract_clip(self, frames, extract, has_hand, maxlen = DEFAULT_MAXLEN, on_progress = None, check_cancelled = None):
+        """
+        extracts the landmarks of a clip's frames in parallel and returns them in frame order
+
+        Frames are submitted in order with a bounded number in flight. Once the first frame with a
+        hand is known, only the maxlen frames starting at it are needed (the rest is trimmed and
+        truncated before the model), so extraction stops there. frames may be a generator (e.g.
+        frames being decoded from an upload): it is consumed only as far as needed and no more
+        than 2*workers frames are held at a time.
+
+        Args:
+            frames(iterable): BGR frames
+            extract(callable): extract(detector, frame) -> landmarks of one frame
+            has_hand(callable): has_hand(landmarks) -> True when a hand was detected
+            maxlen(int): frames used by the model from the first frame with a hand
+            on_progress(callable): called with the fraction of the needed frames already done
+            check_cancelled(callable): called between steps, may raise to abort the extraction
+
+        Output:
+            landmarks(list): landmarks of frames[0:n], with n the last frame the model needs
+
+        Raises:
+            DetectorPoolClosedError if shutdown() was already called, even while earlier clips finish
+        """
+        with self._lock:
+            if self._closing:
+                raise DetectorPoolClosedError("pool de detectores fechado")
+            self._users += 1
+        try:
+            return self._extract_clip(frames, extract, has_hand, maxlen, on_progress, check_cancelled)
+        finally:
+            with self._lock:
+                self._users -= 1
+                close = self._closing and self._users == 0
+            if close:
+                self._close()
+
+    def _extract_clip(self, frames, extract, has_hand, maxlen, on_progress, check_cancelled):
+        total = len(frames) if hasattr(frames, "__len__") else None
+        frames = iter(frames)
+        results = []
+        limit = None
+        exhausted = False
+        contiguous = 0
+        first_hand = None
+        in_flight = {}
+
+        try:
+            while True:
+                if check_cancelled is not None:
+                    check_cancelled()
+
+                while not exhausted and (limit is None or len(results) < limit) and len(in_flight) < 2*self.workers:
+                    try:
+                        frame = next(frames)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight[self._executor.submit(self._run, extract, frame)] = len(results)
+                    results.append(None)
+
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results[in_flight.pop(future)] = (future.result(),)
+
+                while contiguous < len(results) and (limit is None or contiguous < limit) and results[contiguous] is not None:
+                    if first_hand is None and has_hand(results[contiguous][0]):
+                        first_hand = contiguous
+                        limit = first_hand + maxlen
+                    contiguous += 1
+
+                needed = [count for count in (limit, total) if count is not None]
+                if on_progress is not None and needed:
+                    on_progress(contiguous/min(needed))
+
+                if limit is not None and contiguous >= limit:
+                    break
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        return [result[0] for result in results[:contiguous]]
+
+    def shutdown(self):
+        """
+        closes the pool once the clips being extracted finish: a clip that already started keeps its
+        detectors until its last frame, new clips raise DetectorPoolClosedError
+        """
+        with self._lock:
+            self._closing = True
+            close = self._users == 0
+        if close:
+            self._close()
+
+    def _close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._executor.shutdown(wait=False)
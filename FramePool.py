@@ -0,0 +1,112 @@
+import threading
+
+import cv2
+import numpy as np
+
+class FrameBuffer:
+    """
+    a preallocated frame shared by reference
+
+    Whoever keeps the frame (the capture loop, a recording, a job) holds a reference with retain()
+    and gives it back with release(); when the last reference is released the buffer returns to
+    its pool and is reused by a later frame instead of allocating a new one.
+    """
+    def __init__(self, pool, array):
+        self.pool = pool
+        self.array = array
+        self._references = 0
+
+    def retain(self):
+        with self.pool._lock:
+            self._references += 1
+        return self
+
+    def release(self):
+        with self.pool._lock:
+            self._references -= 1
+            if self._references == 0:
+                self.pool._free.append(self)
+
+class FramePool:
+    """
+    pool of preallocated frames of one shape
+
+    Args:
+        shape(tuple): frame shape, e.g. (480, 640, 3)
+        size(int): frames allocated up front; the pool grows when all are in use (e.g. while
+            recording) and keeps the extra frames for reuse
+    """
+    def __init__(self, shape, size = 8, dtype = np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.allocated = 0
+        self._lock = threading.Lock()
+        self._free = []
+        for _ in range(size):
+            self._free.append(self._allocate())
+
+    def _allocate(self):
+        self.allocated += 1
+        return FrameBuffer(self, np.empty(self.shape, dtype=self.dtype))
+
+    def acquire(self):
+        """
+        Output:
+            buffer(FrameBuffer) with one reference, owned by the caller
+        """
+        with self._lock:
+            buffer = self._free.pop() if self._free else self._allocate()
+            buffer._references = 1
+        return buffer
+
+class CapturePipeline:
+    """
+    reads, mirrors and converts camera frames into preallocated buffers
+
+    The camera writes into a scratch frame, cv2.flip writes the mirrored frame into a pooled
+    buffer and cv2.cvtColor writes the RGB frame for the hand detector into another scratch
+    frame, so a frame costs no new array once the pool is warm.
+
+    Args:
+        camera(cv2.VideoCapture): opened camera
+        pool_size(int): pooled frames allocated up front
+    """
+    def __init__(self, camera, pool_size = 8):
+        self.camera = camera
+        self.pool_size = pool_size
+        self.pool = None
+        self._raw = None
+        self._rgb = None
+
+    def _start(self, frame):
+        self.pool = FramePool(frame.shape, self.pool_size, frame.dtype)
+        self._raw = frame
+        self._rgb = np.empty_like(frame)
+
+    def read(self):
+        """
+        reads the next frame, mirrored
+
+        Output:
+            buffer(FrameBuffer) with one reference owned by the caller, or None when the camera stops
+        """
+        if self._raw is None:
+            success, frame = self.camera.read()
+            if not success:
+                return None
+            self._start(frame)
+        else:
+            success, _ = self.camera.read(self._raw)
+            if not success:
+                return None
+
+        buffer = self.pool.acquire()
+        cv2.flip(self._raw, 1, dst=buffer.array)
+        return buffer
+
+    def rgb(self, buffer):
+        """
+        RGB version of a frame for the hand detector (valid until the next call)
+        """
+        cv2.cvtColor(buffer.array, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb
@@ -0,0 +1,263 @@
+"""
+incremental training of the classifier head on cached backbone features
+
+The backbone (the Conv1D/LSTM branches up to the Concatenate, or the TCN stack up to the pooling)
+of a trained model is frozen and run once per clip; its outputs are cached on disk by the content of
+the preprocessed clip. After a collection session only the new clips go through the backbone, and
+only the head (Dense, Dropout, Dense softmax) is trained, on the cached features, so adding signs or
+clips takes seconds instead of a full train_model() run. Clips aren't augmented in this mode: use
+train_model() for a full retraining.
+
+Usage:
+    python HeadTuning.py --bundle ModelY2.0.stlbundle --data all_data.p data --output ModelY2.0_head.stlbundle
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+def split_model(model):
+    """
+    splits a classifier into its backbone and its head layers
+
+    Output:
+        backbone(Model): same inputs, outputs the features that feed the head
+        hidden(Dense), dropout_rate(float), output(Dense): layers of the head
+
+    Raises:
+        ValueError if the model doesn't end with Dense (, Dropout), Dense
+    """
+    from keras import Model
+    from keras.layers import Dense, Dropout
+
+    dense_layers = [layer for layer in model.layers if isinstance(layer, Dense)]
+    if len(dense_layers) < 2:
+        raise ValueError("o modelo não tem uma camada Dense antes da saída")
+    hidden, output = dense_layers[-2:]
+    dropouts = [layer for layer in model.layers if isinstance(layer, Dropout)]
+    dropout_rate = dropouts[-1].rate if dropouts else 0.0
+
+    return Model(model.inputs, hidden.input), hidden, dropout_rate, output
+
+def backbone_fingerprint(backbone, preprocessing):
+    """
+    hash of the backbone weights and of the preprocessing: cached features are only valid for the same pair
+    """
+    digest = hashlib.sha256(json.dumps(preprocessing, sort_keys=True).encode())
+    for weights in backbone.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()
+
+def clip_key(arrays):
+    """
+    content address of a preprocessed clip
+    """
+    digest = hashlib.sha1()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array, dtype='float32').tobytes())
+    return digest.hexdigest()
+
+class FeatureCache:
+    """
+    backbone features of preprocessed clips, keyed by clip content and stored in an .npz file
+
+    Args:
+        path(str): cache file
+        fingerprint(str): backbone_fingerprint of the model; a cache of another backbone is discarded
+    """
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.features = {}
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if str(data["fingerprint"]) == fingerprint:
+                    self.features = dict(zip(data["keys"].tolist(), data["features"]))
+                else:
+                    print(f"⚠️ {path} é de outro modelo, recalculando as features")
+        self._loaded = len(self.features)
+
+    def __len__(self):
+        return len(self.features)
+
+    def save(self):
+        if len(self.features) == self._loaded:
+            return
+        keys = list(self.features)
+        partial_path = self.path + ".partial"
+        with open(partial_path, 'wb') as f:
+            np.savez(f, fingerprint=np.array(self.fingerprint), keys=np.array(keys), features=np.stack([self.features[key] for key in keys]))
+        os.replace(partial_path, self.path)
+        self._loaded = len(self.features)
+
+def compute_features(backbone, clips, maxlen, cache, batch_size = 256):
+    """
+    backbone features of preprocessed clips, running the backbone only on clips missing from the cache
+
+    Clips are sorted by length so each batch is padded only up to its longest clip (when the model
+    accepts any length).
+
+    Output:
+        features(array): (len(clips), dimension)
+        computed(int): clips that went through the backbone
+    """
+    from Preprocessing import pad_clips
+
+    keys = [clip_key(clip) for clip in clips]
+    missing = sorted({key: index for index, key in enumerate(keys) if key not in cache.features}.values(), key=lambda index: len(clips[index][0]))
+    variable_length = backbone.inputs[0].shape[1] is None
+
+    for begin in range(0, len(missing), batch_size):
+        batch = missing[begin:begin+batch_size]
+        length = max(len(clips[index][0]) for index in batch) if variable_length else maxlen
+        features = np.asarray(backbone.predict_on_batch(pad_clips([clips[index] for index in batch], length)))
+        for index, feature in zip(batch, features):
+            cache.features[keys[index]] = feature
+
+    return np.stack([cache.features[key] for key in keys]), len(missing)
+
+def fine_tune_head(bundle_path = r"ModelY2.0.stlbundle", data_paths = (r"all_data.p",), cache_path = r"features.npz", epochs = 200, batch_size = 64, model_path = None, output_bundle_path = r"ModelY2.0_head.stlbundle"):
+    """
+    retrains only the head of a bundle's model on the clips of data_paths, with a frozen backbone
+
+    The new output layer has one unit per sign found in the data; signs the model already knew keep
+    their trained weights as the starting point, new signs start from a random initialization.
+    A clip found in more than one of data_paths (all_data.p and the data directory it was
+    consolidated from) is used once. The input bundle and Encoder.p are never written: the classes
+    go in the new bundle.
+
+    Args:
+        bundle_path(str): bundle whose backbone is reused
+        data_paths(tuple): all_data.p files and/or directories of per clip .p files (Evaluation.load_dataset)
+        cache_path(str): feature cache file
+        epochs(int): maximum number of epochs (early stopping on val_loss)
+        batch_size(int): clips per batch
+        model_path(str): where the model is also saved as .keras (None to skip)
+        output_bundle_path(str): where the new bundle is saved
+
+    Output:
+        model(Model), history(History)
+
+    Raises:
+        ValueError if output_bundle_path is the input bundle
+    """
+    from keras import Model
+    from keras.callbacks import EarlyStopping
+    from keras.layers import Input, Dense, Dropout
+    from sklearn.metrics import classification_report
+    from sklearn.model_selection import train_test_split
+    from Evaluation import load_dataset
+    from ModelBundle import load_bundle, save_bundle
+    from ModelDevelopment import _fit_label_encoding, restore_label_encoding
+
+    if os.path.realpath(output_bundle_path) == os.path.realpath(bundle_path):
+        raise ValueError(f"{output_bundle_path} é o bundle de entrada: escolha outro arquivo de saída")
+
+    bundle = load_bundle(bundle_path)
+    backbone, hidden, dropout_rate, output = split_model(bundle.model)
+    backbone.trainable = False
+
+    labels = []
+    clips = []
+    seen = set()
+    duplicates = 0
+    for data_path in data_paths:
+        path_labels, path_clips = load_dataset(data_path)
+        for label, clip in zip(path_labels, path_clips):
+            arrays = bundle.prepare_clip(*clip)
+            if len(arrays[0]) == 0:
+                # Nenhuma mão detectada no clipe inteiro
+                continue
+            # O all_data.p é a junção dos arquivos de data/: o mesmo clipe conta uma vez só
+            key = clip_key(arrays)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            labels.append(str(label))
+            clips.append(arrays)
+    if duplicates:
+        print(f"{duplicates} clipes repetidos entre {', '.join(data_paths)} ignorados")
+
+    cache = FeatureCache(cache_path, backbone_fingerprint(backbone, bundle.preprocessing))
+    features, computed = compute_features(backbone, clips, bundle.maxlen, cache)
+    cache.save()
+    print(f"Features de {len(clips)} clipes ({computed} calculados, {len(clips) - computed} do cache)")
+
+    labels_encoded, fitted_classes = _fit_label_encoding(labels)
+    labels_one_hot = restore_label_encoding(labels_encoded, fitted_classes, encoder_path=None)
+    classes = [str(label) for label in fitted_classes]
+    previous_classes = [str(label) for label in bundle.encoder.classes_]
+    added = sorted(set(classes) - set(previous_classes))
+    removed = sorted(set(previous_classes) - set(classes))
+    if added:
+        print(f"Sinais novos: {', '.join(added)}")
+    if removed:
+        print(f"⚠️ Sinais sem clipes nos dados, removidos do modelo: {', '.join(removed)}")
+
+    # Cabeça nova com os pesos da atual como ponto de partida
+    new_hidden = Dense(hidden.units, activation=hidden.activation)
+    new_dropout = Dropout(dropout_rate)
+    new_output = Dense(len(classes), activation='softmax')
+
+    feature_input = Input(shape=(features.shape[1],))
+    head = Model(feature_input, new_output(new_dropout(new_hidden(feature_input))))
+    new_hidden.set_weights(hidden.get_weights())
+    kernel, bias = new_output.get_weights()
+    old_kernel, old_bias = output.get_weights()
+    for index, label in enumerate(classes):
+        if label in previous_classes:
+            kernel[:, index] = old_kernel[:, previous_classes.index(label)]
+            bias[index] = old_bias[previous_classes.index(label)]
+    new_output.set_weights([kernel, bias])
+
+    features_train, features_test, labels_train, labels_test = train_test_split(features, labels_one_hot, test_size=0.2)
+
+    head.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    history = head.fit(features_train, labels_train, batch_size=batch_size, epochs=epochs, callbacks=[early_stopping], validation_data=(features_test, labels_test), verbose=0)
+
+    test_result = head.evaluate(features_test, labels_test, verbose=0)
+    print(f"{len(history.epoch)} épocas. Acurácia final no conjunto de teste: {test_result[1]*100:.2f}%")
+
+    predicted_labels = np.argmax(head.predict(features_test, verbose=0), axis=1)
+    true_labels = np.argmax(labels_test, axis=1)
+    print(classification_report(true_labels, predicted_labels, labels=list(range(len(classes))), target_names=classes, zero_division=0))
+
+    # Modelo completo: backbone original + cabeça nova
+    model = Model(bundle.model.inputs, new_output(new_dropout(new_hidden(backbone.output))))
+
+    if model_path is not None:
+        model.save(model_path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hand_model_path = None
+        if bundle.hand_model is not None:
+            hand_model_path = os.path.join(tmp, "hand_landmarker.task")
+            with open(hand_model_path, 'wb') as f:
+                f.write(bundle.hand_model)
+        manifest = save_bundle(output_bundle_path, model, classes, bundle.preprocessing, hand_model_path=hand_model_path)
+    print(f"Bundle {manifest['version']} salvo em {output_bundle_path}")
+
+    return model, history
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Treina só a cabeça do modelo sobre features em cache")
+    parser.add_argument("--bundle", default="ModelY2.0.stlbundle")
+    parser.add_argument("--data", nargs="+", default=["all_data.p"], help="all_data.p e/ou diretórios de arquivos .p")
+    parser.add_argument("--cache", default="features.npz")
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--model", help="também salva o modelo como .keras")
+    parser.add_argument("--output", default="ModelY2.0_head.stlbundle")
+    args = parser.parse_args()
+
+    from ThreadBudget import apply_thread_budget, thread_budget
+    apply_thread_budget(thread_budget("training"))
+    fine_tune_head(args.bundle, args.data, args.cache, args.epochs, model_path=args.model, output_bundle_path=args.output)
+
+if __name__ == '__main__':
+    main()
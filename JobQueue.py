@@ -0,0 +1,242 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+class QueueFullError(Exception):
+    pass
+
+class JobCancelledError(Exception):
+    pass
+
+class Job:
+    """
+    one unit of work submitted to a JobQueue
+
+    The job function receives the Job as its first argument, reports progress through
+    job.progress (0.0 to 1.0) and calls job.check_cancelled() between steps so a cancellation
+    stops it at the next step.
+    """
+    def __init__(self, function, args, kwargs, group = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.group = group
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel_event = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelledError(self.id)
+
+    def add_done_callback(self, function):
+        """
+        calls function(job) once the job finishes (done, failed or cancelled), right away if it already has
+        """
+        with self._callbacks_lock:
+            if self.finished is None:
+                self._callbacks.append(function)
+                return
+        function(self)
+
+    def _run_callbacks(self):
+        with self._callbacks_lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for function in callbacks:
+            try:
+                function(self)
+            except Exception as e:
+                print(f"✗ Erro no callback do job {self.id}: {e}")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+class JobQueue:
+    """
+    bounded pool of worker threads fed by a bounded queue
+
+    Jobs can be submitted to a group (e.g. the camera they came from): each group has its own queue
+    and the workers take jobs from the groups in turn, so a busy group doesn't delay the others.
+
+    Args:
+        workers(int): number of worker threads
+        max_pending(int): jobs that may wait in the queue; submit raises QueueFullError beyond it
+        history(int): finished jobs kept so their status can still be queried
+        max_pending_per_group(int): jobs that may wait in the queue of one group (None: no limit
+            besides max_pending)
+    """
+    def __init__(self, workers = 1, max_pending = 4, history = 100, name = "job-worker", max_pending_per_group = None):
+        self._max_pending = max_pending
+        self._max_pending_per_group = max_pending_per_group
+        self._pending = OrderedDict()  # grupo -> deque de jobs, na ordem em que os grupos são atendidos
+        self._pending_count = 0
+        self._running = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._history = history
+        self._threads = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"{name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, function, *args, **kwargs):
+        """
+        queues function(job, *args, **kwargs)
+
+        Output:
+            job(Job)
+
+        Raises:
+            QueueFullError when max_pending jobs are already waiting
+        """
+        return self.submit_to(None, function, *args, **kwargs)
+
+    def submit_to(self, group, function, *args, **kwargs):
+        """
+        queues function(job, *args, **kwargs) in the queue of a group
+
+        Output:
+            job(Job)
+
+        Raises:
+            QueueFullError when max_pending jobs (or max_pending_per_group jobs of the group) are already waiting
+        """
+        job = Job(function, args, kwargs, group)
+        with self._lock:
+            if self._pending_count >= self._max_pending:
+                raise QueueFullError(f"{self._max_pending} jobs já aguardando na fila")
+            jobs = self._pending.setdefault(group, deque())
+            if self._max_pending_per_group is not None and len(jobs) >= self._max_pending_per_group:
+                raise QueueFullError(f"{self._max_pending_per_group} jobs de {group} já aguardando na fila")
+            jobs.append(job)
+            self._pending_count += 1
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+            self._available.notify()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        cancels a queued or running job
+
+        A queued job leaves the queue and its callbacks run right away. A job a worker already took
+        stops at its next check_cancelled(), and the worker runs its callbacks when it returns, so
+        nothing it still uses (e.g. frame buffers) is released under it.
+
+        Output:
+            job(Job) or None if the id is unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return job
+            job._cancel_event.set()
+            if job.status == "running":
+                return job
+
+            jobs = self._pending[job.group]
+            jobs.remove(job)
+            if not jobs:
+                del self._pending[job.group]
+            self._pending_count -= 1
+            job.status = "cancelled"
+            with job._callbacks_lock:
+                job.finished = time.time()
+        job._run_callbacks()
+        return job
+
+    def cancel_all(self, group = None):
+        """
+        cancels every queued or running job, or only those of a group
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if group is None or job.group == group]
+        for job in jobs:
+            self.cancel(job.id)
+
+    @property
+    def in_flight(self):
+        """
+        jobs queued or running
+        """
+        return self._pending_count + self._running
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            groups = {str(group): len(jobs) for group, jobs in self._pending.items() if group is not None}
+        return {"pending": self._pending_count, "max_pending": self._max_pending, "workers": len(self._threads), "jobs": counts, "pending_by_group": groups}
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished is not None]
+        for job_id in itertools.islice(finished, max(0, len(finished) - self._history)):
+            del self._jobs[job_id]
+
+    def _next_job(self):
+        with self._available:
+            while not self._pending_count:
+                self._available.wait()
+            # O primeiro grupo da fila cede um job e, se ainda tiver outros, volta para o fim
+            group, jobs = next(iter(self._pending.items()))
+            job = jobs.popleft()
+            del self._pending[group]
+            if jobs:
+                self._pending[group] = jobs
+            self._pending_count -= 1
+            self._running += 1
+            # Ainda com o lock: a partir daqui cancel só sinaliza, quem termina o job é o worker
+            job.status = "running"
+            job.started = time.time()
+            return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            try:
+                try:
+                    job.check_cancelled()
+                    job.result = job.function(job, *job.args, **job.kwargs)
+                    job.status = "done"
+                    job.progress = 1.0
+                except JobCancelledError:
+                    job.status = "cancelled"
+                except Exception as e:
+                    job.status = "failed"
+                    job.error = str(e)
+                with job._callbacks_lock:
+                    job.finished = time.time()
+                job._run_callbacks()
+            finally:
+                with self._lock:
+                    self._running -= 1
@@ -0,0 +1,67 @@
+"""
+data model of the collected samples, with no dependencies
+
+DataCollection pickles one NormalizedLandmarkResult per clip (data/<sign>/<n>.p) and DataFormater
+consolidates them in an AiFood (all_data.p). Files written before these classes moved here refer to
+them as DataCollection.NormalizedLandmarkResult and DataFormater.AiFood; load_data maps those names
+to this module, so reading a dataset doesn't import DataCollection (cv2, mediapipe).
+"""
+import pickle
+
+class AiFood:
+    def __init__(self,video_landmark,video_label):
+        self.video_landmark = video_landmark
+        self.video_label = video_label
+
+    def __repr__(self):
+        return f"""
+        (
+            video_landmark = {self.video_landmark!r}
+            video_label = {self.video_label!r}
+        )
+        """
+
+class NormalizedLandmarkResult:
+    def __init__(self, normalized_landmarks_right, normalized_landmarks_left, wrist_right, wrist_left):
+        self.normalized_landmarks_right = normalized_landmarks_right
+        self.normalized_landmarks_left = normalized_landmarks_left
+        self.wrist_right = wrist_right
+        self.wrist_left = wrist_left
+
+    def __repr__(self):
+        return f"""
+        (
+            normalized_landmarks_right = {self.normalized_landmarks_right!r}
+            normalized_landmarks_left = {self.normalized_landmarks_left!r}
+            wrist_right = {self.wrist_right!r}
+            wrist_left = {self.wrist_left!r}
+        )
+        """
+
+# Nomes com que as classes foram salvas antes de virem para este módulo
+LEGACY_CLASSES = {
+    ("DataCollection", "NormalizedLandmarkResult"): NormalizedLandmarkResult,
+    ("DataFormater", "NormalizedLandmarkResult"): NormalizedLandmarkResult,
+    ("DataFormater", "AiFood"): AiFood,
+    ("__main__", "NormalizedLandmarkResult"): NormalizedLandmarkResult,
+    ("__main__", "AiFood"): AiFood,
+}
+
+class DataUnpickler(pickle.Unpickler):
+    """
+    unpickler of sample files that resolves the legacy class names to this module
+    """
+    def find_class(self, module, name):
+        if (module, name) in LEGACY_CLASSES:
+            return LEGACY_CLASSES[(module, name)]
+        return super().find_class(module, name)
+
+def load_data(data_file_path):
+    """
+    loads a sample file (a clip .p or a consolidated all_data.p), old or new
+
+    Output:
+        NormalizedLandmarkResult or AiFood
+    """
+    with open(data_file_path,'rb') as f:
+        return DataUnpickler(f).load()
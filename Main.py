@@ -1,23 +1,46 @@
-from DataCollection import data_collection
-from DataFormater import data_format
-from ModelDevelopment import train_model
+# Cada etapa importa só o que usa: o menu abre sem carregar TensorFlow, OpenCV ou MediaPipe
+from ThreadBudget import apply_thread_budget, thread_budget
 
-while True:
-    print("""
-    O que você quer fazer?
-    1: Coleta de dados
-    2: Junção de dados
-    3: Treinar Modelo
-    4: Fechar
-    """)
+def main():
+    while True:
+        print("""
+        O que você quer fazer?
+        1: Coleta de dados
+        2: Junção de dados
+        3: Treinar Modelo
+        4: Validação cruzada de configurações
+        5: Avaliar modelo
+        6: Treinar só a cabeça do modelo (rápido, com os novos dados)
+        7: Fechar
+        """)
 
-    query = int(input())
+        query = int(input())
 
-    if query == 1:
-        data_collection(cam_id=0)
-    elif query == 2:
-        data_format()
-    elif query == 3:
-        train_model()
-    elif query == 4:
-        break
\ No newline at end of file
+        if query == 1:
+            from DataCollection import data_collection
+            apply_thread_budget(thread_budget("extraction"))
+            data_collection(cam_id=0)
+        elif query == 2:
+            from DataFormater import data_format
+            data_format()
+        elif query == 3:
+            from ModelDevelopment import train_model
+            apply_thread_budget(thread_budget("training"))
+            train_model()
+        elif query == 4:
+            from TrialRunner import run_trials
+            run_trials()
+        elif query == 5:
+            from Evaluation import load_dataset, evaluate, print_report
+            from ModelBundle import load_bundle
+            labels, clips = load_dataset()
+            print_report(evaluate(load_bundle("ModelY2.0.stlbundle"), labels, clips))
+        elif query == 6:
+            from HeadTuning import fine_tune_head
+            apply_thread_budget(thread_budget("training"))
+            fine_tune_head(data_paths=("all_data.p", "data"))
+        elif query == 7:
+            break
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+"""
+versioned model bundle: a single zip file with the Keras model, the label map and the
+preprocessing parameters the model was trained with
+
+Layout of a .stlbundle file:
+    manifest.json         format, version, classes and preprocessing parameters
+    model.keras           the Keras model
+    hand_landmarker.task  (optional) MediaPipe hand detector served with the model
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+from Preprocessing import DEFAULT_MAXLEN, WRIST_NORMALIZATION, WRIST_NORMALIZATIONS
+
+BUNDLE_FORMAT_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+MODEL_NAME = "model.keras"
+HAND_MODEL_NAME = "hand_landmarker.task"
+
+# Bundles salvos antes do campo "normalization" foram treinados com os pulsos do DataCollection
+LEGACY_NORMALIZATION = "wrist_range_v1"
+
+class BundleError(Exception):
+    pass
+
+class LabelMap:
+    """
+    label map of a bundle, with the part of the LabelEncoder interface used at serving time
+    """
+    def __init__(self, classes):
+        self.classes_ = list(classes)
+
+    def inverse_transform(self, indices):
+        return [self.classes_[int(index)] for index in indices]
+
+    def __len__(self):
+        return len(self.classes_)
+
+def default_preprocessing(maxlen = DEFAULT_MAXLEN, resample_length = None, trim_no_hand_frames = True, normalization = WRIST_NORMALIZATION):
+    """
+    preprocessing parameters of a model trained with Preprocessing.prepare_clip
+
+    When resample_length is given every clip is resampled to that many frames, which is then also
+    the number of timesteps of the model input. trim_no_hand_frames is False for models trained on
+    whole clips padded to maxlen (train_model with bucketing=False). normalization is the
+    wrist_normalization of prepare_clip.
+    """
+    return {
+        "maxlen": resample_length or maxlen,
+        "trim_no_hand_frames": trim_no_hand_frames,
+        "resample_length": resample_length,
+        "normalization": normalization,
+    }
+
+def legacy_preprocessing():
+    """
+    preprocessing of the models trained on the dataset files as they are (ModelY2.0.keras +
+    Encoder.p, train_model with bucketing=False): whole clips, not trimmed, padded to 60 frames, with
+    the wrists normalized over the whole clip by DataCollection
+    """
+    return default_preprocessing(maxlen=DEFAULT_MAXLEN, trim_no_hand_frames=False, normalization=LEGACY_NORMALIZATION)
+
+def save_bundle(bundle_path, model, classes, preprocessing = None, version = None, hand_model_path = None):
+    """
+    writes a model bundle
+
+    Args:
+        bundle_path(str): path of the .stlbundle file
+        model(Model): trained Keras model
+        classes(list): sign of each output index (encoder.classes_)
+        preprocessing(dict): preprocessing parameters the model expects (default_preprocessing())
+        version(str): bundle version, the creation time when not given
+        hand_model_path(str): optional MediaPipe hand detector to ship with the model
+
+    Output:
+        manifest(dict)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, MODEL_NAME)
+        model.save(model_path)
+        with open(model_path, 'rb') as f:
+            model_bytes = f.read()
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": version or time.strftime("%Y%m%d-%H%M%S"),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "classes": [str(label) for label in classes],
+        "preprocessing": preprocessing or default_preprocessing(),
+        "model_sha256": hashlib.sha256(model_bytes).hexdigest(),
+    }
+
+    # Escreve num arquivo temporário e renomeia, para um watcher nunca ler um bundle incompleto
+    partial_path = bundle_path + ".partial"
+    with zipfile.ZipFile(partial_path, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False))
+        bundle.writestr(MODEL_NAME, model_bytes)
+        if hand_model_path is not None:
+            bundle.write(hand_model_path, HAND_MODEL_NAME)
+    os.replace(partial_path, bundle_path)
+
+    return manifest
+
+def read_manifest(bundle_path):
+    """
+    reads only the manifest of a bundle
+
+    Raises:
+        BundleError if the file isn't a bundle of a supported format
+    """
+    try:
+        with zipfile.ZipFile(bundle_path) as bundle:
+            manifest = json.loads(bundle.read(MANIFEST_NAME))
+    except (OSError, KeyError, zipfile.BadZipFile, json.JSONDecodeError) as e:
+        raise BundleError(f"{bundle_path} não é um bundle válido: {e}")
+
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"formato de bundle não suportado: {manifest.get('format_version')}")
+
+    return manifest
+
+class ModelBundle:
+    """
+    a loaded bundle: the model ready to serve plus everything needed to preprocess its inputs
+
+    Attributes:
+        model(Model): Keras model
+        encoder(LabelMap): label of each output index
+        preprocessing(dict): preprocessing parameters (maxlen, ...)
+        version(str): bundle version
+        hand_model(bytes): MediaPipe hand detector shipped with the bundle, or None
+        streaming_classifier(StreamingClassifier): frame by frame classifier, or None if the model
+            doesn't support it
+    """
+    def __init__(self, model, encoder, preprocessing, version, source, hand_model = None):
+        normalization = preprocessing.get("normalization", LEGACY_NORMALIZATION)
+        if normalization not in WRIST_NORMALIZATIONS:
+            raise BundleError(f"{source}: normalização desconhecida {normalization} (este servidor conhece {', '.join(WRIST_NORMALIZATIONS)})")
+
+        self.model = model
+        self.encoder = encoder
+        self.preprocessing = preprocessing
+        self.version = version
+        self.source = source
+        self.hand_model = hand_model
+        self.loaded_at = time.time()
+        self._embedding_model = None
+
+        from StreamingInference import StreamingClassifier
+        self.streaming_classifier = None
+        if self.resample_length is None:  # a reamostragem precisa do clipe inteiro
+            try:
+                self.streaming_classifier = StreamingClassifier(model, maxlen=self.maxlen, wrist_normalization=self.normalization)
+            except ValueError:
+                pass
+
+    @property
+    def maxlen(self):
+        return self.preprocessing.get("maxlen", DEFAULT_MAXLEN)
+
+    @property
+    def resample_length(self):
+        return self.preprocessing.get("resample_length")
+
+    @property
+    def normalization(self):
+        return self.preprocessing.get("normalization", LEGACY_NORMALIZATION)
+
+    @property
+    def source_frames(self):
+        """
+        frames used from the first frame with a hand, or None if the whole clip is used (resampling)
+        """
+        return None if self.resample_length is not None else self.maxlen
+
+    def prepare_clip(self, local_right, local_left, global_right, global_left):
+        """
+        preprocesses one clip like the training data of the model: Preprocessing.prepare_clip with the
+        parameters of the bundle, wrist normalization included (the wrists may be absolute)
+
+        Output:
+            tuple of arrays with shapes (T,63), (T,63), (T,3), (T,3) with T <= maxlen
+        """
+        from Preprocessing import prepare_clip
+
+        return prepare_clip(
+            local_right, local_left, global_right, global_left,
+            maxlen=self.maxlen,
+            trim=self.preprocessing.get("trim_no_hand_frames", True),
+            resample_length=self.resample_length,
+            wrist_normalization=self.normalization,
+        )
+
+    def prepare_inputs(self, local_right, local_left, global_right, global_left):
+        """
+        preprocesses one clip like the training data of the model (prepare_clip), padded to maxlen
+
+        Output:
+            list of the four model inputs, each with a batch of one clip
+        """
+        from Preprocessing import pad_clips
+
+        return pad_clips([self.prepare_clip(local_right, local_left, global_right, global_left)], self.maxlen)
+
+    @property
+    def embedding_model(self):
+        """
+        model that outputs the penultimate Dense layer (the clip embedding used by SignIndex), built on first use
+        """
+        if self._embedding_model is None:
+            from SignIndex import build_embedding_model
+            self._embedding_model = build_embedding_model(self.model)
+        return self._embedding_model
+
+    def embed(self, clips, batch_size = 256):
+        """
+        embeddings of clips preprocessed like the training data
+
+        Args:
+            clips(list): (local_right, local_left, global_right, global_left) landmark lists of each clip
+
+        Output:
+            embeddings(array): (len(clips), dimension)
+        """
+        import numpy as np
+        from Preprocessing import pad_clips
+
+        embeddings = []
+        for begin in range(0, len(clips), batch_size):
+            inputs = pad_clips([self.prepare_clip(*clip) for clip in clips[begin:begin+batch_size]], self.maxlen)
+            embeddings.append(np.asarray(self.embedding_model.predict_on_batch(inputs)))
+        return np.concatenate(embeddings)
+
+    def warm_up(self):
+        """
+        runs one prediction so graph tracing happens before the bundle serves requests
+        """
+        import numpy as np
+
+        maxlen = self.maxlen
+        inputs = [
+            np.zeros((1, maxlen, 63), dtype='float32'),
+            np.zeros((1, maxlen, 63), dtype='float32'),
+            np.zeros((1, maxlen, 3), dtype='float32'),
+            np.zeros((1, maxlen, 3), dtype='float32'),
+        ]
+        self.model.predict(inputs, verbose=0)
+        self.model.predict_on_batch(inputs)
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "classes": list(self.encoder.classes_),
+            "preprocessing": self.preprocessing,
+            "streaming": self.streaming_classifier is not None,
+            "loaded_at": self.loaded_at,
+        }
+
+def load_bundle(bundle_path):
+    """
+    loads a .stlbundle file
+
+    Output:
+        bundle(ModelBundle)
+
+    Raises:
+        BundleError if the bundle is invalid, its model doesn't match the manifest or its wrist
+        normalization is unknown to this version of the code
+    """
+    from keras.models import load_model
+    import ModelLayers  # registra as camadas customizadas usadas pelo load_model
+
+    manifest = read_manifest(bundle_path)
+
+    with zipfile.ZipFile(bundle_path) as bundle:
+        model_bytes = bundle.read(MODEL_NAME)
+        hand_model = bundle.read(HAND_MODEL_NAME) if HAND_MODEL_NAME in bundle.namelist() else None
+
+    if hashlib.sha256(model_bytes).hexdigest() != manifest["model_sha256"]:
+        raise BundleError(f"{bundle_path}: o modelo não confere com o manifest")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, MODEL_NAME)
+        with open(model_path, 'wb') as f:
+            f.write(model_bytes)
+        model = load_model(model_path)
+
+    classes = manifest["classes"]
+    if model.output_shape[-1] != len(classes):
+        raise BundleError(f"{bundle_path}: o modelo tem {model.output_shape[-1]} saídas para {len(classes)} classes")
+
+    return ModelBundle(model, LabelMap(classes), manifest["preprocessing"], manifest["version"], bundle_path, hand_model)
+
+def load_legacy_files(model_path, encoder_path):
+    """
+    wraps the loose ModelY2.0.keras + Encoder.p files in a ModelBundle
+    """
+    import pickle
+    from keras.models import load_model
+    import ModelLayers  # registra as camadas customizadas usadas pelo load_model
+
+    model = load_model(model_path)
+    with open(encoder_path, 'rb') as f:
+        encoder = pickle.load(f)
+
+    return ModelBundle(model, LabelMap(encoder.classes_), legacy_preprocessing(), f"legacy:{os.path.basename(model_path)}", model_path)
+
+class ModelRegistry:
+    """
+    holds the bundle being served and replaces it without stopping the server
+
+    A new bundle is loaded and warmed up in a background thread while requests keep using the
+    current one; then the reference is swapped in a single assignment. Code that serves a request
+    should read registry.current once and use that bundle until it is done.
+
+    Args:
+        bundle(ModelBundle): initial bundle
+        on_swap(callable): called with the new bundle right after it becomes current
+    """
+    def __init__(self, bundle = None, on_swap = None):
+        self.current = bundle
+        self.on_swap = on_swap
+        self.status = {"state": "idle"}
+        self._reload_lock = threading.Lock()
+
+    def reload(self, bundle_path, background = True):
+        """
+        loads bundle_path and swaps it in
+
+        Output:
+            started(bool): False if another reload is already running
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        self.status = {"state": "loading", "source": bundle_path, "started": time.time()}
+        if background:
+            threading.Thread(target=self._reload, args=(bundle_path,), daemon=True).start()
+        else:
+            self._reload(bundle_path)
+        return True
+
+    def _reload(self, bundle_path):
+        try:
+            bundle = load_bundle(bundle_path)
+            bundle.warm_up()
+            previous = self.current
+            self.current = bundle
+            if self.on_swap is not None:
+                self.on_swap(bundle)
+            self.status = {
+                "state": "ready",
+                "version": bundle.version,
+                "previous_version": previous.version if previous is not None else None,
+                "seconds": time.time() - self.status["started"],
+            }
+            print(f"✓ Bundle {bundle.version} ativo ({bundle_path})")
+        except Exception as e:
+            self.status = {"state": "failed", "source": bundle_path, "error": str(e)}
+            print(f"✗ Erro ao recarregar o bundle {bundle_path}: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def watch(self, bundle_path, interval = 2.0):
+        """
+        starts a daemon thread that reloads the bundle whenever the file changes
+        """
+        def poll():
+            last_mtime = os.path.getmtime(bundle_path) if os.path.exists(bundle_path) else None
+            while True:
+                time.sleep(interval)
+                if not os.path.exists(bundle_path):
+                    continue
+                mtime = os.path.getmtime(bundle_path)
+                if mtime != last_mtime and self.reload(bundle_path, background=False):
+                    last_mtime = mtime
+
+        thread = threading.Thread(target=poll, daemon=True)
+        thread.start()
+        return thread
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cria um bundle a partir do modelo e do encoder soltos")
+    parser.add_argument("--model", default="ModelY2.0.keras")
+    parser.add_argument("--encoder", default="Encoder.p")
+    parser.add_argument("--hand-model", help="incluir o hand_landmarker.task no bundle")
+    parser.add_argument("--version")
+    parser.add_argument("--output", default="ModelY2.0.stlbundle")
+    args = parser.parse_args()
+
+    legacy = load_legacy_files(args.model, args.encoder)
+    manifest = save_bundle(args.output, legacy.model, legacy.encoder.classes_, legacy.preprocessing, version=args.version, hand_model_path=args.hand_model)
+    print(f"✓ Bundle {manifest['version']} salvo em {args.output} ({len(manifest['classes'])} classes)")
+
+if __name__ == '__main__':
+    main()
@@ -2,21 +2,15 @@ import pickle
 
 import numpy as np
 
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
-
-from keras.preprocessing.sequence import pad_sequences
-from keras.utils import to_categorical
-from keras.layers import Input, Conv1D, LSTM, Concatenate, Dense, Dropout
-from keras.models import Model
-from keras.metrics import Precision, Recall
-from keras.callbacks import EarlyStopping
+# Keras e sklearn são importados dentro das funções que os usam: ler e preparar o dataset não carrega o TensorFlow
+from Augmentation import LandmarkAugmenter
+from DatasetCache import load_cached, pack_clips, unpack_clips
+from LandmarkData import load_data
+from ModelBundle import save_bundle, default_preprocessing, legacy_preprocessing
+from Preprocessing import DEFAULT_MAXLEN, DEFAULT_BUCKET_BOUNDARIES, prepare_clip
 
 def open_data(data_file_path = r"all_data.p"):
-    with open(data_file_path,'rb') as f:
-        all_data = pickle.load(f)
-    return all_data
+    return load_data(data_file_path)
 
 def unpack_data(data, testing = False):
     if not testing:
@@ -48,6 +42,8 @@ def unpack_data(data, testing = False):
         return local_movement_right, local_movement_left, global_movement_right, global_movement_left
 
 def pad_data(local_movement_right, local_movement_left, global_movement_right, global_movement_left):
+    from keras.preprocessing.sequence import pad_sequences
+
     local_movement_right_padded = pad_sequences(local_movement_right,dtype='float32',padding='post',maxlen=60,truncating='post')
     local_movement_left_padded = pad_sequences(local_movement_left,dtype='float32',padding='post',maxlen=60,truncating='post')
     global_movement_right_padded = pad_sequences(global_movement_right,dtype='float32',padding='post',maxlen=60,truncating='post')
@@ -55,73 +51,305 @@ def pad_data(local_movement_right, local_movement_left, global_movement_right, g
 
     return local_movement_right_padded, local_movement_left_padded, global_movement_right_padded, global_movement_left_padded
 
-def encode_labels(labels_array):
+def encode_labels(labels_array, encoder_path = r"Encoder.p"):
+    from sklearn.preprocessing import LabelEncoder
+    from keras.utils import to_categorical
+
     encoder = LabelEncoder()
 
     labels_encoded = encoder.fit_transform(labels_array)
 
-    with open(r"Encoder.p",'wb') as f:
-        pickle.dump(encoder,f)
+    if encoder_path is not None:
+        with open(encoder_path,'wb') as f:
+            pickle.dump(encoder,f)
 
     one_hot_labels = to_categorical(labels_encoded)
 
     return one_hot_labels
 
-def load_data_in_format(data_file_path = r"all_data.p"):
-    data = open_data(data_file_path)
-    labels, local_movement_right, local_movement_left, global_movement_right, global_movement_left= unpack_data(data)
-    
-    with open("Output.txt", "w") as text_file:
-        print(f"""
-          labels = {labels}
-          local_movement_right = {local_movement_right}
-          local_movement_left = {local_movement_left}
-          global_movement_right = {global_movement_right}
-          global_movement_left = {global_movement_left}
-          """, file=text_file)
+def restore_label_encoding(labels_encoded, classes, encoder_path = r"Encoder.p"):
+    """
+    same output (and Encoder.p) as encode_labels for labels that were already encoded, e.g. read
+    from the dataset cache, without refitting the encoder
+
+    Args:
+        labels_encoded(np.ndarray): index of each label in classes
+        classes(np.ndarray): sorted classes, the classes_ of the fitted encoder
+    """
+    from sklearn.preprocessing import LabelEncoder
+    from keras.utils import to_categorical
+
+    encoder = LabelEncoder()
+    encoder.classes_ = np.asarray(classes)
+
+    if encoder_path is not None:
+        with open(encoder_path,'wb') as f:
+            pickle.dump(encoder,f)
 
-    local_movement_right_padded, local_movement_left_padded, global_movement_right_padded, global_movement_left_padded = pad_data(local_movement_right, local_movement_left, global_movement_right, global_movement_left)
+    return to_categorical(labels_encoded, num_classes=len(classes))
 
-    labels_one_hot = encode_labels(labels)
+def _fit_label_encoding(labels):
+    from sklearn.preprocessing import LabelEncoder
 
-    local_right_train, local_right_test, local_left_train, local_left_test, global_right_train, global_right_test,global_left_train, global_left_test, labels_train, labels_test = train_test_split(local_movement_right_padded, local_movement_left_padded, global_movement_right_padded, global_movement_left_padded,labels_one_hot,test_size=0.2)
+    encoder = LabelEncoder()
+    labels_encoded = encoder.fit_transform(labels)
+    return labels_encoded, np.asarray(encoder.classes_).astype(str)
+
+def load_encoder(encoder_path = r"Encoder.p"):
+    with open(encoder_path,'rb') as f:
+        encoder = pickle.load(f)
+    return encoder
+
+def load_data_in_format(data_file_path = r"all_data.p", cache = None):
+    """
+    loads the dataset padded to 60 frames; the padded tensors and the label encoding come from the
+    dataset cache (DatasetCache.py) when neither the data nor the preprocessing changed
+    """
+    from sklearn.model_selection import train_test_split
+
+    def build():
+        data = open_data(data_file_path)
+        labels, local_movement_right, local_movement_left, global_movement_right, global_movement_left= unpack_data(data)
+        
+        with open("Output.txt", "w") as text_file:
+            print(f"""
+              labels = {labels}
+              local_movement_right = {local_movement_right}
+              local_movement_left = {local_movement_left}
+              global_movement_right = {global_movement_right}
+              global_movement_left = {global_movement_left}
+              """, file=text_file)
+
+        local_movement_right_padded, local_movement_left_padded, global_movement_right_padded, global_movement_left_padded = pad_data(local_movement_right, local_movement_left, global_movement_right, global_movement_left)
+        labels_encoded, classes = _fit_label_encoding(labels)
+
+        return {
+            "local_right": local_movement_right_padded.reshape(-1,60,63),
+            "local_left": local_movement_left_padded.reshape(-1,60,63),
+            "global_right": global_movement_right_padded,
+            "global_left": global_movement_left_padded,
+            "labels": labels_encoded,
+            "classes": classes,
+        }
 
-    local_right_train = local_right_train.reshape(-1,60,63) 
-    local_right_test = local_right_test.reshape(-1,60,63) 
-    local_left_train =local_left_train.reshape(-1,60,63) 
-    local_left_test = local_left_test.reshape(-1,60,63) 
+    arrays = load_cached(data_file_path, build, cache, format="padded", maxlen=60, padding="post", truncating="post")
+
+    labels_one_hot = restore_label_encoding(arrays["labels"], arrays["classes"])
+
+    local_right_train, local_right_test, local_left_train, local_left_test, global_right_train, global_right_test,global_left_train, global_left_test, labels_train, labels_test = train_test_split(arrays["local_right"], arrays["local_left"], arrays["global_right"], arrays["global_left"],labels_one_hot,test_size=0.2)
 
     return local_right_train, local_right_test, local_left_train, local_left_test, global_right_train, global_right_test,global_left_train, global_left_test, labels_train, labels_test
 
-def build_model():
-    input_local_right = Input(shape=(60,63))
-    conv_local_right_output = Conv1D(64,3,activation='relu',)(input_local_right)
-    lstm_local_right_output = LSTM(128)(conv_local_right_output)
+def load_clips(data_file_path = r"all_data.p", maxlen = DEFAULT_MAXLEN, resample_length = None, cache = None, encoder_path = r"Encoder.p"):
+    """
+    loads every clip of the dataset with the training preprocessing: variable length, with no-hand
+    frames trimmed at both ends
+
+    The preprocessed clips and the label encoding come from the dataset cache (DatasetCache.py)
+    when neither the data nor the preprocessing parameters changed.
+
+    Args:
+        data_file_path(str): path to the consolidated dataset
+        maxlen(int): maximum number of frames kept per clip
+        resample_length(int): when given, every clip is resampled to this many frames instead
+        cache(DatasetCache): None uses the default cache
+        encoder_path(str): where the label encoder is saved, None to not save it
+
+    Output:
+        clips(list): (local_right, local_left, global_right, global_left) arrays of each clip
+        labels_one_hot(np.ndarray): one hot labels
+        classes(np.ndarray): sorted classes of the labels
+    """
+    def build():
+        data = open_data(data_file_path)
+        labels, local_movement_right, local_movement_left, global_movement_right, global_movement_left = unpack_data(data)
+
+        clips = []
+        clip_labels = []
+        for label, clip in zip(labels, zip(local_movement_right, local_movement_left, global_movement_right, global_movement_left)):
+            arrays = prepare_clip(*clip, maxlen=maxlen, resample_length=resample_length)
+            if len(arrays[0]) == 0:
+                # Nenhuma mão detectada no clipe inteiro
+                continue
+            clips.append(arrays)
+            clip_labels.append(label)
+
+        labels_encoded, classes = _fit_label_encoding(clip_labels)
+        return dict(pack_clips(clips), labels=labels_encoded, classes=classes)
+
+    arrays = load_cached(data_file_path, build, cache, format="clips", maxlen=maxlen, resample_length=resample_length, trim=True)
+    clips = unpack_clips(arrays)
+
+    labels_one_hot = restore_label_encoding(arrays["labels"], arrays["classes"], encoder_path)
+
+    return clips, labels_one_hot, arrays["classes"]
+
+def load_clips_in_format(data_file_path = r"all_data.p", maxlen = DEFAULT_MAXLEN, resample_length = None, cache = None):
+    """
+    loads the dataset as a list of variable length clips, with no-hand frames trimmed at both ends,
+    split in train and test sets (see load_clips)
+
+    Output:
+        clips_train, clips_test(list): lists of (local_right, local_left, global_right, global_left) arrays
+        labels_train, labels_test(np.ndarray): one hot labels
+    """
+    from sklearn.model_selection import train_test_split
+
+    clips, labels_one_hot, _ = load_clips(data_file_path, maxlen, resample_length, cache)
+
+    clips_train, clips_test, labels_train, labels_test = train_test_split(clips, labels_one_hot, test_size=0.2)
+
+    return clips_train, clips_test, labels_train, labels_test
+
+def build_model(maxlen = DEFAULT_MAXLEN, masking = False, num_classes = 1, conv_filters = 64, lstm_units = 128, dense_units = 64, dropout = 0.5):
+    """
+    builds the four branch classifier
+
+    Args:
+        maxlen(int): number of timesteps of the padded inputs (ignored when masking)
+        masking(bool): accept any sequence length and skip the all zero frames (padding and frames
+            without hands) in the LSTMs. The Conv1D layers use causal padding so the mask stays aligned.
+        num_classes(int): number of signs in the output layer
+        conv_filters(int): filters of the Conv1D over each hand's local landmarks
+        lstm_units(int): units of each of the four LSTMs
+        dense_units(int): units of the dense layer before the output
+        dropout(float): dropout rate before the output
 
-    input_global_right = Input(shape=(60,3))
-    lstm_global_right_output = LSTM(128)(input_global_right)
+    Output:
+        model(Model)
+    """
+    from keras.layers import Input, Conv1D, LSTM, Concatenate, Dense, Dropout
+    from keras.models import Model
+    from ModelLayers import FrameMask
 
-    input_local_left = Input(shape=(60,63))
-    conv_local_left_output = Conv1D(64,3,activation='relu',)(input_local_left)
-    lstm_local_left_output = LSTM(128)(conv_local_left_output)
+    timesteps = None if masking else maxlen
+    conv_padding = 'causal' if masking else 'valid'
 
-    input_global_left = Input(shape=(60,3))
-    lstm_global_left_output = LSTM(128)(input_global_left)
+    input_local_right = Input(shape=(timesteps,63))
+    input_global_right = Input(shape=(timesteps,3))
+    input_local_left = Input(shape=(timesteps,63))
+    input_global_left = Input(shape=(timesteps,3))
+
+    mask = FrameMask()([input_local_right,input_local_left,input_global_right,input_global_left]) if masking else None
+
+    conv_local_right_output = Conv1D(conv_filters,3,activation='relu',padding=conv_padding)(input_local_right)
+    lstm_local_right_output = LSTM(lstm_units)(conv_local_right_output, mask=mask)
+
+    lstm_global_right_output = LSTM(lstm_units)(input_global_right, mask=mask)
+
+    conv_local_left_output = Conv1D(conv_filters,3,activation='relu',padding=conv_padding)(input_local_left)
+    lstm_local_left_output = LSTM(lstm_units)(conv_local_left_output, mask=mask)
+
+    lstm_global_left_output = LSTM(lstm_units)(input_global_left, mask=mask)
 
     total_output = Concatenate()([lstm_local_right_output,lstm_local_left_output,lstm_global_right_output,lstm_global_left_output])
 
-    dense1_output = Dense(64,activation='relu')(total_output)
-    drop_output = Dropout(0.5)(dense1_output)
-    final_output = Dense(1,activation='softmax')(drop_output)
+    dense1_output = Dense(dense_units,activation='relu')(total_output)
+    drop_output = Dropout(dropout)(dense1_output)
+    final_output = Dense(num_classes,activation='softmax')(drop_output)
 
     model = Model((input_local_right,input_local_left,input_global_right,input_global_left),final_output)
 
     return model
 
-def train_model():
-    local_right_train, local_right_test, local_left_train, local_left_test, global_right_train, global_right_test,global_left_train, global_left_test, labels_train, labels_test = load_data_in_format()
+def build_tcn_model(maxlen = DEFAULT_MAXLEN, masking = False, num_classes = 1, filters = 64, kernel_size = 3, dilations = (1, 2, 4, 8, 16), dense_units = 64, dropout = 0.5):
+    """
+    builds a lightweight classifier: one shared stack of causal depthwise separable dilated
+    convolutions (TCN) over the concatenated features of both hands, instead of four LSTMs
+
+    The inputs are the same four arrays as build_model, so both variants are served the same way.
+
+    Args:
+        maxlen(int): number of timesteps of the padded inputs (ignored when masking)
+        masking(bool): accept any sequence length and average only the frames of the FrameMask
+        num_classes(int): number of signs in the output layer
+        filters(int): channels of the convolution stack
+        kernel_size(int): temporal kernel of each depthwise convolution
+        dilations(tuple): dilation of each residual block, the receptive field is
+            1 + (kernel_size-1)*sum(dilations) frames (63 by default)
+        dense_units(int): units of the dense layer before the output
+        dropout(float): dropout rate before the output
+
+    Output:
+        model(Model)
+    """
+    from keras.layers import Input, Conv1D, Concatenate, Dense, Dropout, DepthwiseConv1D, ZeroPadding1D, Add, GlobalAveragePooling1D
+    from keras.models import Model
+    from ModelLayers import FrameMask
+
+    timesteps = None if masking else maxlen
+
+    input_local_right = Input(shape=(timesteps,63))
+    input_global_right = Input(shape=(timesteps,3))
+    input_local_left = Input(shape=(timesteps,63))
+    input_global_left = Input(shape=(timesteps,3))
+    inputs = [input_local_right,input_local_left,input_global_right,input_global_left]
+
+    mask = FrameMask()(inputs) if masking else None
+
+    features = Concatenate()(inputs)
+    block_output = Conv1D(filters,1,activation='relu')(features)
+
+    for dilation in dilations:
+        causal_output = ZeroPadding1D(((kernel_size-1)*dilation,0))(block_output)
+        depthwise_output = DepthwiseConv1D(kernel_size,dilation_rate=dilation)(causal_output)
+        pointwise_output = Conv1D(filters,1,activation='relu')(depthwise_output)
+        block_output = Add()([block_output,pointwise_output])
+
+    pooled_output = GlobalAveragePooling1D()(block_output, mask=mask)
 
-    model = build_model()
+    dense1_output = Dense(dense_units,activation='relu')(pooled_output)
+    drop_output = Dropout(dropout)(dense1_output)
+    final_output = Dense(num_classes,activation='softmax')(drop_output)
+
+    model = Model(tuple(inputs),final_output)
+
+    return model
+
+ARCHITECTURES = {
+    "lstm": build_model,
+    "tcn": build_tcn_model,
+}
+
+def train_model(bucketing = True, augment = True, batch_size = 32, epochs = 40, architecture = "lstm", resample_length = None, model_path = r"ModelY2.0.keras", bundle_path = r"ModelY2.0.stlbundle"):
+    """
+    trains and saves the classifier
+
+    Args:
+        bucketing(bool): train on trimmed clips grouped in length buckets with masking, instead of
+            every clip padded to 60 frames
+        augment(bool): augment the training batches on the fly (bucketing only)
+        batch_size(int): clips per batch
+        epochs(int): maximum number of epochs (early stopping on val_loss)
+        architecture(str): key of ARCHITECTURES, "lstm" (four LSTM branches) or "tcn" (lightweight)
+        resample_length(int): resample every trimmed clip to this many frames (e.g. 24, 32 or 60)
+            instead of cutting it at 60 (bucketing only); recorded in the bundle so serving does the same
+        model_path(str): where the trained model is saved
+        bundle_path(str): where the versioned bundle (model + classes + preprocessing) is saved
+
+    Output:
+        model(Model), history(History)
+    """
+    from sklearn.metrics import classification_report
+    from keras.metrics import Precision, Recall
+    from keras.callbacks import EarlyStopping
+    from Batching import BucketedClips
+
+    build = ARCHITECTURES[architecture]
+
+    if bucketing:
+        clips_train, clips_test, labels_train, labels_test = load_clips_in_format(resample_length=resample_length)
+        # Clipes reamostrados têm todos o mesmo comprimento: um único bucket
+        boundaries = DEFAULT_BUCKET_BOUNDARIES if resample_length is None else (resample_length,)
+        augmenter = LandmarkAugmenter() if augment else None
+        train_data = BucketedClips(clips_train, labels_train, batch_size=batch_size, boundaries=boundaries, augment=augmenter)
+        test_data = BucketedClips(clips_test, labels_test, batch_size=batch_size, boundaries=boundaries, shuffle=False)
+        model = build(masking=True, num_classes=labels_train.shape[1])
+    else:
+        if resample_length is not None:
+            raise ValueError("resample_length requer bucketing=True")
+        local_right_train, local_right_test, local_left_train, local_left_test, global_right_train, global_right_test,global_left_train, global_left_test, labels_train, labels_test = load_data_in_format()
+        model = build(num_classes=labels_train.shape[1])
 
     precision = Precision()
     recall = Recall()
@@ -130,20 +358,37 @@ def train_model():
 
     model.compile(optimizer='adam',loss='categorical_crossentropy',metrics=['accuracy',precision,recall])
 
-    model.fit([local_right_train, local_left_train,global_right_train,global_left_train], labels_train,epochs=40,callbacks=[early_stopping],validation_data=[[local_right_test, local_left_test,global_right_test,global_left_test], labels_test])
+    if bucketing:
+        history = model.fit(train_data,epochs=epochs,callbacks=[early_stopping],validation_data=test_data)
 
-    test_result = model.evaluate([local_right_test, local_left_test,global_right_test,global_left_test], labels_test)
+        test_result = model.evaluate(test_data)
 
-    print(f"Acurácia final no conjunto de teste: {test_result[1]*100:.2f}%")
+        predictions = model.predict(test_data)
 
-    predictions = model.predict([local_right_test, local_left_test,global_right_test,global_left_test])
+        true_labels = np.concatenate([np.argmax(test_data[i][1],axis=1) for i in range(len(test_data))])
+    else:
+        history = model.fit([local_right_train, local_left_train,global_right_train,global_left_train], labels_train,batch_size=batch_size,epochs=epochs,callbacks=[early_stopping],validation_data=[[local_right_test, local_left_test,global_right_test,global_left_test], labels_test])
+
+        test_result = model.evaluate([local_right_test, local_left_test,global_right_test,global_left_test], labels_test)
+
+        predictions = model.predict([local_right_test, local_left_test,global_right_test,global_left_test])
+
+        true_labels = np.argmax(labels_test,axis=1)
+
+    print(f"Acurácia final no conjunto de teste: {test_result[1]*100:.2f}%")
 
     predicted_labels = np.argmax(predictions,axis=1)
 
-    true_labels = np.argmax(labels_test,axis=1)
+    classes = load_encoder().classes_
+    dictionary = [str(label) for label in classes]
+
+    print(classification_report(true_labels,predicted_labels,labels=list(range(len(dictionary))),target_names=dictionary,zero_division=0))
 
-    dictionary = ["dia"]
+    model.save(model_path)
 
-    print(classification_report(true_labels,predicted_labels,target_names=dictionary))
+    # Sem bucketing o modelo viu os clipes do dataset como estão: inteiros, com os pulsos do DataCollection
+    preprocessing = default_preprocessing(resample_length=resample_length) if bucketing else legacy_preprocessing()
+    manifest = save_bundle(bundle_path, model, classes, preprocessing)
+    print(f"Bundle {manifest['version']} salvo em {bundle_path}")
 
-    model.save('ModelY2.0.keras')
\ No newline at end of file
+    return model, history
@@ -0,0 +1,21 @@
+import keras
+from keras import ops
+from keras.layers import Layer
+
+@keras.saving.register_keras_serializable(package="STL")
+class FrameMask(Layer):
+    """
+    builds the timestep mask of a clip: a frame is valid when any of the inputs is not zero
+
+    Padding frames (and frames with no hand at all) are all zeros in every input, so the LSTMs
+    can skip them when this mask is passed as their mask argument.
+    """
+    def call(self, inputs):
+        mask = None
+        for sequence in inputs:
+            present = ops.any(ops.not_equal(sequence, 0.0), axis=-1)
+            mask = present if mask is None else ops.logical_or(mask, present)
+        return mask
+
+    def compute_output_shape(self, input_shapes):
+        return tuple(input_shapes[0][:-1])
@@ -0,0 +1,275 @@
+import itertools
+
+import numpy as np
+
+NUM_LANDMARKS = 21
+
+DEFAULT_MAXLEN = 60
+DEFAULT_BUCKET_BOUNDARIES = (16, 24, 32, 48, 60)
+
+# Normalizações da trajetória do pulso (registradas no bundle):
+#   wrist_range_v1  sobre o clipe inteiro recebido, como DataCollection.normalize_wrist_coords
+#   wrist_range_v2  sobre os frames que o modelo usa, depois do corte e do truncamento
+WRIST_NORMALIZATIONS = ("wrist_range_v1", "wrist_range_v2")
+WRIST_NORMALIZATION = "wrist_range_v2"
+
+def clip_to_arrays(local_movement_right, local_movement_left, global_movement_right, global_movement_left):
+    """
+    converts the landmark lists of a single clip to float32 arrays
+
+    Args:
+        local_movement_right(list): per frame list of 21 (x,y,z) normalized landmarks of the right hand
+        local_movement_left(list): per frame list of 21 (x,y,z) normalized landmarks of the left hand
+        global_movement_right(list): per frame (x,y,z) normalized right wrist
+        global_movement_left(list): per frame (x,y,z) normalized left wrist
+
+    Output:
+        tuple of arrays with shapes (T,63), (T,63), (T,3), (T,3)
+    """
+    local_right = _to_array(local_movement_right, NUM_LANDMARKS*3, 2)
+    local_left = _to_array(local_movement_left, NUM_LANDMARKS*3, 2)
+    global_right = _to_array(global_movement_right, 3, 1)
+    global_left = _to_array(global_movement_left, 3, 1)
+
+    return local_right, local_left, global_right, global_left
+
+def _to_array(frames, features, depth):
+    """
+    flattens nested per frame lists of coordinates into a (T,features) float32 array
+
+    np.fromiter over the flattened values is about twice as fast as np.asarray on nested lists of
+    tuples, which dominates the preprocessing of large datasets.
+    """
+    if isinstance(frames, np.ndarray):
+        return frames.astype('float32', copy=False).reshape(-1, features)
+
+    values = frames
+    for _ in range(depth):
+        values = itertools.chain.from_iterable(values)
+    return np.fromiter(values, dtype='float32').reshape(-1, features)
+
+def hand_presence(local_right, local_left):
+    """
+    flags the frames where at least one hand was detected
+
+    Args:
+        local_right(np.ndarray): (T,63) right hand landmarks
+        local_left(np.ndarray): (T,63) left hand landmarks
+
+    Output:
+        present(np.ndarray): (T,) bool array
+    """
+    return np.any(local_right != 0, axis=1) | np.any(local_left != 0, axis=1)
+
+def trim_no_hand_frames(local_right, local_left, global_right, global_left):
+    """
+    removes the leading and trailing frames where no hand was detected
+
+    Frames without hands in the middle of the clip are kept, so the timing of the sign is preserved.
+
+    Args:
+        local_right(np.ndarray): (T,63) right hand landmarks
+        local_left(np.ndarray): (T,63) left hand landmarks
+        global_right(np.ndarray): (T,3) right wrist
+        global_left(np.ndarray): (T,3) left wrist
+
+    Output:
+        tuple of the four arrays cut to the first..last frame with a hand (length 0 if there is none)
+    """
+    present = np.flatnonzero(hand_presence(local_right, local_left))
+    if present.size == 0:
+        start, end = 0, 0
+    else:
+        start, end = present[0], present[-1] + 1
+
+    return local_right[start:end], local_left[start:end], global_right[start:end], global_left[start:end]
+
+def normalize_wrists(local, wrist):
+    """
+    wrist trajectory of one hand relative to its first detected position and divided by the range of
+    each axis over the frames where it was detected (DataCollection.normalize_wrist_coords)
+
+    Frames where the hand wasn't detected are zero. The result doesn't change when the positions are
+    shifted or scaled, so absolute (image) wrists and wrists already normalized over the same frames
+    give the same trajectory.
+
+    Args:
+        local(np.ndarray): (T,63) landmarks of the hand, zero where it wasn't detected
+        wrist(np.ndarray): (T,3) wrist of the hand
+
+    Output:
+        normalized(np.ndarray): (T,3)
+    """
+    present = np.any(local != 0, axis=1)
+    normalized = np.zeros(wrist.shape, dtype='float32')
+    if not present.any():
+        return normalized
+
+    detected = wrist[present]
+    span = detected.max(axis=0) - detected.min(axis=0)
+    span[span == 0] = 1
+    normalized[present] = (detected - detected[0])/span
+    return normalized
+
+def normalize_clip_wrists(local_right, local_left, global_right, global_left):
+    """
+    normalize_wrists applied to both hands of a clip
+
+    Output:
+        tuple of the four arrays, with the wrists normalized
+    """
+    return local_right, local_left, normalize_wrists(local_right, global_right), normalize_wrists(local_left, global_left)
+
+def _resample_hand(local, wrist, length):
+    """
+    resamples the frames of one hand, interpolating only between frames where the hand was detected
+    """
+    frames = len(local)
+    positions = np.linspace(0, frames - 1, length)
+    before = np.floor(positions).astype(int)
+    after = np.minimum(before + 1, frames - 1)
+    weight = (positions - before)[:, None]
+
+    present = np.any(local != 0, axis=1)
+    both = (present[before] & present[after])[:, None]
+    nearest = np.where(weight[:, 0] < 0.5, before, after)
+
+    resampled = []
+    for array in (local, wrist):
+        interpolated = (1 - weight)*array[before] + weight*array[after]
+        resampled.append(np.where(both, interpolated, array[nearest]).astype('float32'))
+
+    return resampled
+
+def resample_clip(local_right, local_left, global_right, global_left, length):
+    """
+    resamples a clip to a fixed number of frames by linear interpolation over time
+
+    Each hand is interpolated only between frames where it was detected; next to a frame without
+    it, the nearest frame is used, so a missing hand never fades in or out.
+
+    Args:
+        local_right(np.ndarray): (T,63) right hand landmarks
+        local_left(np.ndarray): (T,63) left hand landmarks
+        global_right(np.ndarray): (T,3) right wrist
+        global_left(np.ndarray): (T,3) left wrist
+        length(int): number of frames of the resampled clip
+
+    Output:
+        tuple of arrays with shapes (length,63), (length,63), (length,3), (length,3) (all zeros if T is 0)
+    """
+    if len(local_right) == 0:
+        return tuple(np.zeros((length, array.shape[1]), dtype='float32') for array in (local_right, local_left, global_right, global_left))
+
+    resampled_right, resampled_global_right = _resample_hand(local_right, global_right, length)
+    resampled_left, resampled_global_left = _resample_hand(local_left, global_left, length)
+
+    return resampled_right, resampled_left, resampled_global_right, resampled_global_left
+
+def prepare_clip(local_movement_right, local_movement_left, global_movement_right, global_movement_left, maxlen = DEFAULT_MAXLEN, trim = True, resample_length = None, wrist_normalization = WRIST_NORMALIZATION):
+    """
+    converts, trims and truncates (or resamples) a clip to at most maxlen frames and normalizes
+    its wrist trajectories
+
+    This is the preprocessing shared by training and serving, so both must call it with the same
+    parameters (the ones recorded in the model bundle). The wrists may be absolute (serving) or
+    already normalized by DataCollection (datasets): both give the same arrays.
+
+    Args:
+        local_movement_right, local_movement_left, global_movement_right, global_movement_left: landmark lists of one clip
+        maxlen(int): maximum number of frames kept (the end of longer clips is cut, like truncating='post')
+        trim(bool): remove leading and trailing frames without hands
+        resample_length(int): when given, the whole clip is resampled to this many frames instead of truncated
+        wrist_normalization(str): one of WRIST_NORMALIZATIONS
+
+    Output:
+        tuple of arrays with shapes (T,63), (T,63), (T,3), (T,3) with T <= maxlen (T = resample_length when resampling)
+
+    Raises:
+        ValueError for an unknown wrist_normalization
+    """
+    if wrist_normalization not in WRIST_NORMALIZATIONS:
+        raise ValueError(f"normalização do pulso desconhecida: {wrist_normalization} (use {', '.join(WRIST_NORMALIZATIONS)})")
+
+    arrays = clip_to_arrays(local_movement_right, local_movement_left, global_movement_right, global_movement_left)
+    if wrist_normalization == "wrist_range_v1":
+        arrays = normalize_clip_wrists(*arrays)
+    if trim:
+        arrays = trim_no_hand_frames(*arrays)
+    if resample_length is None:
+        arrays = tuple(array[:maxlen] for array in arrays)
+    if wrist_normalization == "wrist_range_v2":
+        arrays = normalize_clip_wrists(*arrays)
+
+    if resample_length is not None:
+        if len(arrays[0]) == 0:
+            return arrays
+        return resample_clip(*arrays, resample_length)
+
+    return arrays
+
+def pad_clips(clips, length):
+    """
+    stacks clips into zero padded ('post') batch arrays of a fixed length
+
+    Args:
+        clips(list): list of (local_right, local_left, global_right, global_left) array tuples
+        length(int): number of timesteps of the batch, longer clips are truncated
+
+    Output:
+        list of four arrays with shapes (N,length,63), (N,length,63), (N,length,3), (N,length,3)
+    """
+    batch = []
+    for position in range(4):
+        features = clips[0][position].shape[1]
+        padded = np.zeros((len(clips), length, features), dtype='float32')
+        for index, clip in enumerate(clips):
+            array = clip[position][:length]
+            padded[index, :len(array)] = array
+        batch.append(padded)
+
+    return batch
+
+def bucket_length(length, boundaries = DEFAULT_BUCKET_BOUNDARIES):
+    """
+    returns the smallest bucket boundary that fits a clip of the given length
+
+    Args:
+        length(int): number of frames of the clip
+        boundaries(tuple): sorted bucket lengths, the last one is the maximum length
+
+    Output:
+        bucket(int)
+    """
+    for boundary in boundaries:
+        if length <= boundary:
+            return boundary
+    return boundaries[-1]
+
+def make_bucketed_batches(lengths, batch_size, boundaries = DEFAULT_BUCKET_BOUNDARIES, rng = None):
+    """
+    groups clip indices into batches of clips that fall in the same length bucket
+
+    Args:
+        lengths(list): number of frames of each clip
+        batch_size(int): maximum clips per batch
+        boundaries(tuple): sorted bucket lengths
+        rng(np.random.Generator): when given, clips and batches are shuffled
+
+    Output:
+        batches(list): list of (indices, bucket_length) tuples
+    """
+    buckets = {}
+    order = np.arange(len(lengths)) if rng is None else rng.permutation(len(lengths))
+    for index in order:
+        buckets.setdefault(bucket_length(lengths[index], boundaries), []).append(int(index))
+
+    batches = []
+    for length, indices in sorted(buckets.items()):
+        for start in range(0, len(indices), batch_size):
+            batches.append((indices[start:start+batch_size], length))
+
+    if rng is not None:
+        batches = [batches[i] for i in rng.permutation(len(batches))]
+
+    return batches
@@ -0,0 +1,149 @@
+"""
+sampling profiler of the running server: nothing runs until a profile is requested
+
+Every interval the thread that asked for the profile reads the current Python stack of every other thread
+(sys._current_frames) and counts each stack in collapsed form ("thread;file:function;... count", the
+input of flamegraph.pl and speedscope). In "cpu" mode a stack is only counted if its thread used CPU
+since the previous sample (per thread CPU clocks, where the platform has them), so threads blocked
+on a camera read, a queue or a socket don't hide the code that is actually running.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+class ProfilerBusyError(Exception):
+    pass
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+def _thread_clock(ident):
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError):
+        return None
+
+class SamplingProfiler:
+    """
+    one profile at a time of every thread of the process
+
+    Args:
+        max_seconds(float): longest profile accepted
+    """
+    def __init__(self, max_seconds = 60.0):
+        self.max_seconds = max_seconds
+        self.profiles = 0
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def profile(self, seconds, interval = 0.005, mode = "cpu", allocations = 0):
+        """
+        samples every thread for seconds and blocks until done
+
+        Args:
+            seconds(float): duration, at most max_seconds
+            interval(float): seconds between samples
+            mode(str): "cpu" counts only threads that used CPU since the previous sample, "wall" every thread
+            allocations(int): also trace memory allocations during the profile and return the top
+                allocations by source line (0 disables, tracemalloc slows every allocation while on)
+
+        Output:
+            profile(dict): collapsed stacks (Counter), number of samples, duration and, with
+                allocations, the top allocations
+
+        Raises:
+            ProfilerBusyError if another profile is running
+            ValueError for invalid arguments
+        """
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"duração deve estar entre 0 e {self.max_seconds}s")
+        if interval <= 0:
+            raise ValueError("intervalo deve ser positivo")
+        if mode not in ("cpu", "wall"):
+            raise ValueError("modo deve ser 'cpu' ou 'wall'")
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("já existe um profile em andamento")
+
+        try:
+            started_tracing = allocations and not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            try:
+                stacks, samples, elapsed = self._sample(seconds, interval, mode)
+                top = self._top_allocations(allocations) if allocations else None
+            finally:
+                if started_tracing:
+                    tracemalloc.stop()
+            self.profiles += 1
+        finally:
+            self._lock.release()
+
+        profile = {"stacks": stacks, "samples": samples, "seconds": round(elapsed, 3), "interval": interval, "mode": mode}
+        if top is not None:
+            profile["allocations"] = top
+        return profile
+
+    def _sample(self, seconds, interval, mode):
+        own = threading.get_ident()
+        clocks = {}
+        cpu_times = {}
+        stacks = Counter()
+        samples = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if mode == "cpu" and self._idle(ident, clocks, cpu_times):
+                    continue
+                names_on_stack = []
+                while frame is not None:
+                    names_on_stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                names_on_stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(names_on_stack))] += 1
+            samples += 1
+            time.sleep(max(0.0, min(interval, deadline - time.perf_counter())))
+        return stacks, samples, time.perf_counter() - start
+
+    @staticmethod
+    def _idle(ident, clocks, cpu_times):
+        if ident not in clocks:
+            clocks[ident] = _thread_clock(ident)
+        clock = clocks[ident]
+        if clock is None:
+            return False  # Sem relógio por thread: conta todas
+        try:
+            cpu = time.clock_gettime(clock)
+        except OSError:
+            return True  # A thread terminou
+        previous = cpu_times.get(ident)
+        cpu_times[ident] = cpu
+        # A primeira amostra de cada thread só estabelece a referência
+        return previous is None or cpu <= previous
+
+    @staticmethod
+    def _top_allocations(limit):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        return [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size_kb": round(stat.size/1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]
+        ]
+
+def collapsed(stacks):
+    """
+    collapsed stacks text, one "stack count" line per stack (flamegraph.pl, speedscope, inferno)
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
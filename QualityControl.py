@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Degraus de qualidade, do melhor ao mais econômico, na ordem em que são sacrificados:
+# primeiro a taxa de detecção do overlay, depois fps e resolução do vídeo, por fim o preview
+# inteiro (sem detecção enquanto houver reconhecimento em andamento)
+QUALITY_LEVELS = (
+    {"name": "full", "detect_every": 1, "max_fps": 30, "scale": 1.0, "jpeg_quality": 95, "defer_preview": False},
+    {"name": "overlay_half", "detect_every": 2, "max_fps": 30, "scale": 1.0, "jpeg_quality": 95, "defer_preview": False},
+    {"name": "overlay_quarter", "detect_every": 4, "max_fps": 30, "scale": 1.0, "jpeg_quality": 90, "defer_preview": False},
+    {"name": "stream_reduced", "detect_every": 4, "max_fps": 15, "scale": 0.75, "jpeg_quality": 80, "defer_preview": False},
+    {"name": "stream_minimal", "detect_every": 6, "max_fps": 8, "scale": 0.5, "jpeg_quality": 70, "defer_preview": False},
+    {"name": "preview_deferred", "detect_every": 6, "max_fps": 5, "scale": 0.5, "jpeg_quality": 60, "defer_preview": True},
+)
+
+class QualityController:
+    """
+    steps the quality of the live feed down under CPU pressure and back up when the load eases
+
+    Stages report their latency with observe(); the recognition latency (from the moment a recording
+    or a segment is queued until its result) is compared with the SLO. Once per interval the
+    controller looks at the recognition latencies since its last change of level (so one slow
+    recognition causes one step, not one per interval) and at the CPU load of the machine: if the
+    recognition gets close to the SLO or the CPU is saturated it drops one level of QUALITY_LEVELS,
+    and after recover_after calm intervals in a row it climbs back one level. One step per interval
+    and the gap between the high and low thresholds keep it from oscillating.
+
+    Args:
+        recognition_slo(float): target recognition latency in seconds
+        cpu_high(float): CPU load (0 to 1 of all cores) that counts as pressure
+        cpu_low(float): CPU load below which the load has eased
+        interval(float): seconds between decisions
+        recover_after(int): calm intervals before stepping back up
+        window(float): seconds of recognition latencies considered
+        enabled(bool): False keeps the best level
+    """
+    def __init__(self, recognition_slo = 2.0, cpu_high = 0.85, cpu_low = 0.6, interval = 1.0, recover_after = 5, window = 30.0, levels = QUALITY_LEVELS, enabled = True):
+        self.recognition_slo = recognition_slo
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.interval = interval
+        self.recover_after = recover_after
+        self.window = window
+        self.levels = levels
+        self.enabled = enabled
+        self.level = 0
+        self.cpu_load = 0.0
+        self.latencies = {}
+        self._recognitions = deque(maxlen=200)
+        self._calm = 0
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._last_change = self._last_check
+        self._last_cpu = time.process_time()
+
+    def observe(self, stage, seconds):
+        """
+        records the latency of a stage ("capture", "detection", "encoding", "recognition"...)
+        """
+        if stage == "recognition":
+            self._recognitions.append((time.monotonic(), seconds))
+        previous = self.latencies.get(stage)
+        self.latencies[stage] = seconds if previous is None else 0.9*previous + 0.1*seconds
+
+    def settings(self):
+        """
+        parameters of the current level (checks the load at most once per interval)
+        """
+        if self.enabled and time.monotonic() - self._last_check >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._update()
+            finally:
+                self._lock.release()
+        return self.levels[self.level]
+
+    def recognition_p95(self):
+        horizon = max(time.monotonic() - self.window, self._last_change)
+        recent = sorted(seconds for timestamp, seconds in list(self._recognitions) if timestamp >= horizon)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(0.95*len(recent)))]
+
+    def _measure_cpu(self, elapsed):
+        cores = os.cpu_count() or 1
+        cpu = time.process_time()
+        load = (cpu - self._last_cpu) / elapsed / cores
+        self._last_cpu = cpu
+        # Processos de inferência e outros programas não entram no process_time: usa também o loadavg
+        if hasattr(os, "getloadavg"):
+            load = max(load, os.getloadavg()[0] / cores)
+        return load
+
+    def _update(self):
+        now = time.monotonic()
+        self.cpu_load = self._measure_cpu(now - self._last_check)
+        self._last_check = now
+
+        p95 = self.recognition_p95()
+        pressure = self.cpu_load > self.cpu_high or (p95 is not None and p95 > 0.8*self.recognition_slo)
+        calm = self.cpu_load < self.cpu_low and (p95 is None or p95 < 0.5*self.recognition_slo)
+
+        if pressure:
+            self._calm = 0
+            if self.level < len(self.levels) - 1:
+                self.level += 1
+                self._last_change = now
+                print(f"⬇️ Qualidade reduzida para '{self.levels[self.level]['name']}' (CPU {self.cpu_load*100:.0f}%, reconhecimento p95 {p95 or 0:.2f}s)")
+        elif calm:
+            self._calm += 1
+            if self._calm >= self.recover_after and self.level > 0:
+                self._calm = 0
+                self.level -= 1
+                self._last_change = now
+                print(f"⬆️ Qualidade aumentada para '{self.levels[self.level]['name']}'")
+        else:
+            self._calm = 0
+
+    def status(self):
+        p95 = self.recognition_p95()
+        return {
+            "enabled": self.enabled,
+            "level": self.level,
+            "settings": self.levels[self.level],
+            "cpu_load": round(self.cpu_load, 3),
+            "recognition_p95": round(p95, 3) if p95 is not None else None,
+            "recognition_slo": self.recognition_slo,
+            "latencies_ms": {stage: round(1000*seconds, 2) for stage, seconds in self.latencies.items()},
+        }
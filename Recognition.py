@@ -0,0 +1,57 @@
+"""
+recognition of a clip from its landmarks, shared by the web server and the inference processes
+
+Importing it has no side effects (no cameras, threads or heavy libraries), so the processes of
+ServingWorkers can load it without importing app.py.
+"""
+import numpy as np
+
+def frame_has_hand(landmarks):
+    """
+    whether any hand was detected in the landmarks of a frame
+    """
+    _, _, wrist_right, wrist_left = landmarks
+    return any(wrist is not None and tuple(wrist) != (0.0, 0.0, 0.0) for wrist in (wrist_right, wrist_left))
+
+def usable_sign_index(index, bundle):
+    """
+    the sign index when it can classify the clips of the bundle, else None (empty or of another model)
+    """
+    if index is None or bundle is None or len(index) == 0 or index.model_version != bundle.version:
+        return None
+    return index
+
+def predict_sign(bundle, inputs, index = None):
+    """
+    sign and confidence of a preprocessed clip: nearest neighbour in the sign index or model output
+
+    Args:
+        bundle(ModelBundle): model, encoder and preprocessing
+        inputs(list): output of bundle.prepare_inputs
+        index(SignIndex): usable index of the bundle, None to use the model output
+
+    Output:
+        sign(str), confidence(float)
+    """
+    if index is not None:
+        return index.classify(bundle.embedding_model.predict_on_batch(inputs)[0])
+
+    result = bundle.model.predict(inputs, verbose=0)[0]
+    result_index = int(np.argmax(result))
+    return bundle.encoder.inverse_transform([result_index])[0], float(result[result_index])
+
+def classify_clip_landmarks(bundle, clip_landmarks, index = None):
+    """
+    classifies the landmarks of a clip with the preprocessing of the bundle
+
+    Args:
+        clip_landmarks(list): (right, left, wrist_right, wrist_left) of each frame
+
+    Output:
+        (sign, confidence), or None when no hand was detected
+    """
+    if not any(frame_has_hand(landmarks) for landmarks in clip_landmarks):
+        return None
+
+    local_right, local_left, wrist_right, wrist_left = zip(*clip_landmarks)
+    return predict_sign(bundle, bundle.prepare_inputs(local_right, local_left, wrist_right, wrist_left), index)
@@ -0,0 +1,127 @@
+from collections import deque
+
+import numpy as np
+
+from Preprocessing import DEFAULT_MAXLEN
+
+# Pontas dos dedos (polegar, indicador, médio, anelar, mínimo) entre os 21 landmarks do MediaPipe
+FINGERTIPS = (4, 8, 12, 16, 20)
+
+def _hand_present(wrist):
+    return wrist is not None and tuple(wrist) != (0.0, 0.0, 0.0)
+
+class MotionSegmenter:
+    """
+    splits a live stream of landmarks into signs by the motion energy of the hands
+
+    The energy of a frame is the wrist speed (image coordinates) plus the mean fingertip speed
+    (wrist normalized coordinates, weighted by fingertip_weight) of every hand present in this
+    frame and the previous one, smoothed with an exponential moving average. A sign starts when
+    the energy stays above start_threshold for start_frames frames and ends when it stays below
+    stop_threshold (or no hand is seen) for stop_frames frames; the gap between the two
+    thresholds keeps noise from toggling the state. Only completed segments are returned, so the
+    classifier doesn't run while the hands are still or out of view.
+
+    Args:
+        start_threshold(float): energy that starts a sign
+        stop_threshold(float): energy below which a sign ends, lower than start_threshold
+        start_frames(int): consecutive frames above start_threshold to start
+        stop_frames(int): consecutive frames below stop_threshold to end
+        min_length(int): shorter segments are discarded as noise
+        max_length(int): a segment is closed when it reaches this many frames (the model's maxlen)
+        pre_roll(int): frames before the start kept in the segment (the beginning of the movement)
+        fingertip_weight(float): weight of the fingertip speed relative to the wrist speed
+        smoothing(float): weight of the new frame in the moving average of the energy
+    """
+    def __init__(self, start_threshold = 0.012, stop_threshold = 0.005, start_frames = 3, stop_frames = 8, min_length = 10, max_length = DEFAULT_MAXLEN, pre_roll = 5, fingertip_weight = 0.1, smoothing = 0.5):
+        if stop_threshold >= start_threshold:
+            raise ValueError("stop_threshold deve ser menor que start_threshold")
+
+        self.start_threshold = start_threshold
+        self.stop_threshold = stop_threshold
+        self.start_frames = start_frames
+        self.stop_frames = stop_frames
+        self.min_length = min_length
+        self.max_length = max_length
+        self.pre_roll = pre_roll
+        self.fingertip_weight = fingertip_weight
+        self.smoothing = smoothing
+        self.segments = 0
+        self.discarded = 0
+        self.reset()
+
+    def reset(self):
+        self.active = False
+        self.energy = 0.0
+        self._previous = None
+        self._history = deque(maxlen=self.pre_roll + self.start_frames)
+        self._segment = []
+        self._count = 0
+
+    def frame_energy(self, landmarks):
+        """
+        raw motion energy between the previous frame and this one
+        """
+        energy = 0.0
+        if self._previous is not None:
+            for hand in (0, 1):
+                wrist, previous_wrist = landmarks[2 + hand], self._previous[2 + hand]
+                if not (_hand_present(wrist) and _hand_present(previous_wrist)):
+                    continue
+                energy += float(np.linalg.norm(np.subtract(wrist[:2], previous_wrist[:2])))
+                tips = np.asarray(landmarks[hand], dtype='float32').reshape(-1, 3)[FINGERTIPS, :2]
+                previous_tips = np.asarray(self._previous[hand], dtype='float32').reshape(-1, 3)[FINGERTIPS, :2]
+                energy += self.fingertip_weight*float(np.linalg.norm(tips - previous_tips, axis=1).mean())
+        return energy
+
+    def update(self, local_right, local_left, wrist_right, wrist_left):
+        """
+        feeds one frame
+
+        Args:
+            local_right, local_left: 21 (x,y,z) normalized landmarks of each hand (zeros when not detected)
+            wrist_right, wrist_left: (x,y,z) wrist of each hand (zeros when not detected)
+
+        Output:
+            segment(list): (local_right, local_left, wrist_right, wrist_left) of every frame of a
+                completed sign, or None
+        """
+        landmarks = (local_right, local_left, wrist_right, wrist_left)
+        hands = _hand_present(wrist_right) or _hand_present(wrist_left)
+        self.energy = (1 - self.smoothing)*self.energy + self.smoothing*self.frame_energy(landmarks)
+        self._previous = landmarks
+
+        if not self.active:
+            self._history.append(landmarks)
+            self._count = self._count + 1 if hands and self.energy > self.start_threshold else 0
+            if self._count >= self.start_frames:
+                self.active = True
+                self._segment = list(self._history)
+                self._history.clear()
+                self._count = 0
+            return None
+
+        self._segment.append(landmarks)
+        self._count = self._count + 1 if not hands or self.energy < self.stop_threshold else 0
+        if self._count >= self.stop_frames or len(self._segment) >= self.max_length:
+            # Os frames parados do fim não fazem parte do sinal
+            segment = self._segment[:len(self._segment) - self._count] if self._count < len(self._segment) else []
+            self.active = False
+            self._segment = []
+            self._count = 0
+            if len(segment) < self.min_length:
+                self.discarded += 1
+                return None
+            self.segments += 1
+            return segment
+
+        return None
+
+    def status(self):
+        return {
+            "active": self.active,
+            "energy": round(self.energy, 5),
+            "frames": len(self._segment),
+            "segments": self.segments,
+            "discarded": self.discarded,
+        }
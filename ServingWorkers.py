@@ -0,0 +1,129 @@
+"""
+worker processes that run the model predictions of recordings outside the web server process
+
+The web server keeps the cameras, the recording state, the streaming classifier and the hand
+detectors: it extracts the landmarks of each recording and sends only them (a few KB instead of
+every frame) to one of the workers, which preprocesses the clip and runs the model. Predictions of
+different recordings then run on their own cores instead of competing for the GIL of the server.
+
+Workers import only Recognition, ModelBundle and SignIndex, never app.py (which opens the cameras
+and starts threads when imported). TensorFlow starts native threads when loaded, so forking a
+process that already loaded it is unsafe: workers are spawned and each loads the bundle once when it
+starts. One process is enough for most servers; every extra process holds another copy of the model.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from ThreadBudget import apply_thread_budget, thread_budget
+
+_bundle = None
+_sign_index_path = None
+_sign_index = None
+_sign_index_mtime = None
+
+def _init_worker(source, encoder_path, sign_index_path, threads):
+    """
+    sets the thread budget of the worker, then loads the model
+    """
+    global _bundle, _sign_index_path
+
+    # Um processo faz uma predição por vez: todas as suas threads para o TensorFlow e o BLAS
+    apply_thread_budget(thread_budget("serving", cores=threads, tf_intra=threads, tf_inter=1, blas=threads, detectors=1), verbose=False)
+
+    from ModelBundle import load_bundle, load_legacy_files
+
+    bundle = load_legacy_files(source, encoder_path) if encoder_path is not None else load_bundle(source)
+    bundle.warm_up()
+    _bundle = bundle
+    _sign_index_path = sign_index_path
+
+def _ready():
+    return os.getpid()
+
+def _load_sign_index():
+    """
+    the sign index of the server, read again when the file changes (enrollments are saved by the server)
+    """
+    global _sign_index, _sign_index_mtime
+    from Recognition import usable_sign_index
+    from SignIndex import SignIndex
+
+    if _sign_index_path is None or not os.path.exists(_sign_index_path):
+        return None
+    mtime = os.path.getmtime(_sign_index_path)
+    if mtime != _sign_index_mtime:
+        _sign_index = SignIndex.load(_sign_index_path)
+        _sign_index_mtime = mtime
+    return usable_sign_index(_sign_index, _bundle)
+
+def _classify(clip_landmarks):
+    from Recognition import classify_clip_landmarks
+    return classify_clip_landmarks(_bundle, clip_landmarks, _load_sign_index())
+
+class RecordingWorkerPool:
+    """
+    pool of spawned processes, each with the model loaded once at start
+
+    Args:
+        source(str): .stlbundle file, or the .keras file when encoder_path is given
+        encoder_path(str): Encoder.p of a legacy model, None for a bundle
+        sign_index_path(str): sign index saved by the server (STL_SIGN_INDEX), None without one
+        processes(int): number of worker processes
+        threads_per_process(int): TensorFlow/BLAS threads per worker (default: cores // processes)
+    """
+    def __init__(self, source, encoder_path = None, sign_index_path = None, processes = 1, threads_per_process = None):
+        self.source = source
+        self.encoder_path = encoder_path
+        self.sign_index_path = sign_index_path
+        self.processes = processes
+        self.threads_per_process = threads_per_process or max(1, (os.cpu_count() or 1)//processes)
+        self._executor = self._start()
+
+    def _start(self):
+        executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.source, self.encoder_path, self.sign_index_path, self.threads_per_process),
+        )
+        # Sobe todos os processos agora, para a primeira gravação não pagar a carga do modelo
+        pids = {future.result() for future in [executor.submit(_ready) for _ in range(self.processes)]}
+        print(f"✓ {len(pids)} processo(s) de inferência prontos ({self.threads_per_process} thread(s) cada)")
+        return executor
+
+    def classify(self, clip_landmarks, job = None):
+        """
+        classifies the landmarks of a recording in one of the workers
+
+        Args:
+            clip_landmarks(list): (right, left, wrist_right, wrist_left) of each frame
+            job(Job): when given, a cancellation stops waiting (the worker result is discarded)
+
+        Output:
+            (sign, confidence), or None when no hand was detected
+        """
+        future = self._executor.submit(_classify, clip_landmarks)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except TimeoutError:
+                if job is not None and job.cancelled:
+                    future.cancel()
+                    job.check_cancelled()
+
+    def reload(self, source):
+        """
+        replaces the workers with new ones serving another bundle
+
+        The new workers are started before the old ones are released, so recordings keep being
+        classified during the swap.
+        """
+        previous = self._executor
+        self.source = source
+        self.encoder_path = None
+        self._executor = self._start()
+        previous.shutdown(wait=False)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
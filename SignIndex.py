@@ -0,0 +1,201 @@
+"""
+nearest neighbour index of sign embeddings: new signs are enrolled from a few clips, without retraining
+
+The embedding of a clip is the output of the model's penultimate Dense layer (before the dropout and
+the softmax). The index keeps the L2 normalized embeddings of the reference clips of every sign in one
+float32 matrix, so a lookup is a single matrix-vector product (cosine similarity) plus an argmax.
+
+Usage:
+    python SignIndex.py build --bundle ModelY2.0.stlbundle --data all_data.p --output signs.npz
+    python SignIndex.py enroll --bundle ModelY2.0.stlbundle --data data/obrigado --label obrigado --output signs.npz
+"""
+import os
+import threading
+
+import numpy as np
+
+def build_embedding_model(model):
+    """
+    model with the same inputs whose output is the penultimate Dense layer of the classifier
+
+    Raises:
+        ValueError if the model doesn't have a Dense layer before the output layer
+    """
+    from keras import Model
+    from keras.layers import Dense
+
+    dense_layers = [layer for layer in model.layers if isinstance(layer, Dense)]
+    if len(dense_layers) < 2:
+        raise ValueError("o modelo não tem uma camada Dense antes da saída")
+
+    return Model(model.inputs, dense_layers[-2].output)
+
+def _normalize(embeddings):
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype='float32'))
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+class SignIndex:
+    """
+    reference embeddings of every enrolled sign
+
+    The matrix and the labels are replaced together on every change, so a lookup running in another
+    thread always sees a consistent index. Changes and saves are serialized by a lock, so concurrent
+    enrollments don't lose each other's clips.
+
+    Args:
+        model_version(str): version of the bundle the embeddings came from; embeddings of another
+            model aren't comparable
+    """
+    def __init__(self, model_version = None):
+        self.model_version = model_version
+        self._data = (np.zeros((0, 0), dtype='float32'), np.array([], dtype=str))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data[1])
+
+    @property
+    def labels(self):
+        return sorted(set(self._data[1].tolist()))
+
+    def counts(self):
+        """
+        Output:
+            counts(dict): number of reference clips of each sign
+        """
+        labels, counts = np.unique(self._data[1], return_counts=True)
+        return {str(label): int(count) for label, count in zip(labels, counts)}
+
+    def add(self, label, embeddings):
+        """
+        enrolls reference clips of a sign (new or already known)
+
+        Args:
+            label(str): sign
+            embeddings(array): (n, dimension) embeddings of the reference clips
+
+        Output:
+            references(int): reference clips of the sign after the change
+
+        Raises:
+            ValueError if the dimension doesn't match the index
+        """
+        embeddings = _normalize(embeddings)
+        with self._lock:
+            matrix, labels = self._data
+            if len(labels) and embeddings.shape[1] != matrix.shape[1]:
+                raise ValueError(f"embeddings de dimensão {embeddings.shape[1]}, o índice tem {matrix.shape[1]}")
+
+            matrix = np.concatenate([matrix, embeddings]) if len(labels) else np.ascontiguousarray(embeddings)
+            labels = np.concatenate([labels, np.full(len(embeddings), str(label))])
+            self._data = (matrix, labels)
+        return int(np.count_nonzero(labels == str(label)))
+
+    def remove(self, label):
+        """
+        Output:
+            removed(int): reference clips removed
+        """
+        with self._lock:
+            matrix, labels = self._data
+            keep = labels != str(label)
+            self._data = (np.ascontiguousarray(matrix[keep]), labels[keep])
+        return int(len(labels) - np.count_nonzero(keep))
+
+    def search(self, embeddings, k = 1):
+        """
+        nearest reference clips of each embedding by cosine similarity
+
+        Args:
+            embeddings(array): (dimension,) or (m, dimension)
+            k(int): neighbours returned per embedding
+
+        Output:
+            labels(array): (m, k) sign of each neighbour, nearest first
+            similarities(array): (m, k) cosine similarity of each neighbour
+        """
+        matrix, labels = self._data
+        if not len(labels):
+            raise ValueError("índice vazio")
+
+        similarities = _normalize(embeddings) @ matrix.T
+        k = min(k, len(labels))
+        if k == 1:
+            nearest = np.argmax(similarities, axis=1)[:, None]
+        else:
+            nearest = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(similarities, nearest, axis=1), axis=1)
+            nearest = np.take_along_axis(nearest, order, axis=1)
+
+        return labels[nearest], np.take_along_axis(similarities, nearest, axis=1)
+
+    def classify(self, embedding):
+        """
+        Output:
+            sign(str): sign of the nearest reference clip
+            similarity(float): its cosine similarity
+        """
+        labels, similarities = self.search(embedding)
+        return str(labels[0, 0]), float(similarities[0, 0])
+
+    def save(self, path):
+        """
+        writes the index to an .npz file (through a temporary file, so a reader never sees a partial index)
+        """
+        with self._lock:
+            matrix, labels = self._data
+            partial_path = path + ".partial"
+            with open(partial_path, 'wb') as f:
+                np.savez(f, embeddings=matrix, labels=labels, model_version=np.array(self.model_version or ""))
+            os.replace(partial_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(str(data["model_version"]) or None)
+            index._data = (np.ascontiguousarray(data["embeddings"], dtype='float32'), data["labels"].astype(str))
+        return index
+
+def main():
+    import argparse
+    from collections import defaultdict
+    from Evaluation import load_dataset
+    from ModelBundle import load_bundle, load_legacy_files
+
+    parser = argparse.ArgumentParser(description="Cria ou amplia o índice de sinais por embeddings")
+    parser.add_argument("command", choices=["build", "enroll"])
+    parser.add_argument("--data", required=True, help="all_data.p ou diretório de arquivos .p")
+    parser.add_argument("--bundle", default="ModelY2.0.stlbundle")
+    parser.add_argument("--model", help="modelo .keras solto (em vez do bundle)")
+    parser.add_argument("--encoder", default="Encoder.p")
+    parser.add_argument("--label", help="sinal dos clipes (enroll); padrão: o diretório de cada clipe")
+    parser.add_argument("--references", type=int, default=0, help="máximo de clipes por sinal (0: todos)")
+    parser.add_argument("--output", default="signs.npz")
+    args = parser.parse_args()
+
+    bundle = load_legacy_files(args.model, args.encoder) if args.model else load_bundle(args.bundle)
+
+    if args.command == "enroll" and os.path.exists(args.output):
+        index = SignIndex.load(args.output)
+        if index.model_version != bundle.version:
+            raise SystemExit(f"✗ {args.output} foi criado com o modelo {index.model_version}, não {bundle.version}")
+    else:
+        index = SignIndex(bundle.version)
+
+    labels, clips = load_dataset(args.data)
+    clips_by_label = defaultdict(list)
+    for label, clip in zip(labels, clips):
+        clips_by_label[args.label or str(label)].append(clip)
+
+    for label, label_clips in sorted(clips_by_label.items()):
+        if args.references:
+            label_clips = label_clips[:args.references]
+        references = index.add(label, bundle.embed(label_clips))
+        print(f"   {label}: {references} clipe(s) de referência")
+
+    index.save(args.output)
+    print(f"✓ Índice salvo em {args.output} ({len(index.labels)} sinais, {len(index)} clipes)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import numpy as np
+
+from keras.layers import Concatenate, Conv1D, Dense, InputLayer, LSTM
+
+from ModelLayers import FrameMask
+from Preprocessing import DEFAULT_MAXLEN, WRIST_NORMALIZATION, prepare_clip
+
+def _sigmoid(x):
+    return 1.0/(1.0 + np.exp(-x))
+
+def _source_layer(tensor):
+    return tensor._keras_history.operation
+
+class _LSTMStep:
+    """
+    one LSTM of the model, updated one frame at a time with its (h, c) state carried between calls
+    """
+    def __init__(self, layer):
+        kernel, recurrent_kernel, bias = layer.get_weights()
+        self.kernel = kernel.astype('float32')
+        self.recurrent_kernel = recurrent_kernel.astype('float32')
+        self.bias = bias.astype('float32')
+        self.units = layer.units
+        self.reset()
+
+    def reset(self):
+        self.h = np.zeros(self.units, dtype='float32')
+        self.c = np.zeros(self.units, dtype='float32')
+
+    def step(self, x):
+        # Ordem das portas no Keras: input, forget, cell, output
+        z = x @ self.kernel + self.h @ self.recurrent_kernel + self.bias
+        units = self.units
+        input_gate = _sigmoid(z[:units])
+        forget_gate = _sigmoid(z[units:2*units])
+        output_gate = _sigmoid(z[3*units:])
+        self.c = forget_gate*self.c + input_gate*np.tanh(z[2*units:3*units])
+        self.h = output_gate*np.tanh(self.c)
+
+class _CausalConvBuffer:
+    """
+    keeps the last kernel_size frames of one input so a Conv1D output can be computed for the newest frame
+    """
+    def __init__(self, layer):
+        kernel, bias = layer.get_weights()
+        self.kernel_size, input_dim, filters = kernel.shape
+        self.kernel = kernel.reshape(self.kernel_size*input_dim, filters).astype('float32')
+        self.bias = bias.astype('float32')
+        self.input_dim = input_dim
+        self.reset()
+
+    def reset(self):
+        # Com padding causal os frames anteriores ao início valem zero
+        self.frames = np.zeros((self.kernel_size, self.input_dim), dtype='float32')
+
+    def step(self, x):
+        self.frames[:-1] = self.frames[1:]
+        self.frames[-1] = x
+        return np.maximum(self.frames.reshape(-1) @ self.kernel + self.bias, 0.0)
+
+# Posição das trajetórias do pulso nas entradas do modelo (local_right, local_left, global_right, global_left)
+WRIST_INPUTS = (2, 3)
+
+class StreamingClassifier:
+    """
+    runs a trained four branch LSTM classifier one frame at a time
+
+    The Conv1D outputs come from a buffer of the last frames and the four LSTMs carry their state
+    between frames, so each new frame costs one LSTM step instead of a full model.predict over the
+    sequence. The prediction for the frames seen so far is available after every update and is
+    equal to model.predict on the same frames.
+
+    Only models built with masking=True are supported: their causal Conv1D and masked LSTMs make
+    the prediction of a prefix independent of the padding that follows it. Frames with no hand
+    (all inputs zero) keep the state, like the mask, and at most maxlen frames are used, counted
+    from the first frame with a hand (trimming and truncation of the batch path).
+
+    The wrist trajectories are normalized over the whole clip (Preprocessing.prepare_clip), which
+    isn't known until its last frame: the wrist branches keep the frames and run over the prepared
+    clip in predict(), only the landmark branches advance frame by frame. Their LSTMs have 3 inputs,
+    so this costs a fraction of a model.predict.
+
+    Args:
+        model(Model): model built by ModelDevelopment.build_model(masking=True)
+        maxlen(int): maximum number of frames of a clip
+        wrist_normalization(str): wrist normalization of the bundle (prepare_clip)
+    """
+    def __init__(self, model, maxlen = DEFAULT_MAXLEN, wrist_normalization = WRIST_NORMALIZATION):
+        if not any(isinstance(layer, FrameMask) for layer in model.layers):
+            raise ValueError("o modelo não usa máscara (treine com masking=True) e não pode ser executado frame a frame")
+
+        concatenate = next(layer for layer in model.layers if isinstance(layer, Concatenate))
+        self.branches = []
+        for tensor in concatenate.input:
+            lstm = _source_layer(tensor)
+            if not isinstance(lstm, LSTM):
+                raise ValueError(f"camada inesperada antes do Concatenate: {lstm.name}")
+
+            source = lstm._inbound_nodes[0].arguments.args[0]
+            conv = None
+            if isinstance(_source_layer(source), Conv1D):
+                conv = _CausalConvBuffer(_source_layer(source))
+                source = _source_layer(source)._inbound_nodes[0].arguments.args[0]
+            if not isinstance(_source_layer(source), InputLayer):
+                raise ValueError(f"entrada inesperada do {lstm.name}")
+
+            input_index = next(i for i, model_input in enumerate(model.inputs) if model_input is source)
+            self.branches.append((input_index, conv, _LSTMStep(lstm)))
+
+        dense, output = [layer for layer in model.layers if isinstance(layer, Dense)]
+        self.dense_kernel, self.dense_bias = dense.get_weights()
+        self.output_kernel, self.output_bias = output.get_weights()
+
+        self.maxlen = maxlen
+        self.wrist_normalization = wrist_normalization
+        self.reset()
+
+    def reset(self):
+        """
+        starts a new clip
+        """
+        for _, conv, lstm in self.branches:
+            if conv is not None:
+                conv.reset()
+            lstm.reset()
+        self.frames = 0
+        self.started = False
+        self._clip = []
+        self._probabilities = None
+
+    @property
+    def full(self):
+        return self.frames >= self.maxlen
+
+    def update(self, local_right, local_left, wrist_right, wrist_left):
+        """
+        feeds one frame
+
+        Args:
+            local_right, local_left: 21 (x,y,z) normalized landmarks of each hand (zeros when not detected)
+            wrist_right, wrist_left: (x,y,z) wrist of each hand, absolute (zeros when not detected)
+        """
+        inputs = (
+            np.asarray(local_right, dtype='float32').reshape(-1),
+            np.asarray(local_left, dtype='float32').reshape(-1),
+            np.asarray(wrist_right, dtype='float32').reshape(-1),
+            np.asarray(wrist_left, dtype='float32').reshape(-1),
+        )
+
+        if not self.started:
+            if not (inputs[0].any() or inputs[1].any()):
+                return
+            self.started = True
+
+        if self.full:
+            return
+        self.frames += 1
+        self._clip.append(inputs)
+
+        present = any(x.any() for x in inputs)
+        for input_index, conv, lstm in self.branches:
+            if input_index in WRIST_INPUTS:
+                continue
+            x = inputs[input_index]
+            if conv is not None:
+                x = conv.step(x)
+            if present:
+                lstm.step(x)
+
+        self._probabilities = None
+
+    def predict(self):
+        """
+        prediction for the frames seen so far (what model.predict would return for them)
+
+        Output:
+            probabilities(np.ndarray): (num_classes,)
+        """
+        if self._probabilities is None:
+            self._run_wrist_branches()
+            features = np.concatenate([lstm.h for _, _, lstm in self.branches])
+            hidden = np.maximum(features @ self.dense_kernel + self.dense_bias, 0.0)
+            logits = hidden @ self.output_kernel + self.output_bias
+            exp = np.exp(logits - logits.max())
+            self._probabilities = exp/exp.sum()
+        return self._probabilities
+
+    def _run_wrist_branches(self):
+        """
+        runs the wrist branches over the frames fed so far, with the wrists prepared like the batch path
+        """
+        arrays = prepare_clip(*(np.stack(frames) for frames in zip(*self._clip)), maxlen=self.maxlen, wrist_normalization=self.wrist_normalization) if self._clip else None
+        for input_index, conv, lstm in self.branches:
+            if input_index not in WRIST_INPUTS:
+                continue
+            if conv is not None:
+                conv.reset()
+            lstm.reset()
+            if arrays is None:
+                continue
+            for frame in range(len(arrays[0])):
+                x = arrays[input_index][frame]
+                if conv is not None:
+                    x = conv.step(x)
+                if any(array[frame].any() for array in arrays):
+                    lstm.step(x)
@@ -0,0 +1,178 @@
+"""
+thread budgets of the native libraries and worker pools of one process
+
+TensorFlow (intra and inter op pools), the BLAS libraries, OpenCV and the hand detectors each size
+themselves to every core of the machine, so a process that uses several of them at once runs many
+more threads than cores. A ThreadBudget splits the cores between them for one kind of work:
+
+    serving     cameras, hand detection, recognition and streams at the same time in app.py:
+                one thread per library call, half of the cores for hand detectors, a small
+                TensorFlow pool for batch-of-one predictions
+    training    model.fit: every core to TensorFlow and BLAS, nothing else running
+    extraction  bulk landmark extraction: one hand detector per core, single threaded libraries
+
+MediaPipe has no thread setting in its tasks API: its budget is the number of detectors that run
+at once (DetectorPool size). Flask's development server starts one thread per connection and can't
+be bounded; the requests budget sizes the threads of waitress (app.py with STL_DEBUG=0) and the
+thread pools of AsyncServer.py.
+
+STL_THREAD_BUDGET=0 disables the governor, STL_THREAD_CORES sets the number of cores given to the
+process, STL_THREADS overrides single budgets ("tf_intra=2,detectors=3") and STL_CPU_AFFINITY pins
+the process to a list of cores ("0-3,8").
+"""
+import os
+import sys
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS")
+
+BUDGETS = ("tf_intra", "tf_inter", "blas", "opencv", "detectors", "requests")
+
+def _serving(cores):
+    return {"tf_intra": min(4, max(1, cores//4)), "tf_inter": 1, "blas": 1, "opencv": 1, "detectors": max(1, cores//2), "requests": max(16, 2*cores)}
+
+def _training(cores):
+    return {"tf_intra": cores, "tf_inter": 2 if cores >= 8 else 1, "blas": cores, "opencv": 1, "detectors": 1, "requests": 1}
+
+def _extraction(cores):
+    return {"tf_intra": 1, "tf_inter": 1, "blas": 1, "opencv": 1, "detectors": cores, "requests": 1}
+
+PRESETS = {"serving": _serving, "training": _training, "extraction": _extraction}
+
+class ThreadBudget:
+    """
+    threads each library and pool of the process may use
+
+    Args:
+        cores(int): cores given to the process
+        tf_intra(int): TensorFlow threads inside one operation
+        tf_inter(int): TensorFlow operations run at the same time
+        blas(int): OpenMP / MKL / OpenBLAS threads
+        opencv(int): OpenCV threads (cv2.setNumThreads)
+        detectors(int): hand detectors used in parallel (MediaPipe)
+        requests(int): threads serving requests
+        affinity(set): cores the process is pinned to, None leaves it to the scheduler
+        preset(str): name of the preset it came from
+    """
+    def __init__(self, cores, tf_intra, tf_inter, blas, opencv, detectors, requests, affinity = None, preset = None):
+        self.cores = cores
+        self.tf_intra = tf_intra
+        self.tf_inter = tf_inter
+        self.blas = blas
+        self.opencv = opencv
+        self.detectors = detectors
+        self.requests = requests
+        self.affinity = affinity
+        self.preset = preset
+
+    def as_dict(self):
+        budget = {name: getattr(self, name) for name in BUDGETS}
+        return dict(budget, preset=self.preset, cores=self.cores, affinity=sorted(self.affinity) if self.affinity else None)
+
+    def __repr__(self):
+        budgets = ", ".join(f"{name}={getattr(self, name)}" for name in BUDGETS)
+        return f"ThreadBudget({self.preset}, cores={self.cores}, {budgets})"
+
+def parse_cores(spec):
+    """
+    "0-3,8" -> {0, 1, 2, 3, 8}
+    """
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cores.update(range(int(first), int(last or first) + 1))
+    return cores
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def thread_budget(preset, cores = None, affinity = None, **overrides):
+    """
+    budget of a preset for the cores of the process, with the STL_THREAD_CORES, STL_CPU_AFFINITY and
+    STL_THREADS overrides
+
+    Args:
+        preset(str): "serving", "training" or "extraction"
+        cores(int): cores given to the process (default: STL_THREAD_CORES, the affinity, or every core)
+        affinity(set): cores to pin the process to (default: STL_CPU_AFFINITY)
+        overrides: single budgets (tf_intra=2, ...), applied after STL_THREADS
+
+    Output:
+        budget(ThreadBudget)
+
+    Raises:
+        ValueError for an unknown preset or budget
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"preset desconhecido: {preset} (use {', '.join(PRESETS)})")
+
+    if affinity is None and os.environ.get('STL_CPU_AFFINITY'):
+        affinity = parse_cores(os.environ['STL_CPU_AFFINITY'])
+    if cores is None:
+        cores = int(os.environ.get('STL_THREAD_CORES', '0')) or (len(affinity) if affinity else available_cores())
+
+    budgets = PRESETS[preset](max(1, cores))
+    for item in os.environ.get('STL_THREADS', '').split(","):
+        if item.strip():
+            name, _, value = item.partition("=")
+            overrides.setdefault(name.strip(), int(value))
+    for name, value in overrides.items():
+        if name not in BUDGETS:
+            raise ValueError(f"orçamento desconhecido: {name} (use {', '.join(BUDGETS)})")
+        budgets[name] = max(1, int(value))
+
+    return ThreadBudget(cores, affinity=affinity, preset=preset, **budgets)
+
+def apply_thread_budget(budget, verbose = True):
+    """
+    applies a budget to the process: libraries not loaded yet read it from their environment
+    variables when they load, loaded ones are configured directly (cv2, TensorFlow before its first
+    operation and, with threadpoolctl installed, the BLAS of numpy)
+
+    The detectors and requests budgets are read by the code that creates those pools
+    (app.EXTRACTION_WORKERS, AsyncServer.WSGI_THREADS).
+
+    Args:
+        budget(ThreadBudget): None or STL_THREAD_BUDGET=0 leaves the process as it is
+
+    Output:
+        applied(bool)
+    """
+    if budget is None or os.environ.get('STL_THREAD_BUDGET', '1') == '0':
+        return False
+
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(budget.blas if var != "TF_NUM_INTRAOP_THREADS" else budget.tf_intra)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(budget.tf_inter)
+    os.environ["OPENCV_FOR_THREADS_NUM"] = str(budget.opencv)
+
+    if budget.affinity and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, budget.affinity)
+
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(budget.opencv)
+
+    if "numpy" in sys.modules:
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(budget.blas)
+        except ImportError:
+            pass  # Sem threadpoolctl, o BLAS já carregado mantém o número de threads com que iniciou
+
+    if "tensorflow" in sys.modules:
+        tf = sys.modules["tensorflow"]
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(budget.tf_intra)
+            tf.config.threading.set_inter_op_parallelism_threads(budget.tf_inter)
+        except RuntimeError:
+            # O runtime já foi iniciado: os pools do TensorFlow ficam com o tamanho que já têm
+            if verbose:
+                print("⚠️ TensorFlow já iniciado, orçamento de threads dele não aplicado")
+
+    if verbose:
+        print(f"🧵 {budget}")
+    return True
@@ -0,0 +1,331 @@
+"""
+k-fold cross validation of a grid of build_model configurations, run in parallel worker processes
+
+Trials train like train_model: trimmed variable length clips in length buckets, masked models and
+augmented batches, so the best configuration and the bundle saved for it match what is served.
+
+Usage:
+    python TrialRunner.py --folds 5 --workers 4 --grid grid.json
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from ThreadBudget import apply_thread_budget, thread_budget
+
+DEFAULT_GRID = {
+    "conv_filters": [32, 64],
+    "lstm_units": [64, 128],
+    "dense_units": [64],
+    "dropout": [0.5],
+}
+
+# Chaves da grade que vão para model.fit em vez de build_model
+# ("architecture" escolhe a função de ARCHITECTURES; os demais parâmetros vão para ela)
+FIT_PARAMETERS = ("batch_size", "epochs")
+
+_worker_data = None
+
+def architecture_parameters():
+    """
+    grid parameters taken by the builder of each architecture (_fit passes masking and num_classes)
+
+    Output:
+        parameters(dict): architecture -> set of parameter names
+    """
+    import inspect
+    from ModelDevelopment import ARCHITECTURES
+
+    return {name: set(inspect.signature(build).parameters) - {"masking", "num_classes"} for name, build in ARCHITECTURES.items()}
+
+def expand_grid(grid):
+    """
+    expands a {parameter: [values]} grid into the list of every configuration
+
+    A grid may mix architectures: each configuration keeps only the parameters of its own builder
+    (e.g. conv_filters for lstm, filters for tcn), and configurations left identical are kept once.
+
+    Args:
+        grid(dict): lists of values per architecture / builder / fit parameter
+
+    Output:
+        configs(list): list of dicts
+
+    Raises:
+        ValueError if the grid has an unknown architecture or a parameter none of its architectures takes
+    """
+    parameters = architecture_parameters()
+    architectures = grid.get("architecture", ["lstm"])
+    unknown = [architecture for architecture in architectures if architecture not in parameters]
+    if unknown:
+        raise ValueError(f"arquitetura desconhecida: {', '.join(map(str, unknown))} (disponíveis: {', '.join(parameters)})")
+    accepted = set(FIT_PARAMETERS) | {"architecture"} | set().union(*(parameters[architecture] for architecture in architectures))
+    unknown = sorted(set(grid) - accepted)
+    if unknown:
+        raise ValueError(f"parâmetros que nenhuma arquitetura da grade aceita: {', '.join(unknown)}")
+
+    keys = sorted(grid)
+    configs = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        config = dict(zip(keys, values))
+        own = parameters[config.get("architecture", "lstm")] | set(FIT_PARAMETERS) | {"architecture"}
+        config = {key: value for key, value in config.items() if key in own}
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+def make_folds(labels_one_hot, folds, seed = 0):
+    """
+    splits the clips in k folds, stratified when every class has at least k clips
+
+    Output:
+        list of (train_indices, validation_indices)
+    """
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    classes = np.argmax(labels_one_hot, axis=1)
+    if np.bincount(classes).min() >= folds:
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    else:
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=seed)
+
+    return list(splitter.split(classes, classes))
+
+def save_dataset(data_dir, clips, labels_one_hot):
+    """
+    writes the preprocessed clips once, concatenated as in the dataset cache, as .npy files that
+    every worker memory maps
+    """
+    from DatasetCache import pack_clips
+
+    for name, array in pack_clips(clips).items():
+        np.save(os.path.join(data_dir, f"{name}.npy"), array)
+    np.save(os.path.join(data_dir, "labels.npy"), labels_one_hot)
+
+def _init_worker(data_dir, threads, cores_queue, boundaries, augment):
+    """
+    pins the thread budget (and the cores, when available) of a worker before TensorFlow is imported
+    and maps the shared dataset
+    """
+    global _worker_data
+    from DatasetCache import INPUT_NAMES, unpack_clips
+
+    affinity = cores_queue.get() if cores_queue is not None else None
+    apply_thread_budget(thread_budget("training", cores=threads, affinity=affinity, tf_inter=1), verbose=False)
+
+    arrays = {name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode='r') for name in ("lengths",) + INPUT_NAMES}
+    labels = np.load(os.path.join(data_dir, "labels.npy"), mmap_mode='r')
+    _worker_data = (unpack_clips(arrays), labels, boundaries, augment)
+
+def _fit(config, train_idx, validation_idx, seed):
+    import keras
+    from keras.callbacks import EarlyStopping
+    from Augmentation import LandmarkAugmenter
+    from Batching import BucketedClips
+    from ModelDevelopment import ARCHITECTURES
+
+    keras.utils.set_random_seed(seed)
+
+    clips, labels, boundaries, augment = _worker_data
+    model_config = {key: value for key, value in config.items() if key not in FIT_PARAMETERS}
+    build = ARCHITECTURES[model_config.pop("architecture", "lstm")]
+    model = build(masking=True, num_classes=labels.shape[1], **model_config)
+    model.compile(optimizer='adam',loss='categorical_crossentropy',metrics=['accuracy'])
+
+    batch_size = config.get("batch_size", 32)
+    augmenter = LandmarkAugmenter() if augment else None
+    train_data = BucketedClips([clips[i] for i in train_idx], labels[train_idx], batch_size=batch_size, boundaries=boundaries, seed=seed, augment=augmenter)
+    callbacks = []
+    validation_data = None
+    if validation_idx is not None:
+        validation_data = BucketedClips([clips[i] for i in validation_idx], labels[validation_idx], batch_size=batch_size, boundaries=boundaries, shuffle=False)
+        callbacks.append(EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True))
+
+    history = model.fit(train_data, epochs=config.get("epochs", 40), callbacks=callbacks, validation_data=validation_data, verbose=0)
+
+    return model, history, validation_data
+
+def run_trial(config, fold, train_idx, validation_idx, seed):
+    """
+    trains one configuration on one fold inside a worker
+
+    Output:
+        dict with the fold metrics
+    """
+    start = time.perf_counter()
+    model, history, validation_data = _fit(config, train_idx, validation_idx, seed)
+    validation_loss, validation_accuracy = model.evaluate(validation_data, verbose=0)
+
+    return {
+        "config": config,
+        "fold": fold,
+        "val_accuracy": float(validation_accuracy),
+        "val_loss": float(validation_loss),
+        "epochs": int(np.argmin(history.history['val_loss'])) + 1,
+        "seconds": time.perf_counter() - start,
+        "params": int(model.count_params()),
+    }
+
+def train_final(config, epochs, model_path, bundle_path, classes, resample_length, seed):
+    """
+    retrains the chosen configuration on every clip and saves it, as a model and as a bundle
+
+    Output:
+        version(str): version of the saved bundle
+    """
+    from ModelBundle import save_bundle, default_preprocessing
+
+    config = dict(config, epochs=epochs)
+    model, _, _ = _fit(config, np.arange(_worker_data[1].shape[0]), None, seed)
+    model.save(model_path)
+    manifest = save_bundle(bundle_path, model, classes, default_preprocessing(resample_length=resample_length))
+    return manifest["version"]
+
+def summarize(results):
+    """
+    aggregates the fold results per configuration, best mean validation accuracy first
+    """
+    by_config = {}
+    for result in results:
+        by_config.setdefault(json.dumps(result["config"], sort_keys=True), []).append(result)
+
+    rows = []
+    for key, fold_results in by_config.items():
+        accuracies = [result["val_accuracy"] for result in fold_results]
+        rows.append({
+            "config": key,
+            "mean_accuracy": statistics.mean(accuracies),
+            "std_accuracy": statistics.pstdev(accuracies),
+            "mean_loss": statistics.mean(result["val_loss"] for result in fold_results),
+            "mean_epochs": statistics.mean(result["epochs"] for result in fold_results),
+            "mean_seconds": statistics.mean(result["seconds"] for result in fold_results),
+            "params": fold_results[0]["params"],
+        })
+
+    return sorted(rows, key=lambda row: (-row["mean_accuracy"], row["mean_loss"]))
+
+def print_table(rows):
+    print(f"{'acc média':>10}{'desvio':>9}{'loss':>9}{'épocas':>8}{'s/fold':>9}{'params':>10}  config")
+    for row in rows:
+        print(f"{row['mean_accuracy']*100:>9.1f}%{row['std_accuracy']*100:>8.1f}%{row['mean_loss']:>9.4f}{row['mean_epochs']:>8.1f}{row['mean_seconds']:>9.1f}{row['params']:>10}  {row['config']}")
+
+def save_table(rows, csv_path):
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def run_trials(data_file_path = r"all_data.p", grid = None, folds = 5, workers = None, threads_per_worker = None, pin_cores = False, output_dir = r"trials", seed = 0, augment = True, resample_length = None):
+    """
+    runs k-fold cross validation of every configuration of the grid in parallel worker processes
+
+    The dataset is preprocessed once, as in train_model, and shared with the workers as memory
+    mapped .npy files. Each worker gets a fixed thread budget so the trials don't oversubscribe the CPU.
+
+    Args:
+        data_file_path(str): consolidated dataset
+        grid(dict): {parameter: [values]} over the architecture, its build parameters, batch_size and epochs
+        folds(int): number of cross validation folds
+        workers(int): worker processes (default: cores // threads_per_worker)
+        threads_per_worker(int): TensorFlow/BLAS threads per worker (default: 1 when workers isn't given)
+        pin_cores(bool): give each worker its own set of cores (Linux only)
+        output_dir(str): where the results table and the best model and its bundle are saved
+        seed(int): seed of the folds and of each trial
+        augment(bool): augment the training batches on the fly
+        resample_length(int): resample every trimmed clip to this many frames (see train_model)
+
+    Output:
+        rows(list): results table, best configuration first
+    """
+    from ModelDevelopment import load_clips
+    from Preprocessing import DEFAULT_BUCKET_BOUNDARIES
+
+    grid = DEFAULT_GRID if grid is None else grid
+    cores = os.cpu_count() or 1
+    if workers is None:
+        threads_per_worker = threads_per_worker or 1
+        workers = max(1, cores // threads_per_worker)
+    threads_per_worker = threads_per_worker or max(1, cores // workers)
+
+    # A grade é validada antes de carregar o dataset
+    configs = expand_grid(grid)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # As classes vão no bundle do melhor modelo: o Encoder.p do projeto não é tocado
+    clips, labels_one_hot, classes = load_clips(data_file_path, resample_length=resample_length, encoder_path=None)
+    boundaries = DEFAULT_BUCKET_BOUNDARIES if resample_length is None else (resample_length,)
+
+    splits = make_folds(labels_one_hot, folds, seed)
+    print(f"{len(configs)} configurações x {len(splits)} folds em {workers} processos com {threads_per_worker} thread(s) cada")
+
+    data_dir = tempfile.mkdtemp(prefix="stl_trials_")
+    context = multiprocessing.get_context("spawn")
+    cores_queue = None
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        cores_queue = context.Queue()
+        available = sorted(os.sched_getaffinity(0))
+        for worker in range(workers):
+            cores_queue.put(set(available[(worker*threads_per_worker + i) % len(available)] for i in range(threads_per_worker)))
+
+    try:
+        save_dataset(data_dir, clips, labels_one_hot)
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(data_dir, threads_per_worker, cores_queue, boundaries, augment)) as executor:
+            futures = [
+                executor.submit(run_trial, config, fold, train_idx, validation_idx, seed)
+                for config in configs
+                for fold, (train_idx, validation_idx) in enumerate(splits)
+            ]
+            results = []
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"  [{len(results)}/{len(futures)}] fold {result['fold']} {result['config']}: {result['val_accuracy']*100:.1f}%")
+
+            rows = summarize(results)
+            print_table(rows)
+            save_table(rows, os.path.join(output_dir, "results.csv"))
+
+            best_config = json.loads(rows[0]["config"])
+            epochs = max(1, int(round(rows[0]["mean_epochs"])))
+            bundle_path = os.path.join(output_dir, "ModelY2.0.stlbundle")
+            version = executor.submit(train_final, best_config, epochs, os.path.join(output_dir, "ModelY2.0.keras"), bundle_path, classes, resample_length, seed).result()
+            print(f"✓ Melhor modelo salvo em {bundle_path} (versão {version}, {best_config}, {epochs} épocas)")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Validação cruzada de configurações do modelo em paralelo")
+    parser.add_argument("--data", default="all_data.p")
+    parser.add_argument("--grid", help="arquivo JSON {parâmetro: [valores]}")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--threads-per-worker", type=int)
+    parser.add_argument("--pin-cores", action="store_true")
+    parser.add_argument("--output-dir", default="trials")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-augment", action="store_true")
+    parser.add_argument("--resample-length", type=int)
+    args = parser.parse_args()
+
+    grid = None
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+
+    run_trials(args.data, grid, args.folds, args.workers, args.threads_per_worker, args.pin_cores, args.output_dir, args.seed, not args.no_augment, args.resample_length)
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,25 @@
 from flask import Flask, render_template, Response, jsonify, request
 import cv2
 import numpy as np
+import hmac
+import io
+import json
 import os
-import pickle
-from collections import deque
 import threading
 import time
 
+from Cameras import CameraPipeline, parse_cameras
+from CaptureLog import CaptureLog
+from ClipUpload import UploadStream, decode_frames
+from ExtractionPool import DetectorPool, DetectorPoolClosedError
+from JobQueue import JobQueue, JobCancelledError, QueueFullError
+from ModelBundle import ModelRegistry, load_bundle, load_legacy_files
+from Profiler import ProfilerBusyError, SamplingProfiler, collapsed
+from QualityControl import QualityController
+from Recognition import classify_clip_landmarks, frame_has_hand, usable_sign_index
+from SignIndex import SignIndex
+from ThreadBudget import apply_thread_budget, thread_budget
+
 # Tentar importar mediapipe
 try:
     import mediapipe as mp
@@ -20,8 +33,7 @@ except ImportError:
 
 # Tentar importar tensorflow
 try:
-    from keras.models import load_model
-    from keras.preprocessing.sequence import pad_sequences
+    import keras
     TENSORFLOW_AVAILABLE = True
     print("✓ TensorFlow carregado com sucesso!")
 except ImportError:
@@ -31,30 +43,69 @@ except ImportError:
 app = Flask(__name__)
 
 # Configurações
-MODEL_PATH = 'ModelY2.0.keras'
+# STL_MODEL_PATH permite servir outra variante treinada (ex.: a arquitetura "tcn")
+MODEL_PATH = os.environ.get('STL_MODEL_PATH', 'ModelY2.0.keras')
 ENCODER_PATH = 'Encoder.p'
 HAND_MODEL_PATH = 'hand_landmarker.task'
+# Bundle versionado (modelo + classes + parâmetros); tem prioridade sobre os arquivos soltos acima
+BUNDLE_PATH = os.environ.get('STL_BUNDLE_PATH', 'ModelY2.0.stlbundle')
+# Intervalo (s) com que o arquivo do bundle é observado para recarga automática; 0 desativa
+# Diretório de onde o /reload_model pode carregar bundles (padrão: o diretório do BUNDLE_PATH)
+MODEL_DIR = os.path.realpath(os.environ.get('STL_MODEL_DIR', os.path.dirname(os.path.abspath(BUNDLE_PATH))))
+BUNDLE_WATCH_INTERVAL = float(os.environ.get('STL_BUNDLE_WATCH_INTERVAL', '2'))
+# Modo de produção: processos de inferência que classificam as gravações fora do processo do servidor
+# (0 classifica no próprio processo) e depuração do Flask desligada com STL_DEBUG=0
+SERVING_PROCESSES = int(os.environ.get('STL_SERVING_PROCESSES', '0'))
+DEBUG = os.environ.get('STL_DEBUG', '1') != '0'
+# Processamento das gravações: threads trabalhadoras (uma por processo de inferência) e tamanho máximo da fila de espera
+RECORDING_WORKERS = int(os.environ.get('STL_RECORDING_WORKERS', str(max(1, SERVING_PROCESSES))))
+RECORDING_QUEUE_SIZE = int(os.environ.get('STL_RECORDING_QUEUE_SIZE', '4'))
+# Orçamento de threads de TensorFlow, BLAS, OpenCV e dos detectores, aplicado na inicialização (ThreadBudget.py)
+THREAD_BUDGET = thread_budget(os.environ.get('STL_THREAD_PRESET', 'serving'))
+# Detectores de mãos usados em paralelo para extrair os landmarks de uma gravação
+EXTRACTION_WORKERS = int(os.environ.get('STL_EXTRACTION_WORKERS', str(THREAD_BUDGET.detectors)))
+# Upload de clipes: tamanho máximo, frames decodificados no máximo e uploads processados ao mesmo tempo
+MAX_UPLOAD_BYTES = int(float(os.environ.get('STL_MAX_UPLOAD_MB', '20')) * 1024 * 1024)
+UPLOAD_MAX_FRAMES = int(os.environ.get('STL_UPLOAD_MAX_FRAMES', '300'))
+UPLOAD_CONCURRENCY = int(os.environ.get('STL_UPLOAD_CONCURRENCY', '2'))
+# Modo automático: segmenta o vídeo ao vivo pelos movimentos das mãos e classifica cada sinal completo
+AUTO_SEGMENTATION = os.environ.get('STL_AUTO_SEGMENTATION', '0') == '1'
+# Tamanho máximo de um sinal no modo automático quando o modelo reamostra os clipes
+SEGMENT_MAX_FRAMES = int(os.environ.get('STL_SEGMENT_MAX_FRAMES', '120'))
+# Índice de sinais por embeddings (SignIndex.py): se definido, classifica pelo vizinho mais próximo em vez da saída do modelo
+SIGN_INDEX_PATH = os.environ.get('STL_SIGN_INDEX')
+# Controle de qualidade adaptativo: sob carga, reduz o preview para manter o reconhecimento dentro do SLO (em segundos)
+QOS_ENABLED = os.environ.get('STL_QOS', '1') != '0'
+RECOGNITION_SLO = float(os.environ.get('STL_RECOGNITION_SLO', '2'))
+# Se definido, cada gravação classificada (landmarks, predição, confiança) é guardada neste diretório para ampliar o dataset
+CAPTURE_LOG_DIR = os.environ.get('STL_CAPTURE_LOG')
+# Token exigido no cabeçalho X-Admin-Token pelos endpoints administrativos; sem ele, esses endpoints ficam desativados
+ADMIN_TOKEN = os.environ.get('STL_ADMIN_TOKEN')
+# Câmeras servidas, "nome=fonte;nome=fonte": índice do dispositivo, URL ou arquivo de vídeo (reproduzido em loop)
+CAMERAS = parse_cameras(os.environ.get('STL_CAMERAS', '0'))
+# Duração máxima (s) de um profile pedido em /debug/profile
+PROFILE_MAX_SECONDS = float(os.environ.get('STL_PROFILE_MAX_SECONDS', '60'))
 
 # Variáveis globais
-camera = None
-current_prediction = "Aguardando gravação..."
 hand_detector = None
-encoder = None
-model = None
-is_recording = False
-recorded_frames = []
-recording_thread = None
-
-class NormalizedLandmarkResult:
-    def __init__(self, normalized_landmarks_right, normalized_landmarks_left, wrist_right, wrist_left):
-        self.normalized_landmarks_right = normalized_landmarks_right
-        self.normalized_landmarks_left = normalized_landmarks_left
-        self.wrist_right = wrist_right
-        self.wrist_left = wrist_left
-
-def load_hand_model(hand_model_path):
-    """Carrega o modelo de detecção de mãos do MediaPipe"""
-    base_options = python.BaseOptions(model_asset_path=hand_model_path)
+extraction_pool = None  # DetectorPool com EXTRACTION_WORKERS detectores pré-carregados
+serving_pool = None  # RecordingWorkerPool quando SERVING_PROCESSES > 0
+# Fila única de reconhecimento para todas as câmeras, que se revezam nos trabalhadores (um grupo por câmera)
+recording_jobs = JobQueue(workers=RECORDING_WORKERS, max_pending=RECORDING_QUEUE_SIZE*len(CAMERAS), name="recording", max_pending_per_group=RECORDING_QUEUE_SIZE)
+upload_slots = threading.BoundedSemaphore(UPLOAD_CONCURRENCY)
+sign_index = None  # SignIndex quando SIGN_INDEX_PATH está definido
+sign_index_mtime = None
+sign_index_lock = threading.Lock()  # Serializa cadastros, remoções e recargas do índice
+capture_log = CaptureLog(CAPTURE_LOG_DIR) if CAPTURE_LOG_DIR else None
+quality_controller = QualityController(recognition_slo=RECOGNITION_SLO, enabled=QOS_ENABLED)
+profiler = SamplingProfiler(max_seconds=PROFILE_MAX_SECONDS)  # só amostra durante um /debug/profile
+
+def load_hand_model(hand_model_path=None, hand_model_buffer=None):
+    """Carrega o modelo de detecção de mãos do MediaPipe (de um arquivo ou dos bytes de um bundle)"""
+    if hand_model_buffer is not None:
+        base_options = python.BaseOptions(model_asset_buffer=hand_model_buffer)
+    else:
+        base_options = python.BaseOptions(model_asset_path=hand_model_path)
     options = vision.HandLandmarkerOptions(
         base_options=base_options,
         num_hands=2
@@ -121,17 +172,8 @@ def draw_landmarks_on_frame(frame, results):
     
     return frame
 
-def extract_landmarks_from_frame(frame):
-    """Extrai landmarks de um frame - VERSÃO CORRIGIDA COM DEBUG"""
-    if not MEDIAPIPE_AVAILABLE or hand_detector is None:
-        print("❌ MediaPipe não disponível")
-        return [(0.0, 0.0, 0.0)] * 21, [(0.0, 0.0, 0.0)] * 21, None, None
-    
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-    
-    results = hand_detector.detect(mp_image)
-    
+def landmarks_from_results(results, verbose=False):
+    """Converte o resultado do detector em landmarks normalizados e pulsos de cada mão"""
     coords_right = [(0.0, 0.0, 0.0)] * 21
     coords_left = [(0.0, 0.0, 0.0)] * 21
     wrist_right = None
@@ -141,12 +183,14 @@ def extract_landmarks_from_frame(frame):
         handedness = results.handedness
         brute_landmarks = results.hand_landmarks
         
-        print(f"   🔍 DEBUG: {len(brute_landmarks)} mão(s) detectada(s)")
+        if verbose:
+            print(f"   🔍 DEBUG: {len(brute_landmarks)} mão(s) detectada(s)")
         
         for index in range(len(brute_landmarks)):
             result = brute_landmarks[index]
             hand_type = handedness[index][0].category_name
-            print(f"   🖐️ DEBUG: Mão {index} = {hand_type}")
+            if verbose:
+                print(f"   🖐️ DEBUG: Mão {index} = {hand_type}")
             
             coords = []
             for landmark in result:
@@ -155,16 +199,19 @@ def extract_landmarks_from_frame(frame):
             if hand_type == 'Right':
                 coords_right = coords
                 wrist_right = coords[0]  # Pulso é o primeiro landmark
-                print(f"   ✅ DEBUG: Mão direita capturada - Pulso: {wrist_right}")
+                if verbose:
+                    print(f"   ✅ DEBUG: Mão direita capturada - Pulso: {wrist_right}")
             else:
                 coords_left = coords
                 wrist_left = coords[0]  # Pulso é o primeiro landmark
-                print(f"   ✅ DEBUG: Mão esquerda capturada - Pulso: {wrist_left}")
+                if verbose:
+                    print(f"   ✅ DEBUG: Mão esquerda capturada - Pulso: {wrist_left}")
     
     # DEBUG: Verificar o que está sendo retornado
     right_detected = wrist_right is not None
     left_detected = wrist_left is not None
-    print(f"   📊 DEBUG RETORNO: Direita: {right_detected}, Esquerda: {left_detected}")
+    if verbose:
+        print(f"   📊 DEBUG RETORNO: Direita: {right_detected}, Esquerda: {left_detected}")
     
     # Aplicar normalização apenas se mãos foram detectadas
     if right_detected:
@@ -183,122 +230,138 @@ def extract_landmarks_from_frame(frame):
     if wrist_left is None:
         wrist_left = (0.0, 0.0, 0.0)
     
+    # Pulsos em coordenadas da imagem: a trajetória é normalizada no prepare_clip do bundle, como no treino
     return normalized_right, normalized_left, wrist_right, wrist_left
-    """Extrai landmarks de um frame - VERSÃO CORRIGIDA COM DEBUG"""
-    if not MEDIAPIPE_AVAILABLE or hand_detector is None:
+
+def extract_landmarks_from_frame(frame, detector=None, verbose=True):
+    """Extrai landmarks de um frame - VERSÃO CORRIGIDA COM DEBUG
+    
+    detector permite usar um dos detectores do extraction_pool em vez do hand_detector global.
+    """
+    detector = detector or hand_detector
+    if not MEDIAPIPE_AVAILABLE or detector is None:
         print("❌ MediaPipe não disponível")
         return [(0.0, 0.0, 0.0)] * 21, [(0.0, 0.0, 0.0)] * 21, None, None
     
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
     
-    results = hand_detector.detect(mp_image)
+    results = detector.detect(mp_image)
     
-    coords_right = [(0.0, 0.0, 0.0)] * 21
-    coords_left = [(0.0, 0.0, 0.0)] * 21
-    wrist_right = None
-    wrist_left = None
-    
-    if results.hand_landmarks:
-        handedness = results.handedness
-        brute_landmarks = results.hand_landmarks
-        
-        print(f"   🔍 DEBUG: {len(brute_landmarks)} mão(s) detectada(s)")
-        
-        for index in range(len(brute_landmarks)):
-            result = brute_landmarks[index]
-            hand_type = handedness[index][0].category_name
-            print(f"   🖐️ DEBUG: Mão {index} = {hand_type}")
-            
-            coords = []
-            for landmark in result:
-                coords.append((landmark.x, landmark.y, landmark.z))
-            
-            if hand_type == 'Right':
-                coords_right = coords
-                wrist_right = coords[0]  # Pulso é o primeiro landmark
-                print(f"   ✅ DEBUG: Mão direita capturada - Pulso: {wrist_right}")
-            else:
-                coords_left = coords
-                wrist_left = coords[0]  # Pulso é o primeiro landmark
-                print(f"   ✅ DEBUG: Mão esquerda capturada - Pulso: {wrist_left}")
+    return landmarks_from_results(results, verbose=verbose)
+
+def extract_clip_landmarks(frames, maxlen, job=None):
+    """Extrai os landmarks dos frames necessários ao modelo, em paralelo quando há extraction_pool"""
+    def on_progress(fraction):
+        if job is not None:
+            job.progress = fraction
     
-    # DEBUG: Verificar o que está sendo retornado
-    right_detected = wrist_right is not None
-    left_detected = wrist_left is not None
-    print(f"   📊 DEBUG RETORNO: Direita: {right_detected}, Esquerda: {left_detected}")
+    check_cancelled = job.check_cancelled if job is not None else None
     
-    # Aplicar normalização apenas se mãos foram detectadas
-    if right_detected:
-        normalized_right, wrist_right = normalize_video_landmarks(coords_right)
-    else:
-        normalized_right = coords_right
+    # Numa troca de bundle o pool antigo termina os clipes que já começou; um clipe que pegou o pool
+    # antigo depois de ele fechar recomeça no novo
+    pool = extraction_pool
+    while pool is not None:
+        try:
+            return pool.extract_clip(
+                frames,
+                lambda detector, frame: extract_landmarks_from_frame(frame, detector, verbose=False),
+                frame_has_hand,
+                maxlen=maxlen,
+                on_progress=on_progress,
+                check_cancelled=check_cancelled,
+            )
+        except DetectorPoolClosedError:
+            pool = extraction_pool
     
-    if left_detected:
-        normalized_left, wrist_left = normalize_video_landmarks(coords_left)
-    else:
-        normalized_left = coords_left
+    landmarks = []
+    first_hand = None
+    total = len(frames) if hasattr(frames, '__len__') else None  # frames pode ser um gerador (upload)
+    for i, frame in enumerate(frames):
+        if first_hand is not None and i >= first_hand + maxlen:
+            break  # O modelo não usa mais frames que isso
+        if check_cancelled is not None:
+            check_cancelled()
+        if total:
+            on_progress(i / total)
+        print(f"   🔍 Processando frame {i}...")
+        landmarks.append(extract_landmarks_from_frame(frame))
+        if first_hand is None and frame_has_hand(landmarks[-1]):
+            first_hand = i
+    return landmarks
+
+def classify_landmarks(bundle, clip_landmarks):
+    """Classifica os landmarks de um clipe com o pré-processamento do bundle
     
-    return normalized_right, normalized_left, wrist_right, wrist_left
+    Retorna (sinal, confiança) ou None se nenhuma mão foi detectada.
+    """
+    return classify_clip_landmarks(bundle, clip_landmarks, active_sign_index(bundle))
 
-def normalize_wrist_coords(wrist_coord_list):
-    """Normaliza coordenadas do pulso"""
-    wrist_x = []
-    wrist_y = []
-    wrist_z = []
-    normalized_wrist_coords = []
-
-    for wrist_coord in wrist_coord_list:
-        # 🔧 CORREÇÃO: Ignorar coordenadas zeradas (não detectadas)
-        if wrist_coord is not None and wrist_coord != (0.0, 0.0, 0.0):
-            wrist_x.append(wrist_coord[0])
-            wrist_y.append(wrist_coord[1])
-            wrist_z.append(wrist_coord[2])
-
-    if not wrist_x:
-        return [(0.0, 0.0, 0.0)] * len(wrist_coord_list)
-
-    wrist_reference_x = wrist_x[0]
-    wrist_reference_y = wrist_y[0]
-    wrist_reference_z = wrist_z[0]
-
-    x_distance_normalizer = abs(max(wrist_x) - min(wrist_x)) if abs(max(wrist_x) - min(wrist_x)) > 0 else 1
-    y_distance_normalizer = abs(max(wrist_y) - min(wrist_y)) if abs(max(wrist_y) - min(wrist_y)) > 0 else 1
-    z_distance_normalizer = abs(max(wrist_z) - min(wrist_z)) if abs(max(wrist_z) - min(wrist_z)) > 0 else 1
-
-    for wrist_coord in wrist_coord_list:
-        if wrist_coord is not None:
-            brute_x, brute_y, brute_z = wrist_coord
-            norm_x = (brute_x - wrist_reference_x) / x_distance_normalizer
-            norm_y = (brute_y - wrist_reference_y) / y_distance_normalizer
-            norm_z = (brute_z - wrist_reference_z) / z_distance_normalizer
-            normalized_wrist_coords.append((norm_x, norm_y, norm_z))
-        else:
-            normalized_wrist_coords.append((0.0, 0.0, 0.0))
+def log_capture(source, clip_landmarks, prediction, confidence, bundle):
+    """Guarda o clipe classificado no log de capturas (fila em memória, gravada por outra thread)"""
+    if capture_log is not None:
+        capture_log.log(source, clip_landmarks, prediction, confidence, bundle.version)
+
+def load_sign_index(bundle):
+    """Carrega o índice de sinais de STL_SIGN_INDEX (de novo só se o arquivo mudou); sem arquivo, começa vazio"""
+    global sign_index, sign_index_mtime
     
-    return normalized_wrist_coords
+    # Com o lock dos cadastros: o índice não é trocado entre o add e o save de um cadastro
+    with sign_index_lock:
+        if SIGN_INDEX_PATH is None or bundle is None:
+            return
+        
+        if not os.path.exists(SIGN_INDEX_PATH):
+            if sign_index is None or len(sign_index) == 0:
+                sign_index = SignIndex(bundle.version)
+            return
+        
+        mtime = os.path.getmtime(SIGN_INDEX_PATH)
+        if mtime == sign_index_mtime and sign_index is not None:
+            return
+        sign_index = SignIndex.load(SIGN_INDEX_PATH)
+        sign_index_mtime = mtime
+        if sign_index.model_version != bundle.version:
+            print(f"⚠️ {SIGN_INDEX_PATH} é do modelo {sign_index.model_version}, não do {bundle.version}: usando a saída do modelo")
+
+def active_sign_index(bundle):
+    """Índice de sinais que classifica os clipes do bundle, ou None (sem índice, vazio ou de outro modelo)"""
+    return usable_sign_index(sign_index, bundle)
 
-def process_recorded_video():
-    """Processa o vídeo gravado e faz a predição - VERSÃO CORRIGIDA"""
-    global current_prediction, recorded_frames
+def process_recorded_video(job=None, frames=None, camera=None):
+    """Processa o vídeo gravado e faz a predição - VERSÃO CORRIGIDA
+    
+    Executado como job do recording_jobs: reporta o progresso e para no próximo frame se o job
+    for cancelado. Só o job mais recente e não cancelado atualiza a predição da câmera (sem câmera
+    o resultado só é devolvido). Com STL_SERVING_PROCESSES a extração fica neste processo e só os
+    landmarks vão para a predição num processo de inferência.
+    """
+    if frames is None:
+        frames = [frame_buffer.array for frame_buffer in camera.recorded_frames]
+    messages = []
+    
+    def publish(text):
+        messages.append(text)
+        if camera is not None and (job is None or (not job.cancelled and job.id == camera.latest_job_id)):
+            camera.current_prediction = text
     
     print(f"\n{'='*60}")
     print(f"🎬 PROCESSANDO VÍDEO GRAVADO - VERSÃO CORRIGIDA")
     print(f"{'='*60}")
     
-    if not recorded_frames:
-        current_prediction = "Nenhum frame gravado"
+    if not frames:
+        publish("Nenhum frame gravado")
         print("❌ Nenhum frame no buffer")
-        return
+        return messages[-1]
     
-    print(f"📊 Total de frames: {len(recorded_frames)}")
+    print(f"📊 Total de frames: {len(frames)}")
     
-    if len(recorded_frames) < 10:
-        current_prediction = f"Muito curto! Grave mais ({len(recorded_frames)} frames)"
-        print(f"⚠️ Vídeo muito curto: {len(recorded_frames)} frames")
-        return
+    if len(frames) < 10:
+        publish(f"Muito curto! Grave mais ({len(frames)} frames)")
+        print(f"⚠️ Vídeo muito curto: {len(frames)} frames")
+        return messages[-1]
     
-    current_prediction = "Processando vídeo..."
+    publish("Processando vídeo...")
     
     try:
         # Extrair landmarks de todos os frames
@@ -309,15 +372,22 @@ def process_recorded_video():
         
         hands_detected_count = 0
         
-        print(f"🔍 Extraindo landmarks de {len(recorded_frames)} frames...")
+        bundle = model_registry.current
+        # Com reamostragem o clipe inteiro é usado; senão só maxlen frames a partir da primeira mão
+        source_frames = bundle.source_frames if bundle is not None else 60
+        maxlen = source_frames or len(frames)
+        workers = extraction_pool.workers if extraction_pool is not None else 1
+        print(f"🔍 Extraindo landmarks de até {len(frames)} frames ({workers} detector(es))...")
+        start_time = time.perf_counter()
         
-        for i, frame in enumerate(recorded_frames):
-            print(f"   🔍 Processando frame {i}...")
-            norm_right, norm_left, wrist_right, wrist_left = extract_landmarks_from_frame(frame)
-            
+        clip_landmarks = extract_clip_landmarks(frames, maxlen, job)
+        
+        print(f"⏱️ Extração de {len(clip_landmarks)} frames em {time.perf_counter() - start_time:.2f}s")
+        
+        for i, (norm_right, norm_left, wrist_right, wrist_left) in enumerate(clip_landmarks):
             # DEBUG: Verificar detecção CORRIGIDA
-            right_detected = wrist_right is not None
-            left_detected = wrist_left is not None
+            right_detected = wrist_right is not None and tuple(wrist_right) != (0.0, 0.0, 0.0)
+            left_detected = wrist_left is not None and tuple(wrist_left) != (0.0, 0.0, 0.0)
             
             if i % 5 == 0:  # Log a cada 5 frames para mais detalhes
                 print(f"   📍 Frame {i}: Mão direita: {right_detected}, Mão esquerda: {left_detected}")
@@ -334,225 +404,776 @@ def process_recorded_video():
             all_wrist_right.append(wrist_right)
             all_wrist_left.append(wrist_left)
         
-        print(f"✓ Mãos detectadas em {hands_detected_count}/{len(recorded_frames)} frames")
+        print(f"✓ Mãos detectadas em {hands_detected_count}/{len(clip_landmarks)} frames")
         
         if hands_detected_count == 0:
-            current_prediction = "❌ Nenhuma mão detectada no vídeo!"
+            publish("❌ Nenhuma mão detectada no vídeo!")
             print("❌ ERRO: Nenhuma mão detectada em nenhum frame!")
-            return
-        
-                # 🔧 CORREÇÃO: Garantir que temos arrays numpy com formato consistente
-        print("📦 Convertendo para arrays numpy...")
-        
-        # Para landmarks: cada frame tem 21 landmarks, cada landmark tem 3 coordenadas
-        all_landmarks_right = np.array(all_landmarks_right, dtype='float32')
-        all_landmarks_left = np.array(all_landmarks_left, dtype='float32')
+            return messages[-1]
         
-        # Para pulsos: cada frame tem 3 coordenadas (x, y, z)
-        all_wrist_right = np.array(all_wrist_right, dtype='float32')
-        all_wrist_left = np.array(all_wrist_left, dtype='float32')
-        
-        print(f"📊 Shapes após conversão:")
-        print(f"   Landmarks Right: {all_landmarks_right.shape}")
-        print(f"   Landmarks Left: {all_landmarks_left.shape}")
-        print(f"   Wrist Right: {all_wrist_right.shape}")
-        print(f"   Wrist Left: {all_wrist_left.shape}")
-        
-        print("📦 Preparando dados (padding)...")
-        # Pad sequences
-        local_right_padded = pad_sequences([all_landmarks_right], dtype='float32', padding='post', maxlen=60, truncating='post')
-        local_left_padded = pad_sequences([all_landmarks_left], dtype='float32', padding='post', maxlen=60, truncating='post')
-        global_right_padded = pad_sequences([all_wrist_right], dtype='float32', padding='post', maxlen=60, truncating='post')
-        global_left_padded = pad_sequences([all_wrist_left], dtype='float32', padding='post', maxlen=60, truncating='post')
-        
-        # Reshape CORRETO
-        local_right_padded = local_right_padded.reshape(-1, 60, 63)
-        local_left_padded = local_left_padded.reshape(-1, 60, 63)
-        global_right_padded = global_right_padded.reshape(-1, 60, 3)
-        global_left_padded = global_left_padded.reshape(-1, 60, 3)
-        
-        print(f"📊 Shapes finais:")
-        print(f"   Local Right: {local_right_padded.shape}")
-        print(f"   Local Left: {local_left_padded.shape}") 
-        print(f"   Global Right: {global_right_padded.shape}")
-        print(f"   Global Left: {global_left_padded.shape}")
-        
-        # Predição
-        if model is not None and encoder is not None:
-            print("🤖 Fazendo predição...")
-            result = model.predict(
-                [local_right_padded, local_left_padded, global_right_padded, global_left_padded], 
-                verbose=1
-            )
+        # Predição (com o bundle lido no início, mesmo que outro seja carregado em seguida)
+        if job is not None:
+            job.check_cancelled()
+        pool = serving_pool
+        if pool is not None and bundle is not None:
+            # Só os landmarks vão para o processo de inferência; o log de capturas fica aqui
+            print(f"📤 Enviando os landmarks de {len(clip_landmarks)} frames para um processo de inferência...")
+            predicted_word, confidence = pool.classify(clip_landmarks, job)
+            print(f"✓ RESULTADO: {predicted_word} ({confidence*100:.1f}%)")
+            publish(f"✓ Sinal: {predicted_word} ({confidence*100:.1f}%)")
+            log_capture('recording', clip_landmarks, predicted_word, confidence, bundle)
+        elif bundle is not None:
+            model = bundle.model
+            encoder = bundle.encoder
             
-            print(f"📊 Resultado bruto: {result}")
-            print(f"📊 Shape do resultado: {result.shape}")
+            # Mesmo pré-processamento do treino: remove frames sem mãos e trunca ou reamostra
+            print(f"📦 Preparando dados ({bundle.preprocessing})...")
+            inputs = bundle.prepare_inputs(all_landmarks_right, all_landmarks_left, all_wrist_right, all_wrist_left)
+            print(f"📊 Shapes finais: {[array.shape for array in inputs]}")
             
-            result_index = np.argmax(result)
-            confidence = np.max(result) * 100
+            index = active_sign_index(bundle)
+            if index is not None:
+                print(f"🔎 Buscando o vizinho mais próximo entre {len(index)} clipes de referência...")
+                predicted_word, similarity = index.classify(bundle.embedding_model.predict_on_batch(inputs)[0])
+                print(f"✓ RESULTADO (índice de sinais): {predicted_word} (similaridade {similarity:.3f})")
+                publish(f"✓ Sinal: {predicted_word} ({similarity*100:.1f}%)")
+                log_capture('recording', clip_landmarks, predicted_word, similarity, bundle)
+            else:
+                print("🤖 Fazendo predição...")
+                result = model.predict(inputs, verbose=1)
             
-            print(f"📊 Índice previsto: {result_index}")
-            print(f"📊 Confiança: {confidence:.1f}%")
+                print(f"📊 Resultado bruto: {result}")
+                print(f"📊 Shape do resultado: {result.shape}")
             
-            try:
-                predicted_word = encoder.inverse_transform([result_index])[0]
-                print(f"✓ RESULTADO: {predicted_word} ({confidence:.1f}%)")
-                current_prediction = f"✓ Sinal: {predicted_word} ({confidence:.1f}%)"
-            except Exception as e:
-                print(f"❌ Erro no encoder: {e}")
-                current_prediction = f"Erro: Índice {result_index} inválido"
+                result_index = np.argmax(result)
+                confidence = np.max(result) * 100
+            
+                print(f"📊 Índice previsto: {result_index}")
+                print(f"📊 Confiança: {confidence:.1f}%")
+            
+                try:
+                    predicted_word = encoder.inverse_transform([result_index])[0]
+                    print(f"✓ RESULTADO: {predicted_word} ({confidence:.1f}%)")
+                    publish(f"✓ Sinal: {predicted_word} ({confidence:.1f}%)")
+                    log_capture('recording', clip_landmarks, predicted_word, float(confidence)/100, bundle)
+                except Exception as e:
+                    print(f"❌ Erro no encoder: {e}")
+                    publish(f"Erro: Índice {result_index} inválido")
         else:
-            current_prediction = "❌ Modelo não carregado"
+            publish("❌ Modelo não carregado")
             print("❌ Modelo ou encoder não disponível")
             
+    except JobCancelledError:
+        print("⏹️ Processamento cancelado")
+        raise
     except Exception as e:
-        current_prediction = f"❌ Erro no processamento"
+        publish(f"❌ Erro no processamento")
         print(f"❌ ERRO no processamento:")
         print(f"   {e}")
         import traceback
         traceback.print_exc()
     
     print(f"{'='*60}\n")
+    
+    return messages[-1]
 
-def generate_frames():
-    """Gera frames da webcam"""
-    global camera, recorded_frames
+def on_bundle_swap(bundle):
+    """Troca também o detector de mãos quando o novo bundle traz o seu, e os processos de inferência"""
+    global hand_detector, extraction_pool
+    
+    if serving_pool is not None:
+        serving_pool.reload(bundle.source)
     
-    camera = cv2.VideoCapture(0)
+    for camera in cameras.values():
+        camera.segmenter.max_length = bundle.source_frames or SEGMENT_MAX_FRAMES
+    load_sign_index(bundle)
     
-    if not camera.isOpened():
-        print("✗ Não foi possível abrir a câmera")
+    if bundle.hand_model is not None and MEDIAPIPE_AVAILABLE:
+        hand_detector = load_hand_model(hand_model_buffer=bundle.hand_model)
+        previous_pool = extraction_pool
+        extraction_pool = DetectorPool(lambda: load_hand_model(hand_model_buffer=bundle.hand_model), EXTRACTION_WORKERS)
+        if previous_pool is not None:
+            previous_pool.shutdown()
+        for camera in cameras.values():
+            if camera.running:
+                camera.reload_detector()
+
+model_registry = ModelRegistry(on_swap=on_bundle_swap)
+
+def feed_streaming_classifier(camera, results):
+    """Atualiza o classificador em streaming da câmera com os landmarks do frame que está sendo gravado"""
+    if camera.streaming_classifier is None:
         return
     
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-        
-        frame = cv2.flip(frame, 1)
-        
-        # SE ESTÁ GRAVANDO, ARMAZENA O FRAME ORIGINAL ANTES DE DESENHAR
-        if is_recording:
-            recorded_frames.append(frame.copy())
+    landmarks = landmarks_from_results(results)
+    with camera.streaming_lock:
+        camera.streaming_classifier.update(*landmarks)
+        camera.streamed_frames += 1
+        if capture_log is not None:
+            camera.streamed_landmarks.append(landmarks)
+
+def classify_segment(job, camera, segment):
+    """Classifica um sinal separado pelo segmentador (os landmarks já foram extraídos ao vivo)"""
+    bundle = model_registry.current
+    if bundle is None:
+        return "❌ Modelo não carregado"
+    
+    job.check_cancelled()
+    prediction = classify_landmarks(bundle, segment)
+    if prediction is None:
+        return None
+    
+    sign, confidence = prediction
+    log_capture('segment', segment, sign, confidence, bundle)
+    text = f"✓ Sinal: {sign} ({confidence*100:.1f}%)"
+    print(f"🤖 Modo automático ({camera.name}): {text} ({len(segment)} frames)")
+    if not job.cancelled and job.id == camera.latest_job_id:
+        camera.current_prediction = text
+    return text
+
+def feed_segmenter(camera, results):
+    """Alimenta o segmentador da câmera com um frame ao vivo; cada sinal completo vira um job de classificação"""
+    segment = camera.segmenter.update(*landmarks_from_results(results))
+    if segment is None:
+        return
+    
+    try:
+        job = recording_jobs.submit_to(camera.name, classify_segment, camera, segment)
+    except QueueFullError:
+        print(f"⚠️ Fila cheia, sinal do modo automático descartado ({camera.name})")
+        return
+    job.add_done_callback(observe_recognition)
+    camera.latest_job_id = job.id
+
+def observe_recognition(job):
+    """Latência de reconhecimento de um job (da fila até o resultado) para o controle de qualidade"""
+    if job.status == 'done':
+        quality_controller.observe('recognition', job.finished - job.created)
+
+def streaming_prediction(camera):
+    """Predição já pronta do classificador em streaming da câmera, ou None se ele não acompanhou toda a gravação"""
+    bundle = camera.recording_bundle
+    classifier = camera.streaming_classifier
+    if bundle is None or classifier is None or active_sign_index(bundle) is not None:
+        return None
+    
+    with camera.streaming_lock:
+        if camera.streamed_frames != len(camera.recorded_frames) or camera.streamed_frames < 10 or not classifier.started:
+            return None
+        result = classifier.predict()
+        clip_landmarks = list(camera.streamed_landmarks)
+    
+    result_index = int(np.argmax(result))
+    confidence = float(np.max(result)) * 100
+    predicted_word = bundle.encoder.inverse_transform([result_index])[0]
+    log_capture('recording', clip_landmarks, predicted_word, confidence/100, bundle)
+    print(f"⚡ RESULTADO (streaming, {camera.name}): {predicted_word} ({confidence:.1f}%)")
+    return f"✓ Sinal: {predicted_word} ({confidence:.1f}%)"
+
+def publish_landmarks(camera, results):
+    """Guarda os landmarks do último frame da câmera para o canal /landmarks_feed (overlay desenhado no navegador)"""
+    hands = []
+    if results.hand_landmarks:
+        for hand_landmarks, handedness in zip(results.hand_landmarks, results.handedness):
+            points = []
+            for landmark in hand_landmarks:
+                points.extend((round(landmark.x, 4), round(landmark.y, 4)))
+            hands.append({'side': handedness[0].category_name, 'points': points})
+    
+    camera.latest_landmarks = {'frame': camera.latest_landmarks['frame'] + 1, 'hands': hands}
+
+def create_camera_detector():
+    """Detector de mãos de uma câmera: o do bundle atual ou o hand_landmarker.task"""
+    if not MEDIAPIPE_AVAILABLE:
+        return None
+    bundle = model_registry.current
+    if bundle is not None and bundle.hand_model is not None:
+        return load_hand_model(hand_model_buffer=bundle.hand_model)
+    if os.path.exists(HAND_MODEL_PATH):
+        return load_hand_model(HAND_MODEL_PATH)
+    return None
+
+def process_camera_frame(camera, frame_buffer, capture):
+    """Processa um frame na thread de captura da câmera: gravação, detecção de mãos, streaming e modo automático
+    
+    A gravação guarda uma referência ao buffer pré-alocado em vez de uma cópia. Sob carga o
+    quality_controller reduz a taxa de detecção do preview, e sem ninguém assistindo o preview não
+    é detectado; a detecção dos frames gravados e do modo automático nunca é pulada.
+    """
+    settings = quality_controller.settings()
+    
+    # SE ESTÁ GRAVANDO, GUARDA O FRAME ORIGINAL (POR REFERÊNCIA)
+    if camera.is_recording:
+        camera.recorded_frames.append(frame_buffer.retain())
+    
+    detect = camera.is_recording or camera.auto_mode or (
+        camera.viewers > 0
+        and camera.frames_captured % settings['detect_every'] == 0
+        and not (settings['defer_preview'] and recording_jobs.in_flight)
+    )
+    detector = camera.detector
+    if not (MEDIAPIPE_AVAILABLE and detector and detect):
+        return None
+    
+    try:
+        start = time.perf_counter()
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=capture.rgb(frame_buffer))
+        results = detector.detect(mp_image)
+        quality_controller.observe('detection', time.perf_counter() - start)
+        if camera.is_recording:
+            feed_streaming_classifier(camera, results)
+        elif camera.auto_mode:
+            feed_segmenter(camera, results)
+        publish_landmarks(camera, results)
+        return results
+    except Exception as e:
+        return None  # Ignorar erros silenciosamente
+
+cameras = {name: CameraPipeline(name, source, create_camera_detector, process_camera_frame) for name, source in CAMERAS}
+for camera in cameras.values():
+    camera.auto_mode = AUTO_SEGMENTATION
+
+def encode_frame(camera, frame, results, draw, settings, display=None):
+    """Codifica um frame da câmera em JPEG com os parâmetros de qualidade atuais
+    
+    Com draw, desenha numa cópia (em display, reaproveitado entre chamadas) as mãos de results, o
+    indicador de gravação e a predição da câmera: o buffer original é compartilhado com a gravação
+    e os outros viewers. Retorna (bytes do JPEG, display).
+    """
+    if draw:
+        if display is None or display.shape != frame.shape:
+            display = np.empty_like(frame)
+        np.copyto(display, frame)
+        frame = display
         
-        # Detectar e desenhar mãos
-        if MEDIAPIPE_AVAILABLE and hand_detector:
-            try:
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-                results = hand_detector.detect(mp_image)
-                frame = draw_landmarks_on_frame(frame, results)
-            except Exception as e:
-                pass  # Ignorar erros silenciosamente
+        if results is not None:
+            frame = draw_landmarks_on_frame(frame, results)
         
         # Indicador de gravação
-        if is_recording:
+        if camera.is_recording:
             cv2.circle(frame, (30, 30), 15, (0, 0, 255), -1)
             cv2.putText(frame, "GRAVANDO", (60, 40), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            cv2.putText(frame, f"Frames: {len(recorded_frames)}", (60, 70), 
+            cv2.putText(frame, f"Frames: {len(camera.recorded_frames)}", (60, 70), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
         # Mostrar predição
-        cv2.putText(frame, current_prediction, (10, frame.shape[0] - 20), 
+        cv2.putText(frame, camera.current_prediction, (10, frame.shape[0] - 20), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    
+    start = time.perf_counter()
+    if settings['scale'] < 1.0:
+        frame = cv2.resize(frame, None, fx=settings['scale'], fy=settings['scale'], interpolation=cv2.INTER_AREA)
+    ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, settings['jpeg_quality']])
+    quality_controller.observe('encoding', time.perf_counter() - start)
+    return jpeg.tobytes(), display
+
+def generate_frames(camera, draw=True, max_fps=None):
+    """Gera os frames de uma câmera para um viewer
+    
+    A captura e a detecção rodam na thread da câmera; aqui só são desenhados (draw=False deixa o
+    overlay para o navegador, a partir do /landmarks_feed), reduzidos e codificados em JPEG os frames
+    que a câmera publica, no máximo max_fps por segundo. Sob carga o quality_controller reduz fps e
+    resolução do vídeo.
+    """
+    camera.add_viewer()
+    try:
+        sequence = None
+        last_sent = 0.0
+        results = None
+        display = None
         
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        while camera.running:
+            published = camera.wait_frame(sequence)
+            if published is None:
+                continue
+            sequence, frame_buffer, frame_results = published
+            
+            try:
+                if frame_results is not None:
+                    results = frame_results  # nos frames sem detecção, as últimas mãos
+                settings = quality_controller.settings()
+                
+                now = time.perf_counter()
+                fps = min(max_fps, settings['max_fps']) if max_fps else settings['max_fps']
+                if now - last_sent < 1.0 / fps:
+                    continue
+                last_sent = now
+                
+                frame_bytes, display = encode_frame(camera, frame_buffer.array, results, draw, settings, display)
+            finally:
+                frame_buffer.release()
+            
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    finally:
+        camera.remove_viewer()
+
+def release_frames(frame_buffers):
+    """Devolve ao pool os buffers de uma gravação"""
+    for frame_buffer in frame_buffers:
+        frame_buffer.release()
+
+def request_camera(name=None):
+    """Câmera de uma requisição: a da rota /cameras/<name>/..., a do parâmetro "camera" (URL ou JSON) ou a primeira configurada"""
+    if name is None:
+        name = request.args.get('camera') or (request.get_json(silent=True) or {}).get('camera')
+    if name is None:
+        return next(iter(cameras.values()))
+    return cameras.get(name)
+
+def camera_not_found():
+    return jsonify({'status': 'error', 'message': 'Câmera não encontrada', 'cameras': list(cameras)}), 404
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/video_feed')
-def video_feed():
-    return Response(generate_frames(),
+@app.route('/cameras/<name>/video_feed')
+def video_feed(name=None):
+    # overlay=client: vídeo sem desenhos, o overlay vem do /landmarks_feed; fps limita a taxa de envio
+    camera = request_camera(name)
+    if camera is None:
+        return camera_not_found()
+    draw = request.args.get('overlay', 'server') != 'client'
+    max_fps = request.args.get('fps', type=float)
+    return Response(generate_frames(camera, draw, max_fps),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/landmarks_feed')
+@app.route('/cameras/<name>/landmarks_feed')
+def landmarks_feed(name=None):
+    """Server-Sent Events com os landmarks e a lateralidade de cada mão, no máximo fps vezes por segundo"""
+    camera = request_camera(name)
+    if camera is None:
+        return camera_not_found()
+    interval = 1.0 / max(1.0, request.args.get('fps', 30, type=float))
+    
+    def events():
+        last_frame = None
+        camera.add_viewer()
+        try:
+            while True:
+                landmarks = camera.latest_landmarks
+                if landmarks['frame'] != last_frame:
+                    last_frame = landmarks['frame']
+                    yield f"data: {json.dumps(landmarks, separators=(',', ':'))}\n\n"
+                time.sleep(interval)
+        finally:
+            camera.remove_viewer()
+    
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/cameras')
+def cameras_status():
+    return jsonify({'cameras': [camera.status() for camera in cameras.values()], 'jobs': recording_jobs.stats()})
+
 @app.route('/start_recording', methods=['POST'])
-def start_recording():
-    global is_recording, recorded_frames, current_prediction
+@app.route('/cameras/<name>/start_recording', methods=['POST'])
+def start_recording(name=None):
+    camera = request_camera(name)
+    if camera is None:
+        return camera_not_found()
     
-    if not is_recording:
-        is_recording = True
-        recorded_frames = []
-        current_prediction = "Gravando..."
+    if not camera.is_recording:
+        with camera.streaming_lock:
+            camera.recording_bundle = model_registry.current
+            camera.streaming_classifier = camera.streaming_classifier_for(camera.recording_bundle)
+            if camera.streaming_classifier is not None:
+                camera.streaming_classifier.reset()
+            camera.streamed_frames = 0
+            camera.streamed_landmarks.clear()
+        release_frames(camera.recorded_frames)
+        camera.recorded_frames = []
+        camera.is_recording = True
+        camera.current_prediction = "Gravando..."
         
-        return jsonify({'status': 'recording', 'message': 'Gravação iniciada'})
+        return jsonify({'status': 'recording', 'message': 'Gravação iniciada', 'camera': camera.name})
     
     return jsonify({'status': 'error', 'message': 'Já está gravando'})
 
 @app.route('/stop_recording', methods=['POST'])
-def stop_recording():
-    global is_recording, current_prediction
+@app.route('/cameras/<name>/stop_recording', methods=['POST'])
+def stop_recording(name=None):
+    camera = request_camera(name)
+    if camera is None:
+        return camera_not_found()
     
-    if is_recording:
-        is_recording = False
-        current_prediction = f"Gravação parada. {len(recorded_frames)} frames capturados"
+    if camera.is_recording:
+        camera.is_recording = False
+        recorded_frames = camera.recorded_frames
+        camera.current_prediction = f"Gravação parada. {len(recorded_frames)} frames capturados"
+        
+        # Se o classificador em streaming acompanhou todos os frames, a predição já está pronta
+        prediction = streaming_prediction(camera)
+        if prediction is not None:
+            camera.current_prediction = prediction
+            return jsonify({'status': 'stopped', 'frames': len(recorded_frames), 'job_id': None, 'prediction': prediction})
         
-        # Processar vídeo em thread separada
-        threading.Thread(target=process_recorded_video, daemon=True).start()
+        # Processar vídeo na fila de jobs (número limitado de threads, revezadas entre as câmeras); o job tem sua própria referência aos frames
+        job_frames = [frame_buffer.retain() for frame_buffer in recorded_frames]
+        try:
+            job = recording_jobs.submit_to(camera.name, process_recorded_video, [frame_buffer.array for frame_buffer in job_frames], camera)
+        except QueueFullError:
+            release_frames(job_frames)
+            camera.current_prediction = "Servidor ocupado, grave novamente em instantes"
+            return jsonify({'status': 'busy', 'message': camera.current_prediction, 'frames': len(recorded_frames)}), 429
+        job.add_done_callback(lambda job: release_frames(job_frames))
+        job.add_done_callback(observe_recognition)
+        camera.latest_job_id = job.id
         
-        return jsonify({'status': 'stopped', 'frames': len(recorded_frames)})
+        return jsonify({'status': 'stopped', 'frames': len(recorded_frames), 'job_id': job.id})
     
     return jsonify({'status': 'error', 'message': 'Não está gravando'})
 
 @app.route('/clear_recording', methods=['POST'])
-def clear_recording():
-    global recorded_frames, current_prediction
+@app.route('/cameras/<name>/clear_recording', methods=['POST'])
+def clear_recording(name=None):
+    camera = request_camera(name)
+    if camera is None:
+        return camera_not_found()
     
-    recorded_frames = []
-    current_prediction = "Gravação limpa. Pronto para nova gravação"
+    # Cancela os processamentos da câmera em andamento para eles não sobrescreverem a predição depois da limpeza
+    recording_jobs.cancel_all(camera.name)
+    camera.latest_job_id = None
+    release_frames(camera.recorded_frames)
+    camera.recorded_frames = []
+    camera.current_prediction = "Gravação limpa. Pronto para nova gravação"
     
     return jsonify({'status': 'cleared'})
 
+@app.route('/classify_clip', methods=['POST'])
+def classify_clip():
+    """Classifica um clipe enviado no corpo da requisição (webm, mp4, avi)
+    
+    O vídeo é decodificado da requisição à medida que chega, sem arquivo temporário, e a decodificação
+    para assim que o modelo tem os frames de que precisa.
+    """
+    bundle = model_registry.current
+    if bundle is None or not MEDIAPIPE_AVAILABLE or hand_detector is None:
+        return jsonify({'status': 'error', 'message': 'Modelo não carregado'}), 503
+    if request.mimetype.startswith('multipart/'):
+        return jsonify({'status': 'error', 'message': 'Envie o vídeo no corpo da requisição, não como formulário'}), 415
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify({'status': 'error', 'message': f'Clipe maior que {MAX_UPLOAD_BYTES} bytes'}), 413
+    if not upload_slots.acquire(blocking=False):
+        return jsonify({'status': 'busy', 'message': 'Servidor ocupado, tente novamente em instantes'}), 429
+    
+    try:
+        start_time = time.perf_counter()
+        stream = UploadStream(request.stream, MAX_UPLOAD_BYTES, request.content_length)
+        frames = decode_frames(stream, UPLOAD_MAX_FRAMES)
+        try:
+            clip_landmarks = extract_clip_landmarks(frames, bundle.source_frames or UPLOAD_MAX_FRAMES)
+        except ValueError as e:
+            # Um upload sem Content-Length cortado no limite chega incompleto ao decodificador: o resto
+            # é lido até o limite para responder 413 em vez de um vídeo inválido
+            stream.seek(0, io.SEEK_END)
+            if stream.exceeded:
+                return jsonify({'status': 'error', 'message': f'Clipe maior que {MAX_UPLOAD_BYTES} bytes'}), 413
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        finally:
+            frames.close()
+        
+        if stream.exceeded:
+            return jsonify({'status': 'error', 'message': f'Clipe maior que {MAX_UPLOAD_BYTES} bytes'}), 413
+        
+        prediction = classify_landmarks(bundle, clip_landmarks)
+        response = {
+            'frames': len(clip_landmarks),
+            'bytes_read': stream.bytes_read,
+            'seconds': round(time.perf_counter() - start_time, 3),
+            'version': bundle.version,
+        }
+        if prediction is None:
+            return jsonify(dict(response, status='no_hands', message='Nenhuma mão detectada no vídeo'))
+        
+        quality_controller.observe('recognition', response['seconds'])
+        sign, confidence = prediction
+        log_capture('upload', clip_landmarks, sign, confidence, bundle)
+        return jsonify(dict(response, status='ok', prediction=sign, confidence=round(confidence, 4)))
+    except Exception as e:
+        print(f"✗ Erro ao classificar clipe: {e}")
+        return jsonify({'status': 'error', 'message': 'Erro ao processar o clipe'}), 500
+    finally:
+        upload_slots.release()
+
+@app.route('/auto_mode', methods=['GET', 'POST'])
+@app.route('/cameras/<name>/auto_mode', methods=['GET', 'POST'])
+def auto_mode_status(name=None):
+    """Liga/desliga o modo automático de uma câmera (POST {"enabled": true}) e mostra o estado do segmentador"""
+    camera = request_camera(name)
+    if camera is None:
+        return camera_not_found()
+    
+    if request.method == 'POST':
+        camera.auto_mode = bool((request.get_json(silent=True) or {}).get('enabled', not camera.auto_mode))
+        camera.segmenter.reset()
+    
+    return jsonify(dict(camera.segmenter.status(), enabled=camera.auto_mode, camera=camera.name))
+
+@app.route('/capture_log')
+def capture_log_status():
+    return jsonify(dict(capture_log.status(), enabled=True) if capture_log is not None else {'enabled': False})
+
+@app.route('/qos')
+def qos_status():
+    return jsonify(dict(quality_controller.status(), jobs_in_flight=recording_jobs.in_flight))
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = recording_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job não encontrado'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = recording_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job não encontrado'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs')
+def jobs_stats():
+    return jsonify(recording_jobs.stats())
+
+def admin_authorized():
+    # Sem token configurado nenhum pedido é autorizado: o servidor escuta em todas as interfaces
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+def admin_forbidden():
+    message = 'Não autorizado' if ADMIN_TOKEN else 'Endpoints administrativos desativados (defina STL_ADMIN_TOKEN)'
+    return jsonify({'status': 'error', 'message': message}), 403
+
+@app.route('/debug/profile', methods=['POST'])
+def debug_profile():
+    """Profile por amostragem de todas as threads do servidor (captura, jobs, requisições) durante seconds segundos
+    
+    Parâmetros (URL): seconds (padrão 10), interval (s entre amostras, padrão 0.005), mode ("cpu" conta
+    só as threads que usaram CPU, "wall" todas), allocations (N maiores alocações com tracemalloc) e
+    format ("collapsed" devolve só as pilhas em texto, para o flamegraph.pl ou o speedscope).
+    """
+    if not admin_authorized():
+        return admin_forbidden()
+    
+    try:
+        profile = profiler.profile(
+            request.args.get('seconds', 10.0, type=float),
+            interval=request.args.get('interval', 0.005, type=float),
+            mode=request.args.get('mode', 'cpu'),
+            allocations=request.args.get('allocations', 0, type=int),
+        )
+    except ProfilerBusyError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    stacks = collapsed(profile.pop('stacks'))
+    if request.args.get('format') == 'collapsed':
+        return Response(stacks, mimetype='text/plain')
+    return jsonify(dict(profile, status='ok', collapsed=stacks))
+
+@app.route('/model')
+def model_info():
+    bundle = model_registry.current
+    return jsonify({
+        'model': bundle.describe() if bundle is not None else None,
+        'reload': model_registry.status,
+    })
+
+@app.route('/reload_model', methods=['POST'])
+def reload_model():
+    if not admin_authorized():
+        return admin_forbidden()
+    
+    # Só bundles dentro de MODEL_DIR: o caminho vem da requisição
+    requested = str((request.get_json(silent=True) or {}).get('path', BUNDLE_PATH))
+    bundle_path = os.path.realpath(os.path.join(MODEL_DIR, requested))
+    if os.path.commonpath([bundle_path, MODEL_DIR]) != MODEL_DIR or not bundle_path.endswith('.stlbundle'):
+        return jsonify({'status': 'error', 'message': f'Só bundles .stlbundle dentro de {MODEL_DIR}'}), 400
+    if not os.path.exists(bundle_path):
+        return jsonify({'status': 'error', 'message': f'Bundle não encontrado: {bundle_path}'}), 404
+    
+    if not model_registry.reload(bundle_path):
+        return jsonify({'status': 'error', 'message': 'Já existe uma recarga em andamento'}), 409
+    
+    return jsonify({'status': 'loading', 'path': bundle_path}), 202
+
+@app.route('/signs')
+def signs_info():
+    bundle = model_registry.current
+    if sign_index is None:
+        return jsonify({'enabled': False})
+    return jsonify({
+        'enabled': True,
+        'active': active_sign_index(bundle) is not None,
+        'model_version': sign_index.model_version,
+        'signs': sign_index.counts(),
+        'references': len(sign_index),
+    })
+
+@app.route('/signs/enroll', methods=['POST'])
+def enroll_sign():
+    """Cadastra a última gravação de uma câmera como clipe de referência de um sinal (novo ou já conhecido)"""
+    if not admin_authorized():
+        return admin_forbidden()
+    
+    bundle = model_registry.current
+    label = str((request.get_json(silent=True) or {}).get('label', '')).strip()
+    if sign_index is None:
+        return jsonify({'status': 'error', 'message': 'Índice de sinais desativado (defina STL_SIGN_INDEX)'}), 404
+    if bundle is None:
+        return jsonify({'status': 'error', 'message': 'Modelo não carregado'}), 503
+    if not label:
+        return jsonify({'status': 'error', 'message': 'Informe o sinal em "label"'}), 400
+    if sign_index.model_version != bundle.version:
+        return jsonify({'status': 'error', 'message': f'O índice é do modelo {sign_index.model_version}; recrie-o com SignIndex.py'}), 409
+    camera = request_camera()
+    if camera is None:
+        return camera_not_found()
+    if camera.is_recording or not camera.recorded_frames:
+        return jsonify({'status': 'error', 'message': 'Grave o sinal antes de cadastrá-lo'}), 409
+    
+    frames = [frame_buffer.retain() for frame_buffer in camera.recorded_frames]
+    try:
+        start_time = time.perf_counter()
+        arrays = [frame_buffer.array for frame_buffer in frames]
+        clip_landmarks = extract_clip_landmarks(arrays, bundle.source_frames or len(arrays))
+    finally:
+        release_frames(frames)
+    
+    if not any(frame_has_hand(landmarks) for landmarks in clip_landmarks):
+        return jsonify({'status': 'no_hands', 'message': 'Nenhuma mão detectada na gravação'}), 422
+    
+    embeddings = bundle.embed([tuple(zip(*clip_landmarks))])
+    # Cadastro e gravação juntos: dois cadastros ao mesmo tempo não gravam um o índice sem o clipe do outro
+    with sign_index_lock:
+        references = sign_index.add(label, embeddings)
+        sign_index.save(SIGN_INDEX_PATH)
+    print(f"✓ Sinal '{label}' cadastrado ({references} clipe(s) de referência)")
+    return jsonify({
+        'status': 'ok',
+        'label': label,
+        'references': references,
+        'seconds': round(time.perf_counter() - start_time, 3),
+    })
+
+@app.route('/signs/<label>', methods=['DELETE'])
+def remove_sign(label):
+    if not admin_authorized():
+        return admin_forbidden()
+    if sign_index is None:
+        return jsonify({'status': 'error', 'message': 'Índice de sinais desativado (defina STL_SIGN_INDEX)'}), 404
+    
+    with sign_index_lock:
+        removed = sign_index.remove(label)
+        if removed:
+            sign_index.save(SIGN_INDEX_PATH)
+    if not removed:
+        return jsonify({'status': 'error', 'message': f'Sinal não cadastrado: {label}'}), 404
+    return jsonify({'status': 'ok', 'label': label, 'removed': removed})
+
 @app.route('/prediction')
-def get_prediction():
+@app.route('/cameras/<name>/prediction')
+def get_prediction(name=None):
+    camera = request_camera(name)
+    if camera is None:
+        return camera_not_found()
     return jsonify({
-        'prediction': current_prediction,
-        'is_recording': is_recording,
-        'frames': len(recorded_frames)
+        'prediction': camera.current_prediction,
+        'is_recording': camera.is_recording,
+        'frames': len(camera.recorded_frames),
+        'camera': camera.name
     })
 
-if __name__ == '__main__':
+def initialize():
+    """Carrega detector de mãos, modelo e processos de inferência e inicia as câmeras (app.py e AsyncServer.py)"""
+    global hand_detector, extraction_pool, serving_pool
+    
     print("\n" + "="*60)
     print("🔍 DIAGNÓSTICO DE INICIALIZAÇÃO")
     print("="*60)
     
     print(f"\n📁 Verificando arquivos:")
     print(f"   hand_landmarker.task: {os.path.exists(HAND_MODEL_PATH)}")
-    print(f"   ModelY2.0.keras: {os.path.exists(MODEL_PATH)}")
+    print(f"   {MODEL_PATH}: {os.path.exists(MODEL_PATH)}")
     print(f"   Encoder.p: {os.path.exists(ENCODER_PATH)}")
+    print(f"   {BUNDLE_PATH}: {os.path.exists(BUNDLE_PATH)}")
+    
+    # Antes de carregar o modelo: depois da primeira operação o TensorFlow não muda seus pools
+    apply_thread_budget(THREAD_BUDGET)
     
     if MEDIAPIPE_AVAILABLE and os.path.exists(HAND_MODEL_PATH):
         try:
             hand_detector = load_hand_model(HAND_MODEL_PATH)
             print(f"✓ Hand detector carregado")
+            extraction_pool = DetectorPool(lambda: load_hand_model(HAND_MODEL_PATH), EXTRACTION_WORKERS)
+            print(f"✓ {EXTRACTION_WORKERS} detectores para extração em paralelo")
         except Exception as e:
             print(f"✗ Erro ao carregar hand detector: {e}")
     
-    if TENSORFLOW_AVAILABLE and os.path.exists(MODEL_PATH):
+    if TENSORFLOW_AVAILABLE:
         try:
-            model = load_model(MODEL_PATH)
-            print(f"✓ Modelo carregado")
+            if os.path.exists(BUNDLE_PATH):
+                bundle = load_bundle(BUNDLE_PATH)
+            elif os.path.exists(MODEL_PATH) and os.path.exists(ENCODER_PATH):
+                bundle = load_legacy_files(MODEL_PATH, ENCODER_PATH)
+            else:
+                bundle = None
+            if bundle is not None:
+                bundle.warm_up()
+                model_registry.current = bundle
+                for camera in cameras.values():
+                    camera.segmenter.max_length = bundle.source_frames or SEGMENT_MAX_FRAMES
+                load_sign_index(bundle)
+                if bundle.hand_model is not None and MEDIAPIPE_AVAILABLE:
+                    on_bundle_swap(bundle)
+                if SERVING_PROCESSES > 0:
+                    from ServingWorkers import RecordingWorkerPool
+                    legacy = not os.path.exists(BUNDLE_PATH)
+                    serving_pool = RecordingWorkerPool(
+                        bundle.source,
+                        encoder_path=ENCODER_PATH if legacy else None,
+                        sign_index_path=SIGN_INDEX_PATH,
+                        processes=SERVING_PROCESSES,
+                    )
+                print(f"✓ Modelo carregado (versão {bundle.version})")
+                print(f"   Classes: {list(bundle.encoder.classes_)}")
+                print(f"   Streaming: {'ativo' if bundle.streaming_classifier is not None else 'desativado (modelo sem máscara ou com reamostragem)'}")
+                if sign_index is not None:
+                    print(f"   Índice de sinais: {len(sign_index.labels)} sinais, {len(sign_index)} clipes ({'ativo' if active_sign_index(bundle) is not None else 'inativo'})")
         except Exception as e:
             print(f"✗ Erro ao carregar modelo: {e}")
+        
+        if BUNDLE_WATCH_INTERVAL > 0:
+            model_registry.watch(BUNDLE_PATH, BUNDLE_WATCH_INTERVAL)
+            print(f"👀 Observando {BUNDLE_PATH} para recarga automática")
     
-    if os.path.exists(ENCODER_PATH):
+    # Cada câmera captura e detecta na sua thread, com o seu detector
+    for camera in cameras.values():
+        camera.start()
+        print(f"📷 Câmera {camera.name}: {camera.source}")
+
+if __name__ == '__main__':
+    if not DEBUG:
+        # Em produção as requisições vão para um servidor WSGI de verdade, não o de desenvolvimento do Flask
         try:
-            with open(ENCODER_PATH, 'rb') as f:
-                encoder = pickle.load(f)
-            print(f"✓ Encoder carregado")
-            print(f"   Classes: {list(encoder.classes_)}")
-        except Exception as e:
-            print(f"✗ Erro ao carregar encoder: {e}")
+            from waitress import serve
+        except ImportError:
+            raise SystemExit("❌ STL_DEBUG=0 precisa do waitress (pip install -r requirements-serve.txt), ou use o wsgi.py com gunicorn")
+    
+    initialize()
     
     print("\n" + "="*60)
     print("🚀 Servidor Flask iniciado!")
     print("📱 Acesse: http://localhost:5000")
     print("="*60 + "\n")
     
-    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False, threaded=True)
\ No newline at end of file
+    if DEBUG:
+        app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False, threaded=True)
+    else:
+        serve(app, host='0.0.0.0', port=5000, threads=THREAD_BUDGET.requests)
\ No newline at end of file
@@ -0,0 +1,872 @@
+"""
+benchmarks of the training and serving pipeline
+
+Usage:
+    python benchmark.py bucketing --epochs 10
+    python benchmark.py augmentation
+    python benchmark.py architectures --epochs 20
+    python benchmark.py streaming
+    python benchmark.py resampling --lengths 24 32 60
+    python benchmark.py extraction --video gravacao.mp4 --workers 1 2 4
+    python benchmark.py serving --video gravacao.mp4 --processes 0 1 2 4
+    python benchmark.py upload --video gravacao.webm --clients 1 4 8
+    python benchmark.py allocations --frames 300
+    python benchmark.py index --signs 100 1000 5000
+    python benchmark.py qos --video gravacao.webm --viewers 0 4 8
+    python benchmark.py capture_log --threads 4 --requests 500
+    python benchmark.py cameras --video gravacao.mp4 --cameras 1 2 4 8
+    python benchmark.py streams --connections 10 100 500 --pid 12345
+    python benchmark.py threads --video gravacao.mp4 --seconds 20
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+def split_indices(number_of_clips, test_size = 0.2, seed = 0):
+    """
+    returns fixed train/test index arrays so every compared path sees the same split
+    """
+    order = np.random.default_rng(seed).permutation(number_of_clips)
+    number_of_test = max(1, int(round(number_of_clips*test_size)))
+    return order[number_of_test:], order[:number_of_test]
+
+def one_hot_labels(labels):
+    from sklearn.preprocessing import LabelEncoder
+    from keras.utils import to_categorical
+
+    encoder = LabelEncoder()
+    return to_categorical(encoder.fit_transform(labels)), encoder
+
+def make_epoch_timer():
+    from keras.callbacks import Callback
+
+    class EpochTimer(Callback):
+        def on_train_begin(self, logs=None):
+            self.times = []
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.times.append(time.perf_counter() - self.start)
+
+    return EpochTimer()
+
+def summarize_epochs(times):
+    """
+    median epoch time, skipping the first epoch (graph tracing)
+    """
+    steady = times[1:] if len(times) > 1 else times
+    return float(np.median(steady))
+
+def bench_bucketing(args):
+    from Batching import BucketedClips
+    from ModelDevelopment import open_data, unpack_data, pad_data, build_model
+    from Preprocessing import prepare_clip
+
+    data = open_data(args.data)
+    labels, local_right, local_left, global_right, global_left = unpack_data(data)
+    labels_one_hot, _ = one_hot_labels(labels)
+    train_idx, test_idx = split_indices(len(labels), seed=args.seed)
+
+    results = []
+
+    # Caminho atual: todos os clipes com padding para 60 frames
+    padded = list(pad_data(local_right, local_left, global_right, global_left))
+    padded[0] = padded[0].reshape(-1,60,63)
+    padded[1] = padded[1].reshape(-1,60,63)
+    model = build_model(num_classes=labels_one_hot.shape[1])
+    model.compile(optimizer='adam',loss='categorical_crossentropy',metrics=['accuracy'])
+    timer = make_epoch_timer()
+    model.fit([array[train_idx] for array in padded], labels_one_hot[train_idx], batch_size=args.batch_size, epochs=args.epochs, callbacks=[timer], verbose=0)
+    accuracy = model.evaluate([array[test_idx] for array in padded], labels_one_hot[test_idx], verbose=0)[1]
+    results.append(("padded 60", summarize_epochs(timer.times), accuracy, 60.0))
+
+    # Caminho novo: clipes aparados, agrupados por comprimento, com máscara
+    clips = [prepare_clip(*clip) for clip in zip(local_right, local_left, global_right, global_left)]
+    train_data = BucketedClips([clips[i] for i in train_idx], labels_one_hot[train_idx], batch_size=args.batch_size, seed=args.seed)
+    test_data = BucketedClips([clips[i] for i in test_idx], labels_one_hot[test_idx], batch_size=args.batch_size, shuffle=False)
+    model = build_model(masking=True, num_classes=labels_one_hot.shape[1])
+    model.compile(optimizer='adam',loss='categorical_crossentropy',metrics=['accuracy'])
+    timer = make_epoch_timer()
+    model.fit(train_data, epochs=args.epochs, callbacks=[timer], verbose=0)
+    accuracy = model.evaluate(test_data, verbose=0)[1]
+    mean_steps = float(np.mean([length for indices, length in train_data.batches for _ in indices]))
+    results.append(("bucketed + mask", summarize_epochs(timer.times), accuracy, mean_steps))
+
+    print(f"{'caminho':<18}{'epoch (s)':>12}{'acurácia':>12}{'passos/clipe':>15}")
+    for name, epoch_time, accuracy, steps in results:
+        print(f"{name:<18}{epoch_time:>12.3f}{accuracy*100:>11.1f}%{steps:>15.1f}")
+
+def bench_augmentation(args):
+    from Augmentation import LandmarkAugmenter
+    from ModelDevelopment import open_data, unpack_data, build_model
+    from Preprocessing import prepare_clip, pad_clips
+
+    data = open_data(args.data)
+    labels, local_right, local_left, global_right, global_left = unpack_data(data)
+    labels_one_hot, _ = one_hot_labels(labels)
+    clips = [prepare_clip(*clip) for clip in zip(local_right, local_left, global_right, global_left)]
+
+    rng = np.random.default_rng(args.seed)
+    indices = rng.integers(0, len(clips), size=args.batch_size)
+    batch = pad_clips([clips[i] for i in indices], 60)
+    batch_labels = labels_one_hot[indices]
+
+    augmenter = LandmarkAugmenter(seed=args.seed)
+    augmenter(*batch)
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        augmenter(*batch)
+    augment_clips_per_second = args.repeats*args.batch_size/(time.perf_counter() - start)
+
+    model = build_model(masking=True, num_classes=labels_one_hot.shape[1])
+    model.compile(optimizer='adam',loss='categorical_crossentropy',metrics=['accuracy'])
+    model.train_on_batch(tuple(batch), batch_labels)
+    steps = max(1, args.repeats//10)
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.train_on_batch(tuple(batch), batch_labels)
+    train_clips_per_second = steps*args.batch_size/(time.perf_counter() - start)
+
+    print(f"aumento de dados: {augment_clips_per_second:>10.0f} clipes/s ({args.batch_size} x 60 frames por lote)")
+    print(f"treino:           {train_clips_per_second:>10.0f} clipes/s")
+    print(f"o aumento ocupa {100*train_clips_per_second/augment_clips_per_second:.1f}% do tempo de um passo de treino")
+
+def measure_latency(predict, inputs, repeats):
+    """
+    median wall time in milliseconds of predict(inputs), after one warm up call
+    """
+    predict(inputs)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(inputs)
+        times.append(time.perf_counter() - start)
+    return 1000*float(np.median(times))
+
+def bench_architectures(args):
+    from ModelDevelopment import open_data, unpack_data, ARCHITECTURES
+    from Preprocessing import prepare_clip, pad_clips
+
+    data = open_data(args.data)
+    labels, local_right, local_left, global_right, global_left = unpack_data(data)
+    labels_one_hot, _ = one_hot_labels(labels)
+    train_idx, test_idx = split_indices(len(labels), seed=args.seed)
+    clips = [prepare_clip(*clip) for clip in zip(local_right, local_left, global_right, global_left)]
+    inputs = pad_clips(clips, 60)
+
+    results = []
+    for name, build in ARCHITECTURES.items():
+        model = build(masking=True, num_classes=labels_one_hot.shape[1])
+        model.compile(optimizer='adam',loss='categorical_crossentropy',metrics=['accuracy'])
+        model.fit([array[train_idx] for array in inputs], labels_one_hot[train_idx], batch_size=32, epochs=args.epochs, verbose=0)
+        accuracy = model.evaluate([array[test_idx] for array in inputs], labels_one_hot[test_idx], verbose=0)[1]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, f"{name}.keras")
+            model.save(model_path)
+            size = os.path.getsize(model_path)
+
+        latencies = []
+        for batch_size in (1, 32):
+            batch = [np.resize(array, (batch_size,) + array.shape[1:]) for array in inputs]
+            latencies.append(measure_latency(model.predict_on_batch, batch, args.repeats))
+
+        results.append((name, accuracy, model.count_params(), size, *latencies))
+
+    print(f"{'arquitetura':<13}{'acurácia':>10}{'params':>10}{'arquivo':>11}{'lote 1 (ms)':>13}{'lote 32 (ms)':>14}")
+    for name, accuracy, params, size, latency_1, latency_32 in results:
+        print(f"{name:<13}{accuracy*100:>9.1f}%{params:>10}{size/1024:>8.0f} KB{latency_1:>13.2f}{latency_32:>14.2f}")
+
+def bench_streaming(args):
+    from keras.models import load_model
+    from ModelDevelopment import open_data, unpack_data, build_model
+    from Preprocessing import prepare_clip, pad_clips
+    from StreamingInference import StreamingClassifier
+    import ModelLayers
+
+    data = open_data(args.data)
+    labels, local_right, local_left, global_right, global_left = unpack_data(data)
+    clip = prepare_clip(local_right[0], local_left[0], global_right[0], global_left[0])
+
+    model = load_model(args.model) if args.model else build_model(masking=True, num_classes=args.classes)
+    batch = pad_clips([clip], 60)
+
+    full_ms = measure_latency(lambda inputs: model.predict(inputs, verbose=0), batch, args.repeats)
+    on_batch_ms = measure_latency(model.predict_on_batch, batch, args.repeats)
+
+    streaming = StreamingClassifier(model)
+    times = []
+    predict_times = []
+    for _ in range(args.repeats):
+        streaming.reset()
+        for frame in zip(*clip):
+            start = time.perf_counter()
+            streaming.update(*frame)
+            times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        probabilities = streaming.predict()
+        predict_times.append(time.perf_counter() - start)
+    frame_ms = 1000*float(np.median(times))
+    predict_ms = 1000*float(np.median(predict_times))
+
+    difference = float(np.max(np.abs(probabilities - model.predict_on_batch(batch)[0])))
+
+    print(f"model.predict (60 frames):          {full_ms:>8.3f} ms")
+    print(f"model.predict_on_batch (60 frames): {on_batch_ms:>8.3f} ms")
+    print(f"StreamingClassifier.update (1 frame): {frame_ms:>6.3f} ms ({100*frame_ms/full_ms:.1f}% de model.predict)")
+    print(f"StreamingClassifier.predict (fim do clipe): {predict_ms:>6.3f} ms (ramos do pulso sobre o clipe inteiro)")
+    print(f"diferença máxima entre as probabilidades: {difference:.2e}")
+
+def bench_resampling(args):
+    from ModelDevelopment import open_data, unpack_data, build_model
+    from Preprocessing import prepare_clip, pad_clips
+
+    data = open_data(args.data)
+    labels, local_right, local_left, global_right, global_left = unpack_data(data)
+    labels_one_hot, _ = one_hot_labels(labels)
+    train_idx, test_idx = split_indices(len(labels), seed=args.seed)
+
+    # None: clipe truncado em 60 frames (caminho sem reamostragem)
+    results = []
+    for length in [None] + args.lengths:
+        clips = [prepare_clip(*clip, resample_length=length) for clip in zip(local_right, local_left, global_right, global_left)]
+        inputs = pad_clips(clips, length or 60)
+
+        model = build_model(maxlen=length or 60, masking=True, num_classes=labels_one_hot.shape[1])
+        model.compile(optimizer='adam',loss='categorical_crossentropy',metrics=['accuracy'])
+        model.fit([array[train_idx] for array in inputs], labels_one_hot[train_idx], batch_size=32, epochs=args.epochs, verbose=0)
+        accuracy = model.evaluate([array[test_idx] for array in inputs], labels_one_hot[test_idx], verbose=0)[1]
+
+        batch = [array[:1] for array in inputs]
+        latency = measure_latency(model.predict_on_batch, batch, args.repeats)
+        results.append((f"{length} frames" if length else "truncado 60", accuracy, latency))
+
+    print(f"{'comprimento':<14}{'acurácia':>10}{'lote 1 (ms)':>13}")
+    for name, accuracy, latency in results:
+        print(f"{name:<14}{accuracy*100:>9.1f}%{latency:>13.2f}")
+
+def read_video(video_path, max_frames):
+    import cv2
+
+    capture = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    print(f"{len(frames)} frames de {video_path}")
+    return frames
+
+def bench_extraction(args):
+    from ExtractionPool import DetectorPool
+    from app import load_hand_model, extract_landmarks_from_frame, frame_has_hand
+
+    frames = read_video(args.video, args.max_frames)
+
+    extract = lambda detector, frame: extract_landmarks_from_frame(frame, detector, verbose=False)
+    baseline = None
+    for workers in args.workers:
+        pool = DetectorPool(lambda: load_hand_model(args.hand_model), workers)
+        times = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            landmarks = pool.extract_clip(frames, extract, frame_has_hand, maxlen=args.maxlen)
+            times.append(time.perf_counter() - start)
+        pool.shutdown()
+
+        seconds = float(np.median(times))
+        baseline = baseline or seconds
+        print(f"{workers:>2} detector(es): {seconds*1000:>8.1f} ms para {len(landmarks)} frames ({baseline/seconds:.2f}x)")
+
+def bench_serving(args):
+    from concurrent.futures import ThreadPoolExecutor
+    import ServingWorkers
+    from ServingWorkers import RecordingWorkerPool
+    from ExtractionPool import DetectorPool
+    from app import load_hand_model, extract_landmarks_from_frame, frame_has_hand
+
+    # Como no servidor: a extração fica no processo principal e só os landmarks vão para a inferência
+    frames = read_video(args.video, args.max_frames)
+    detectors = DetectorPool(lambda: load_hand_model(args.hand_model), os.cpu_count() or 1)
+    clip_landmarks = detectors.extract_clip(frames, lambda detector, frame: extract_landmarks_from_frame(frame, detector, verbose=False), frame_has_hand, maxlen=len(frames))
+    detectors.shutdown()
+    print(f"{len(clip_landmarks)} frames de landmarks, {len(pickle.dumps(clip_landmarks))/1024:.1f} KB por gravação enviada")
+
+    # 0 processos: as predições são feitas por threads do próprio processo (modo de desenvolvimento)
+    results = []
+    for processes in args.processes:
+        if processes == 0:
+            ServingWorkers._init_worker(args.bundle, None, None, os.cpu_count() or 1)
+            classify = ServingWorkers._classify
+            pool = None
+        else:
+            pool = RecordingWorkerPool(args.bundle, processes=processes)
+            classify = pool.classify
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            start = time.perf_counter()
+            predictions = list(executor.map(lambda _: classify(clip_landmarks), range(args.clips)))
+            seconds = time.perf_counter() - start
+
+        if pool is not None:
+            pool.shutdown()
+        results.append((processes, args.clips/seconds, predictions[-1]))
+
+    print(f"{'processos':>10}{'gravações/s':>13}  resultado")
+    for processes, throughput, prediction in results:
+        print(f"{processes:>10}{throughput:>13.2f}  {prediction}")
+
+def bench_upload(args):
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+
+    with open(args.video, 'rb') as f:
+        video = f.read()
+    content_type = {".webm": "video/webm", ".mp4": "video/mp4", ".avi": "video/x-msvideo"}.get(os.path.splitext(args.video)[1], "application/octet-stream")
+
+    def post(_):
+        start = time.perf_counter()
+        response = requests.post(f"{args.url}/classify_clip", data=video, headers={"Content-Type": content_type})
+        return response.status_code, time.perf_counter() - start
+
+    print(f"{len(video)/1024:.0f} KB, {args.requests} requisições por rodada em {args.url}")
+    print(f"{'clientes':>9}{'req/s':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}  status")
+    for clients in args.clients:
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(post, range(args.requests)))
+            seconds = time.perf_counter() - start
+
+        latencies = [latency for status, latency in results if status == 200]
+        statuses = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        p50, p95 = (1000*np.percentile(latencies, [50, 95])) if latencies else (float('nan'), float('nan'))
+        print(f"{clients:>9}{len(latencies)/seconds:>9.2f}{p50:>10.0f}{p95:>10.0f}  {statuses}")
+
+class SyntheticCamera:
+    """
+    stands in for cv2.VideoCapture, replaying one frame with the same read(image) contract
+    """
+    def __init__(self, frame):
+        self.frame = frame
+
+    def read(self, image = None):
+        if image is None:
+            return True, self.frame.copy()
+        np.copyto(image, self.frame)
+        return True, image
+
+def bench_allocations(args):
+    import gc
+    import tracemalloc
+    import cv2
+    from FramePool import CapturePipeline
+
+    frame = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    # Metade dos frames gravando: a gravação guarda cada frame até o fim da medição
+    recording = lambda index: index >= args.frames//2
+
+    def legacy(camera):
+        recorded = []
+        for index in range(args.frames):
+            yield
+            ok, frame = camera.read()
+            frame = cv2.flip(frame, 1)
+            if recording(index):
+                recorded.append(frame.copy())
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def pooled(camera):
+        pipeline = CapturePipeline(camera)
+        recorded = []
+        for index in range(args.frames):
+            yield
+            frame_buffer = pipeline.read()
+            if recording(index):
+                recorded.append(frame_buffer.retain())
+            rgb = pipeline.rgb(frame_buffer)
+            frame_buffer.release()
+
+    print(f"{args.frames} frames {args.width}x{args.height}, gravando a partir do frame {args.frames//2}")
+    print(f"{'pipeline':>10}{'KB/frame (p50)':>16}{'KB/frame (média)':>17}{'MB no total':>13}{'GC gen0':>9}{'µs/frame':>10}")
+    for name, loop in (("legacy", legacy), ("pool", pooled)):
+        gc.collect()
+        collections = gc.get_stats()[0]["collections"]
+        tracemalloc.start()
+        steps = loop(SyntheticCamera(frame))
+        next(steps)
+        peaks = []
+        start_total = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        # Cada next() processa um frame: mede o pico de memória acima do que já estava alocado
+        for _ in range(args.frames - 1):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            next(steps)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        seconds = time.perf_counter() - start
+        total = tracemalloc.get_traced_memory()[0] - start_total
+        tracemalloc.stop()
+        collections = gc.get_stats()[0]["collections"] - collections
+
+        print(f"{name:>10}{np.median(peaks)/1024:>16.1f}{np.mean(peaks)/1024:>17.1f}{total/1024**2:>13.1f}{collections:>9}{1e6*seconds/args.frames:>10.0f}")
+
+def bench_qos(args):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+
+    with open(args.video, 'rb') as f:
+        video = f.read()
+
+    def view(stop, frames):
+        with requests.get(f"{args.url}/video_feed", stream=True) as response:
+            for chunk in response.iter_content(64*1024):
+                frames.append(len(chunk))
+                if stop.is_set():
+                    break
+
+    print(f"SLO de reconhecimento do servidor: {requests.get(f'{args.url}/qos').json()['recognition_slo']}s")
+    print(f"{'viewers':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}{'MB/s vídeo':>12}  nível")
+    for viewers in args.viewers:
+        stop = threading.Event()
+        received = []
+        threads = [threading.Thread(target=view, args=(stop, received), daemon=True) for _ in range(viewers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.warmup)  # tempo para o controle de qualidade reagir aos viewers
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            request_start = time.perf_counter()
+            response = requests.post(f"{args.url}/classify_clip", data=video, headers={"Content-Type": "application/octet-stream"})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - request_start)
+        seconds = time.perf_counter() - start
+        level = requests.get(f"{args.url}/qos").json()["settings"]["name"]
+        stop.set()
+
+        p50, p95 = (1000*np.percentile(latencies, [50, 95])) if latencies else (float('nan'), float('nan'))
+        print(f"{viewers:>8}{p50:>10.0f}{p95:>10.0f}{sum(received)/seconds/1024**2:>12.2f}  {level}")
+
+def bench_capture_log(args):
+    import threading
+    from CaptureLog import CaptureLog
+
+    rng = np.random.default_rng(0)
+    # Clipe do tamanho de uma gravação real: 60 frames com duas mãos
+    clip = [
+        ([tuple(point) for point in rng.random((21, 3))], [tuple(point) for point in rng.random((21, 3))], tuple(rng.random(3)), tuple(rng.random(3)))
+        for _ in range(60)
+    ]
+    matrix = rng.random((args.work_size, args.work_size))
+
+    def run(capture_log):
+        call_times = []
+
+        def request_path():
+            for _ in range(args.requests):
+                np.linalg.inv(matrix)  # trabalho de uma requisição (CPU)
+                if capture_log is not None:
+                    start = time.perf_counter()
+                    capture_log.log("recording", clip, "dia", 0.97, "bench")
+                    call_times.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=request_path) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        return args.threads*args.requests/seconds, call_times
+
+    baseline, _ = run(None)
+    with tempfile.TemporaryDirectory() as tmp:
+        capture_log = CaptureLog(tmp)
+        throughput, call_times = run(capture_log)
+        start = time.perf_counter()
+        capture_log.flush()
+        drain = time.perf_counter() - start
+        status = capture_log.status()
+
+    print(f"{args.threads} threads x {args.requests} requisições")
+    print(f"sem log: {baseline:.0f} req/s, com log: {throughput:.0f} req/s ({(1 - throughput/baseline)*100:+.1f}% de custo)")
+    print(f"log(): p50 {1e6*np.median(call_times):.1f} µs, p99 {1e6*np.percentile(call_times, 99):.1f} µs")
+    print(f"{status['written']} amostras gravadas, {status['dropped']} descartadas, {status['bytes_written']/max(1, status['written'])/1024:.1f} KB por amostra, fila esvaziada em {drain:.2f}s depois do fim")
+
+def bench_index(args):
+    from SignIndex import SignIndex
+
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(args.repeats, args.dimension)).astype('float32')
+
+    print(f"{'sinais':>8}{'clipes':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for signs in args.signs:
+        index = SignIndex()
+        # Referências de cada sinal em volta de um centro próprio, como embeddings de clipes do mesmo sinal
+        centers = rng.normal(size=(signs, args.dimension))
+        for sign, center in enumerate(centers):
+            index.add(f"sinal{sign}", center + 0.3*rng.normal(size=(args.references, args.dimension)))
+
+        times = []
+        for query in queries:
+            start = time.perf_counter()
+            index.classify(query)
+            times.append(time.perf_counter() - start)
+        p50, p99 = 1000*np.percentile(times, [50, 99])
+        print(f"{signs:>8}{len(index):>9}{p50:>10.3f}{p99:>10.3f}")
+
+def bench_cameras(args):
+    import app
+    from Cameras import CameraPipeline
+
+    if not app.MEDIAPIPE_AVAILABLE:
+        raise SystemExit("✗ MediaPipe não disponível")
+    if args.bundle:
+        from ModelBundle import load_bundle
+        app.model_registry.current = load_bundle(args.bundle)
+        app.model_registry.current.warm_up()
+
+    # Cada câmera reproduz o vídeo sem pausas, no modo automático (todo frame é detectado e os
+    # sinais segmentados vão para a fila compartilhada): mede quantos frames por segundo cada uma processa
+    cores = os.cpu_count() or 1
+    print(f"{cores} núcleo(s), vídeo {args.video}, {args.seconds:.0f}s por medição")
+    print(f"{'câmeras':>8}{'fps/câmera':>12}{'mín':>8}{'fps total':>11}{'escala':>8}{'CPU':>7}{'sinais':>8}")
+    baseline = None
+    for count in args.cameras:
+        cameras = [CameraPipeline(f"camera{index}", args.video, lambda: app.load_hand_model(args.hand_model), app.process_camera_frame, realtime=False) for index in range(count)]
+        for camera in cameras:
+            camera.auto_mode = True
+            camera.start()
+        time.sleep(args.warmup)
+
+        jobs = app.recording_jobs.stats()["jobs"].get("done", 0)
+        frames = [camera.frames_detected for camera in cameras]
+        cpu = time.process_time()
+        start = time.perf_counter()
+        time.sleep(args.seconds)
+        seconds = time.perf_counter() - start
+        rates = [(camera.frames_detected - before)/seconds for camera, before in zip(cameras, frames)]
+        cpu = (time.process_time() - cpu)/seconds/cores
+        jobs = app.recording_jobs.stats()["jobs"].get("done", 0) - jobs
+
+        for camera in cameras:
+            camera.stop()
+        total = sum(rates)
+        baseline = baseline or total
+        print(f"{count:>8}{np.mean(rates):>12.1f}{min(rates):>8.1f}{total:>11.1f}{total/baseline:>7.2f}x{cpu*100:>6.0f}%{jobs:>8}")
+
+def process_status(pid):
+    """
+    resident memory (KB) and number of threads of a process, from /proc (Linux)
+    """
+    status = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.split()
+    return int(status["VmRSS"][0]), int(status["Threads"][0])
+
+def bench_streams(args):
+    import asyncio
+    from urllib.parse import urlsplit
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    path = args.path
+
+    async def connection(counts, index, stop):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            counts[index] = None
+            return
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        await writer.drain()
+        tail = b""
+        try:
+            while not stop.is_set():
+                data = await reader.read(65536)
+                if not data:
+                    break
+                counts[index][0] += (tail + data).count(b"--frame")
+                counts[index][1] += len(data)
+                tail = data[-7:]
+        finally:
+            writer.close()
+
+    async def measure(connections):
+        counts = [[0, 0] for _ in range(connections)]
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(connection(counts, index, stop)) for index in range(connections)]
+        await asyncio.sleep(args.warmup)
+        before = [list(count) if count is not None else None for count in counts]
+        status = process_status(args.pid) if args.pid else None
+        await asyncio.sleep(args.seconds)
+        after = [list(count) if count is not None else None for count in counts]
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        connected = [(a[0] - b[0], a[1] - b[1]) for a, b in zip(after, before) if a is not None and b is not None and a[0] > b[0]]
+        return connected, status
+
+    baseline = process_status(args.pid) if args.pid else None
+    if baseline:
+        print(f"servidor ocioso: {baseline[0]/1024:.1f} MB, {baseline[1]} threads")
+    print(f"{'conexões':>9}{'recebendo':>11}{'fps médio':>11}{'fps mín':>9}{'MB/s':>8}{'MB servidor':>13}{'KB/conexão':>12}{'threads':>9}")
+    for connections in args.connections:
+        connected, status = asyncio.run(measure(connections))
+        rates = [frames/args.seconds for frames, _ in connected] or [0.0]
+        megabytes = sum(size for _, size in connected)/args.seconds/1024**2
+        line = f"{connections:>9}{len(connected):>11}{np.mean(rates):>11.1f}{min(rates):>9.1f}{megabytes:>8.1f}"
+        if status and baseline:
+            line += f"{status[0]/1024:>13.1f}{(status[0] - baseline[0])/connections:>12.1f}{status[1]:>9}"
+        print(line)
+
+def _threads_workload(preset, seconds, recognizers, encoders, detectors, video, hand_model, bundle_path):
+    """
+    serving workload of bench_threads, run in a fresh process so the budget is applied before the
+    libraries start their thread pools
+    """
+    if preset is not None:
+        from ThreadBudget import apply_thread_budget, thread_budget
+        apply_thread_budget(thread_budget(preset), verbose=False)
+
+    import resource
+    import threading
+    import cv2
+
+    if bundle_path:
+        from ModelBundle import load_bundle
+        model = load_bundle(bundle_path).model
+    else:
+        from ModelDevelopment import build_model
+        model = build_model(masking=True, num_classes=10)
+    # Modelos com máscara aceitam qualquer comprimento: um clipe de 60 frames
+    batch = [np.random.default_rng(0).random((1,) + tuple(size or 60 for size in model_input.shape[1:])).astype('float32') for model_input in model.inputs]
+    model.predict_on_batch(batch)
+
+    frames = read_video(video, 60) if video else [np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)]
+
+    create_detector = None
+    if detectors and video and hand_model and os.path.exists(hand_model):
+        import app
+        if app.MEDIAPIPE_AVAILABLE:
+            create_detector = lambda: app.load_hand_model(hand_model)
+
+    stop = threading.Event()
+    counts = {"recognition": 0, "encoding": 0, "detection": 0}
+    lock = threading.Lock()
+
+    def count(kind):
+        with lock:
+            counts[kind] += 1
+
+    def recognize():
+        while not stop.is_set():
+            model.predict_on_batch(batch)
+            count("recognition")
+
+    def encode():
+        index = 0
+        while not stop.is_set():
+            frame = cv2.resize(frames[index % len(frames)], (480, 360))
+            cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            index += 1
+            count("encoding")
+
+    def detect():
+        import mediapipe as mp
+        detector = create_detector()
+        index = 0
+        while not stop.is_set():
+            rgb = cv2.cvtColor(frames[index % len(frames)], cv2.COLOR_BGR2RGB)
+            detector.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb))
+            index += 1
+            count("detection")
+
+    workers = [recognize]*recognizers + [encode]*encoders + ([detect]*detectors if create_detector else [])
+    threads = [threading.Thread(target=worker, daemon=True) for worker in workers]
+    for thread in threads:
+        thread.start()
+    time.sleep(2.0)  # aquecimento (detectores carregando, pools criados)
+
+    before = dict(counts)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    after = dict(counts)
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    native_threads = process_status(os.getpid())[1]
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    result = {kind: (after[kind] - before[kind])/elapsed for kind in counts}
+    result["switches"] = (usage_after.ru_nvcsw + usage_after.ru_nivcsw - usage.ru_nvcsw - usage.ru_nivcsw)/elapsed
+    result["threads"] = native_threads
+    return result
+
+def bench_threads(args):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from ThreadBudget import available_cores, thread_budget
+
+    cores = available_cores()
+    recognizers = args.recognizers or cores
+    encoders = args.encoders or 2*cores
+    detectors = args.detectors or cores
+    print(f"{cores} núcleo(s): {recognizers} threads de reconhecimento, {encoders} de codificação, {detectors} de detecção, {args.seconds:.0f}s por medição")
+    print(f"orçamento {args.preset}: {thread_budget(args.preset)}")
+
+    results = []
+    for preset in (None, args.preset):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(_threads_workload, preset, args.seconds, recognizers, encoders, detectors, args.video, args.hand_model, args.bundle).result()
+        results.append((preset or "sem governador", result))
+
+    print(f"{'modo':>16}{'predições/s':>13}{'JPEGs/s':>10}{'detecções/s':>13}{'trocas de contexto/s':>22}{'threads':>9}")
+    for name, result in results:
+        print(f"{name:>16}{result['recognition']:>13.1f}{result['encoding']:>10.1f}{result['detection']:>13.1f}{result['switches']:>22.0f}{result['threads']:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do STL")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    bucketing = subparsers.add_parser("bucketing", help="tempo por época: padding fixo vs buckets + máscara")
+    bucketing.add_argument("--data", default="all_data.p")
+    bucketing.add_argument("--epochs", type=int, default=10)
+    bucketing.add_argument("--batch-size", type=int, default=32)
+    bucketing.add_argument("--seed", type=int, default=0)
+    bucketing.set_defaults(func=bench_bucketing)
+
+    augmentation = subparsers.add_parser("augmentation", help="vazão do aumento de dados vs vazão do treino")
+    augmentation.add_argument("--data", default="all_data.p")
+    augmentation.add_argument("--batch-size", type=int, default=32)
+    augmentation.add_argument("--repeats", type=int, default=200)
+    augmentation.add_argument("--seed", type=int, default=0)
+    augmentation.set_defaults(func=bench_augmentation)
+
+    architectures = subparsers.add_parser("architectures", help="acurácia, parâmetros, tamanho e latência de cada arquitetura")
+    architectures.add_argument("--data", default="all_data.p")
+    architectures.add_argument("--epochs", type=int, default=20)
+    architectures.add_argument("--repeats", type=int, default=50)
+    architectures.add_argument("--seed", type=int, default=0)
+    architectures.set_defaults(func=bench_architectures)
+
+    streaming = subparsers.add_parser("streaming", help="custo por frame da inferência em streaming vs model.predict")
+    streaming.add_argument("--data", default="all_data.p")
+    streaming.add_argument("--model", help="modelo treinado com masking=True (padrão: pesos aleatórios)")
+    streaming.add_argument("--classes", type=int, default=5)
+    streaming.add_argument("--repeats", type=int, default=20)
+    streaming.set_defaults(func=bench_streaming)
+
+    resampling = subparsers.add_parser("resampling", help="acurácia e latência por comprimento de reamostragem")
+    resampling.add_argument("--data", default="all_data.p")
+    resampling.add_argument("--lengths", type=int, nargs="+", default=[24, 32, 60])
+    resampling.add_argument("--epochs", type=int, default=20)
+    resampling.add_argument("--repeats", type=int, default=50)
+    resampling.add_argument("--seed", type=int, default=0)
+    resampling.set_defaults(func=bench_resampling)
+
+    extraction = subparsers.add_parser("extraction", help="latência da extração de landmarks de uma gravação por número de detectores")
+    extraction.add_argument("--video", required=True)
+    extraction.add_argument("--hand-model", default="hand_landmarker.task")
+    extraction.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    extraction.add_argument("--maxlen", type=int, default=60)
+    extraction.add_argument("--max-frames", type=int, default=300)
+    extraction.add_argument("--repeats", type=int, default=3)
+    extraction.set_defaults(func=bench_extraction)
+
+    serving = subparsers.add_parser("serving", help="vazão de gravações classificadas por número de processos de inferência")
+    serving.add_argument("--video", required=True)
+    serving.add_argument("--bundle", default="ModelY2.0.stlbundle")
+    serving.add_argument("--hand-model", default="hand_landmarker.task")
+    serving.add_argument("--processes", type=int, nargs="+", default=[0, 1, 2, 4])
+    serving.add_argument("--clips", type=int, default=16)
+    serving.add_argument("--concurrency", type=int, default=8, help="gravações enviadas ao mesmo tempo")
+    serving.add_argument("--max-frames", type=int, default=120)
+    serving.set_defaults(func=bench_serving)
+
+    upload = subparsers.add_parser("upload", help="teste de carga do /classify_clip de um servidor em execução")
+    upload.add_argument("--video", required=True)
+    upload.add_argument("--url", default="http://localhost:5000")
+    upload.add_argument("--clients", type=int, nargs="+", default=[1, 4, 8])
+    upload.add_argument("--requests", type=int, default=32)
+    upload.set_defaults(func=bench_upload)
+
+    allocations = subparsers.add_parser("allocations", help="memória alocada por frame na captura: cópias vs buffers pré-alocados")
+    allocations.add_argument("--frames", type=int, default=300)
+    allocations.add_argument("--width", type=int, default=640)
+    allocations.add_argument("--height", type=int, default=480)
+    allocations.set_defaults(func=bench_allocations)
+
+    qos = subparsers.add_parser("qos", help="latência do /classify_clip de um servidor em execução com viewers do /video_feed")
+    qos.add_argument("--video", required=True)
+    qos.add_argument("--url", default="http://localhost:5000")
+    qos.add_argument("--viewers", type=int, nargs="+", default=[0, 4, 8])
+    qos.add_argument("--requests", type=int, default=16)
+    qos.add_argument("--warmup", type=float, default=10.0)
+    qos.set_defaults(func=bench_qos)
+
+    capture_log = subparsers.add_parser("capture_log", help="custo do log de capturas nas requisições sob carga")
+    capture_log.add_argument("--threads", type=int, default=4)
+    capture_log.add_argument("--requests", type=int, default=500)
+    capture_log.add_argument("--work-size", type=int, default=120)
+    capture_log.set_defaults(func=bench_capture_log)
+
+    index = subparsers.add_parser("index", help="latência da busca no índice de sinais por tamanho do vocabulário")
+    index.add_argument("--signs", type=int, nargs="+", default=[100, 1000, 5000])
+    index.add_argument("--references", type=int, default=5)
+    index.add_argument("--dimension", type=int, default=64)
+    index.add_argument("--repeats", type=int, default=1000)
+    index.set_defaults(func=bench_index)
+
+    cameras = subparsers.add_parser("cameras", help="vazão de frames processados por número de câmeras (vídeo reproduzido como câmera)")
+    cameras.add_argument("--video", required=True)
+    cameras.add_argument("--hand-model", default="hand_landmarker.task")
+    cameras.add_argument("--bundle", help="bundle que classifica os sinais segmentados (padrão: só detecção)")
+    cameras.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4, 8])
+    cameras.add_argument("--seconds", type=float, default=10.0)
+    cameras.add_argument("--warmup", type=float, default=3.0)
+    cameras.set_defaults(func=bench_cameras)
+
+    streams = subparsers.add_parser("streams", help="conexões simultâneas ao /video_feed de um servidor em execução (app.py ou AsyncServer.py)")
+    streams.add_argument("--url", default="http://localhost:5000")
+    streams.add_argument("--path", default="/video_feed?overlay=client")
+    streams.add_argument("--connections", type=int, nargs="+", default=[10, 100, 500])
+    streams.add_argument("--seconds", type=float, default=10.0)
+    streams.add_argument("--warmup", type=float, default=3.0)
+    streams.add_argument("--pid", type=int, help="processo do servidor, para medir memória e threads (Linux)")
+    streams.set_defaults(func=bench_streams)
+
+    threads = subparsers.add_parser("threads", help="vazão de reconhecimento, codificação e detecção ao mesmo tempo, com e sem o orçamento de threads")
+    threads.add_argument("--preset", default="serving", choices=["serving", "training", "extraction"])
+    threads.add_argument("--video", help="vídeo de onde vêm os frames (sem ele, frames aleatórios e sem detecção)")
+    threads.add_argument("--hand-model", default="hand_landmarker.task")
+    threads.add_argument("--bundle", help="bundle do modelo (sem ele, o modelo lstm com pesos aleatórios)")
+    threads.add_argument("--recognizers", type=int, help="threads chamando o modelo (padrão: um por núcleo)")
+    threads.add_argument("--encoders", type=int, help="threads codificando JPEGs (padrão: dois por núcleo)")
+    threads.add_argument("--detectors", type=int, help="threads detectando mãos (padrão: um por núcleo)")
+    threads.add_argument("--seconds", type=float, default=10.0)
+    threads.set_defaults(func=bench_threads)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 # fix_model.py
+import os
 import pickle
 import numpy as np
 from keras.models import load_model, Model
 from keras.layers import Dense
 from keras.optimizers import Adam
+from ModelBundle import save_bundle, legacy_preprocessing
 
 print("🔧 CORRIGINDO ARQUITETURA DO MODELO...")
 
@@ -58,4 +60,10 @@ corrected_model.summary()
 
 # Salvar modelo corrigido
 corrected_model.save('ModelY2.0_corrected.keras')
-print("\n✅ Modelo corrigido salvo como 'ModelY2.0_corrected.keras'!")
\ No newline at end of file
+print("\n✅ Modelo corrigido salvo como 'ModelY2.0_corrected.keras'!")
+
+# Salvar também como o bundle que o servidor carrega (o mesmo STL_BUNDLE_PATH do app.py): um servidor
+# em execução troca o modelo sozinho ao ver o arquivo novo. O modelo antigo não corta os frames sem mão
+bundle_path = os.environ.get('STL_BUNDLE_PATH', 'ModelY2.0.stlbundle')
+manifest = save_bundle(bundle_path, corrected_model, encoder.classes_, legacy_preprocessing())
+print(f"✅ Bundle {manifest['version']} salvo como '{bundle_path}'!")
\ No newline at end of file
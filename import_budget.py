@@ -0,0 +1,87 @@
+"""
+import-time budget of each stage of the pipeline
+
+Every stage runs in a fresh interpreter and must neither import the heavy libraries it doesn't need
+(TensorFlow only for training and serving, OpenCV and MediaPipe only for collection and extraction)
+nor take longer than its time budget. Exits with status 1 when a stage is over budget, so it can run
+before a commit or in CI.
+
+Usage:
+    python import_budget.py
+    python import_budget.py --no-time
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("tensorflow", "keras", "cv2", "mediapipe", "sklearn")
+
+# (nome, código, módulos pesados proibidos, segundos, arquivo de dados necessário)
+STAGES = [
+    ("menu", "import Main", HEAVY_MODULES, 0.5, None),
+    ("modelo dos dados", "import LandmarkData", HEAVY_MODULES, 0.1, None),
+    ("junção de dados", "import DataFormater", HEAVY_MODULES, 0.1, None),
+    ("leitura do dataset", "from ModelDevelopment import open_data, unpack_data\nunpack_data(open_data('all_data.p'))", HEAVY_MODULES, 2.0, "all_data.p"),
+    ("leitura de um clipe", "import glob\nfrom LandmarkData import load_data\nload_data(sorted(glob.glob('data/*/*.p'))[0])", HEAVY_MODULES, 0.2, "data"),
+    ("clipes em arrays", "from Evaluation import load_dataset\nload_dataset('all_data.p')", HEAVY_MODULES, 3.0, "all_data.p"),
+    ("cache do dataset", "import DatasetCache", HEAVY_MODULES, 0.5, None),
+    ("orçamento de threads", "import ThreadBudget", HEAVY_MODULES, 0.1, None),
+    ("validação cruzada (processo principal)", "import TrialRunner", HEAVY_MODULES, 0.5, None),
+    ("processo de inferência", "import ServingWorkers, Recognition", HEAVY_MODULES, 0.2, None),
+]
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+exec(compile(sys.argv[1], "<stage>", "exec"))
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+def measure(code):
+    """
+    imports and runs code in a fresh interpreter
+
+    Output:
+        seconds(float), modules(set): top level packages loaded
+    """
+    # Sem cache de datasets: a etapa mede o carregamento de verdade e não deixa arquivos para trás
+    env = dict(os.environ, STL_DATASET_CACHE="0")
+    completed = subprocess.run([sys.executable, "-c", CHILD, code], capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "falhou")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result["seconds"], {module.split(".")[0] for module in result["modules"]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica o que cada etapa do pipeline importa e quanto tempo leva")
+    parser.add_argument("--no-time", action="store_true", help="só verifica os módulos importados (máquinas lentas ou compartilhadas)")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'etapa':<40}{'tempo':>9}{'limite':>9}  resultado")
+    for name, code, forbidden, budget, required_file in STAGES:
+        if required_file is not None and not os.path.exists(required_file):
+            print(f"{name:<40}{'-':>9}{budget:>8.1f}s  ⏭️ sem {required_file}")
+            continue
+        try:
+            seconds, modules = measure(code)
+        except RuntimeError as e:
+            failures += 1
+            print(f"{name:<40}{'-':>9}{budget:>8.1f}s  ✗ erro: {e}")
+            continue
+
+        problems = [f"importou {module}" for module in forbidden if module in modules]
+        if not args.no_time and seconds > budget:
+            problems.append("acima do limite de tempo")
+        failures += bool(problems)
+        print(f"{name:<40}{seconds:>8.2f}s{budget:>8.1f}s  {'✗ ' + ', '.join(problems) if problems else '✓'}")
+
+    if failures:
+        print(f"\n✗ {failures} etapa(s) fora do orçamento")
+        sys.exit(1)
+    print("\n✓ Todas as etapas dentro do orçamento")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from CaptureLog import CaptureLog, import_samples
+
+def _clip(frames = 12, missing = (0, 5)):
+    rng = np.random.default_rng(0)
+    clip = []
+    for i in range(frames):
+        if i in missing:
+            clip.append(([(0.0, 0.0, 0.0)]*21, [(0.0, 0.0, 0.0)]*21, (0.0, 0.0, 0.0), (0.0, 0.0, 0.0)))
+            continue
+        local = [tuple(point) for point in rng.uniform(-1, 1, (21, 3)).tolist()]
+        # Pulso em coordenadas da imagem, como o servidor registra
+        wrist = (0.3 + 0.02*i, 0.6 - 0.01*i, -0.05 + 0.003*i*i)
+        clip.append((local, [(0.0, 0.0, 0.0)]*21, wrist, (0.0, 0.0, 0.0)))
+    return clip
+
+def test_imported_wrists_follow_data_collection(tmp_path):
+    DataCollection = pytest.importorskip("DataCollection")
+
+    clip = _clip()
+    log = CaptureLog(str(tmp_path/"captures"))
+    sample_id = log.log("recording", clip, "dia", 0.5, "v1")
+    log.flush(timeout=10)
+
+    imported = import_samples(str(tmp_path/"captures"), data_dir=str(tmp_path/"data"), corrections={sample_id: "dia"})
+    assert imported == {"dia": 1}
+
+    with open(tmp_path/"data"/"dia"/"0.p", 'rb') as f:
+        stored = pickle.load(f)
+
+    expected = DataCollection.normalize_wrist_coords([None if wrist == (0.0, 0.0, 0.0) else wrist for _, _, wrist, _ in clip])
+    np.testing.assert_allclose(np.array(stored.wrist_right), np.array(expected), atol=1e-5)
+    assert np.all(np.array(stored.wrist_left) == 0)
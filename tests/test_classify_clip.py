@@ -0,0 +1,50 @@
+import io
+import types
+
+import numpy as np
+import pytest
+from werkzeug.test import EnvironBuilder
+
+cv2 = pytest.importorskip("cv2")
+server = pytest.importorskip("app")
+
+def _video(path, frames = 30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30, (64, 48))
+    rng = np.random.default_rng(0)
+    for _ in range(frames):
+        writer.write(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+    writer.release()
+    return path.read_bytes()
+
+def _chunked_request(path, data, content_type):
+    """ambiente WSGI de uma requisição chunked: corpo sem Content-Length"""
+    environ = EnvironBuilder(path=path, method="POST", input_stream=io.BytesIO(data), content_type=content_type).get_environ()
+    del environ["CONTENT_LENGTH"]
+    environ["HTTP_TRANSFER_ENCODING"] = "chunked"
+    environ["wsgi.input_terminated"] = True
+    return environ
+
+@pytest.fixture
+def loaded_server(monkeypatch):
+    monkeypatch.setattr(server, "model_registry", types.SimpleNamespace(current=types.SimpleNamespace(source_frames=None)))
+    monkeypatch.setattr(server, "hand_detector", object())
+    monkeypatch.setattr(server, "MEDIAPIPE_AVAILABLE", True)
+    return server
+
+def test_chunked_upload_over_the_limit_is_rejected(tmp_path, monkeypatch, loaded_server):
+    data = _video(tmp_path/"clip.mp4")
+    # O índice do mp4 fica no fim: o vídeo cortado no limite não decodifica
+    monkeypatch.setattr(loaded_server, "MAX_UPLOAD_BYTES", len(data)//2)
+
+    # Direto no WSGI: o test client recalcularia o Content-Length
+    response = loaded_server.app.response_class.from_app(loaded_server.app, _chunked_request("/classify_clip", data, "video/mp4"))
+
+    assert response.status_code == 413
+    assert response.get_json()["status"] == "error"
+
+def test_chunked_invalid_upload_under_the_limit_is_a_bad_request(monkeypatch, loaded_server):
+    monkeypatch.setattr(loaded_server, "MAX_UPLOAD_BYTES", 1 << 20)
+
+    response = loaded_server.app.response_class.from_app(loaded_server.app, _chunked_request("/classify_clip", b"not a video"*100, "video/mp4"))
+
+    assert response.status_code == 400
@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+
+from ExtractionPool import DetectorPool, DetectorPoolClosedError
+
+def test_extract_clip_during_shutdown_is_rejected():
+    started = threading.Event()
+    release = threading.Event()
+
+    def extract(detector, frame):
+        started.set()
+        release.wait(timeout=10)
+        return frame
+
+    pool = DetectorPool(lambda: object(), workers=2)
+    result = {}
+    running = threading.Thread(target=lambda: result.setdefault("landmarks", pool.extract_clip(range(3), extract, lambda landmarks: True, maxlen=3)))
+    running.start()
+    assert started.wait(timeout=10)
+
+    # Um clipe em andamento mantém o pool aberto, mas nenhum clipe novo pode começar
+    pool.shutdown()
+    with pytest.raises(DetectorPoolClosedError):
+        pool.extract_clip(range(3), lambda detector, frame: frame, lambda landmarks: True, maxlen=3)
+
+    release.set()
+    running.join(timeout=10)
+    assert result["landmarks"] == [0, 1, 2]
+    assert pool._closed
@@ -0,0 +1,35 @@
+import pytest
+
+from TrialRunner import FIT_PARAMETERS, expand_grid
+
+MIXED_GRID = {
+    "architecture": ["lstm", "tcn"],
+    "conv_filters": [16, 32],
+    "lstm_units": [16],
+    "filters": [16],
+    "dense_units": [16],
+    "epochs": [1],
+}
+
+def test_mixed_architecture_grid_builds_every_configuration():
+    from ModelDevelopment import ARCHITECTURES
+
+    configs = expand_grid(MIXED_GRID)
+
+    assert [config["architecture"] for config in configs].count("lstm") == 2
+    # conv_filters não vale para o tcn: as duas configurações dele seriam iguais
+    assert [config["architecture"] for config in configs].count("tcn") == 1
+    for config in configs:
+        # Como no TrialRunner._fit
+        model_config = {key: value for key, value in config.items() if key not in FIT_PARAMETERS}
+        build = ARCHITECTURES[model_config.pop("architecture")]
+        model = build(masking=True, num_classes=2, **model_config)
+        assert model.output_shape == (None, 2)
+
+def test_grid_with_a_parameter_of_no_architecture_is_rejected():
+    with pytest.raises(ValueError, match="filters"):
+        expand_grid({"architecture": ["lstm"], "filters": [16]})
+
+def test_grid_with_an_unknown_architecture_is_rejected():
+    with pytest.raises(ValueError, match="gru"):
+        expand_grid({"architecture": ["gru"]})
@@ -0,0 +1,17 @@
+"""
+production entry point: the Flask app with the model loaded and the cameras started, for a WSGI server
+
+Importing this module runs app.initialize() once, in the process that serves the requests. The
+cameras, the recordings and the job queues live in that process, so the server must run a single
+worker process with many threads (predictions go to other processes with STL_SERVING_PROCESSES):
+
+    waitress-serve --threads 32 --port 5000 wsgi:app
+    gunicorn --workers 1 --threads 32 --bind 0.0.0.0:5000 wsgi:app
+
+Don't use gunicorn --preload or more than one worker: a forked worker doesn't inherit the camera and
+job threads, and TensorFlow and MediaPipe are not fork safe once loaded.
+"""
+import app as server
+
+server.initialize()
+app = server.app